@@ -14,7 +14,7 @@ from timApp.admin.timitemtype import TimDocumentType, TimItemType
 from timApp.admin.util import commit_if_not_dry
 from timApp.answer.answer import Answer, AnswerSaver
 from timApp.answer.answer_models import UserAnswer, AnswerUpload
-from timApp.answer.answers import valid_answers_query
+from timApp.answer.answers import valid_answers_query, refresh_latest_answers
 from timApp.document.docinfo import DocInfo
 from timApp.folder.folder import Folder
 from timApp.item.block import Block
@@ -74,11 +74,7 @@ class AnswerDeleteResult:
 @click.argument("doc", type=TimDocumentType())
 @click.option("--dry-run/--no-dry-run", default=True)
 def clear_all(doc: DocInfo, dry_run: bool) -> None:
-    ids = (
-        Answer.query.filter(Answer.task_id.startswith(f"{doc.id}."))
-        .with_entities(Answer.id)
-        .all()
-    )
+    ids = Answer.query.filter(Answer.doc_id == doc.id).with_entities(Answer.id).all()
     cnt = len(ids)
     delete_answers_with_ids(ids)
     click.echo(f"Total {cnt}")
@@ -118,6 +114,12 @@ def delete_answers_with_ids(
 ) -> AnswerDeleteResult:
     if not isinstance(ids, list):
         raise TypeError("ids should be a list of answer ids")
+    latest_keys = {
+        (uid, task_id)
+        for uid, task_id in UserAnswer.query.filter(UserAnswer.answer_id.in_(ids))
+        .join(Answer, Answer.id == UserAnswer.answer_id)
+        .with_entities(UserAnswer.user_id, Answer.task_id)
+    }
     d_ua = UserAnswer.query.filter(UserAnswer.answer_id.in_(ids)).delete(
         synchronize_session=False
     )
@@ -140,6 +142,7 @@ def delete_answers_with_ids(
             )
         )
     d_ans = ans_items.delete(synchronize_session=False)
+    refresh_latest_answers(latest_keys)
     return AnswerDeleteResult(
         useranswer=d_ua,
         answersaver=d_as,
@@ -159,7 +162,7 @@ def revalidate(
     doc: DocInfo, deadline: datetime, group: str, dry_run: bool, may_invalidate: bool
 ) -> None:
     answers: list[tuple[Answer, str]] = (
-        Answer.query.filter(Answer.task_id.startswith(f"{doc.id}."))
+        Answer.query.filter(Answer.doc_id == doc.id)
         .join(User, Answer.users)
         .join(UserGroup, User.groups)
         .filter(UserGroup.name == group)
@@ -199,7 +202,7 @@ def truncate_large(doc: DocInfo, limit: int, to: int, dry_run: bool) -> None:
     if limit < to:
         click.echo("limit must be >= to")
         sys.exit(1)
-    q = Answer.query.filter(Answer.task_id.startswith(f"{doc.id}."))
+    q = Answer.query.filter(Answer.doc_id == doc.id)
     total = q.count()
     anss: list[Answer] = (
         q.filter(func.length(Answer.content) > limit)
@@ -244,7 +247,7 @@ def compress_uploads(item: Item, dry_run: bool) -> None:
     docs = collect_docs(item)
     for d in docs:
         uploads: list[Block] = (
-            Answer.query.filter(Answer.task_id.startswith(f"{d.id}."))
+            Answer.query.filter(Answer.doc_id == d.id)
             .join(AnswerUpload)
             .join(Block)
             .with_entities(Block)
@@ -15,9 +15,7 @@ def fix_imagex_freehanddata(doc: DocInfo, args: DryrunnableArguments) -> int:
     :param args: The arguments.
     """
     errors = 0
-    answers: list[Answer] = Answer.query.filter(
-        Answer.task_id.startswith(f"{doc.id}.")
-    ).all()
+    answers: list[Answer] = Answer.query.filter(Answer.doc_id == doc.id).all()
     for a in answers:
         data = a.content_as_json
         freehanddata = data.get("freeHandData")
@@ -10,6 +10,8 @@ from timApp.admin.fix_orphan_documents import (
 )
 from timApp.admin.util import commit_if_not_dry
 from timApp.document.docentry import DocEntry
+from timApp.document.document import Document
+from timApp.document.parpack import build_pack, remove_pack
 from timApp.document.translation.translation import Translation
 from timApp.item.block import Block, BlockType
 from timApp.notification.notification import Notification
@@ -209,3 +211,61 @@ Second paragraph
     shutil.move(pars_dir.as_posix(), deleted_pars)
 
     click.echo("Done, basic IO seems to work!")
+
+
+@item_cli.command()
+@click.option(
+    "--doc", "doc_path", help="Path of the document to process. Default: all documents."
+)
+@click.option(
+    "--unpack/--pack",
+    default=False,
+    help="Whether to remove the packs instead of building them.",
+)
+def pack_pars(doc_path: str | None, unpack: bool) -> None:
+    """Builds packed paragraph stores for documents (or removes them with --unpack).
+
+    Building an existing pack again compacts it.
+    """
+    if doc_path:
+        d = DocEntry.find_by_path(doc_path)
+        if not d:
+            click.echo(f"Document not found: {doc_path}")
+            exit(1)
+        doc_ids = [d.id]
+    else:
+        doc_ids = [
+            b.id
+            for b in Block.query.filter_by(type_id=BlockType.Document.value)
+            .with_entities(Block.id)
+            .all()
+        ]
+    total = 0
+    with click.progressbar(doc_ids) as bar:
+        for doc_id in bar:
+            if unpack:
+                remove_pack(doc_id)
+            else:
+                total += build_pack(doc_id)
+    if unpack:
+        click.echo(f"Removed packs of {len(doc_ids)} documents.")
+    else:
+        click.echo(f"Packed {total} paragraph versions in {len(doc_ids)} documents.")
+
+
+@item_cli.command()
+def convert_changelogs() -> None:
+    """Converts the changelogs of all documents to the append-only format."""
+    doc_ids = [
+        b.id
+        for b in Block.query.filter_by(type_id=BlockType.Document.value)
+        .with_entities(Block.id)
+        .all()
+    ]
+    total = 0
+    with click.progressbar(doc_ids) as bar:
+        for doc_id in bar:
+            d = Document(doc_id)
+            if d.exists():
+                total += d.convert_changelog()
+    click.echo(f"Converted {total} changelog entries in {len(doc_ids)} documents.")
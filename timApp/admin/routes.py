@@ -4,11 +4,19 @@ from dataclasses import dataclass
 from flask import flash, url_for, Blueprint, Response
 
 from timApp.auth.accesshelper import verify_admin
+from timApp.lecture.lectureevents import get_lecture_event_hub
+from timApp.plugin.containerLink import flush_plugin_reqs_cache
+from timApp.plugin.pluginsession import get_pool_stats
 from timApp.timdb.sqa import db
 from timApp.user.user import User
 from timApp.user.usergroup import UserGroup
 from timApp.util.flask.requesthelper import use_model
-from timApp.util.flask.responsehelper import safe_redirect, json_response
+from timApp.util.flask.responsehelper import (
+    safe_redirect,
+    json_response,
+    ok_response,
+)
+from timApp.util.timtiming import get_stats
 
 admin_bp = Blueprint("admin", __name__, url_prefix="")
 
@@ -49,6 +57,28 @@ def restart_server() -> Response:
     return safe_redirect(url_for("start_page"))
 
 
+@admin_bp.get("/stats")
+def get_process_stats() -> Response:
+    """Returns the cache and connection statistics of the worker process that handles the request."""
+    verify_admin()
+    return json_response(
+        {
+            "pid": os.getpid(),
+            "counters": get_stats(),
+            "plugin_pools": get_pool_stats(),
+            "lecture_event_subscribers": get_lecture_event_hub().get_subscriber_count(),
+        }
+    )
+
+
+@admin_bp.post("/plugins/flushReqsCache")
+def flush_plugin_reqs() -> Response:
+    """Drops the cached plugin reqs, e.g. after deploying a plugin."""
+    verify_admin()
+    flush_plugin_reqs_cache()
+    return ok_response()
+
+
 @admin_bp.get("/users/search/<term>")
 def search_users(term: str) -> Response:
     verify_admin()
@@ -0,0 +1,40 @@
+import click
+from flask.cli import AppGroup
+
+from timApp.document.docentry import DocEntry
+from timApp.util.flask.search import (
+    create_search_index,
+    update_search_index,
+)
+from timApp.util.flask.searchindex import enqueue_index_updates
+
+search_cli = AppGroup("search")
+
+
+@search_cli.command()
+def rebuild_index() -> None:
+    """Rebuilds the whole search index. Only needed for recovery; the index is normally updated incrementally."""
+    status, msg = create_search_index()
+    click.echo(msg)
+    if status != 200:
+        exit(1)
+
+
+@search_cli.command()
+@click.option(
+    "--doc", "doc_paths", multiple=True, help="Path of a document to reindex."
+)
+def update_index(doc_paths: tuple[str, ...]) -> None:
+    """Applies the queued search index updates, optionally queueing the given documents first."""
+    doc_ids = []
+    for path in doc_paths:
+        d = DocEntry.find_by_path(path)
+        if not d:
+            click.echo(f"Document not found: {path}")
+            exit(1)
+        doc_ids.append(d.id)
+    enqueue_index_updates(doc_ids)
+    total = 0
+    while count := update_search_index():
+        total += count
+    click.echo(f"Reindexed {total} documents.")
@@ -1,12 +1,16 @@
 import json
+import re
 
 from sqlalchemy import func
+from sqlalchemy.orm import validates
 
 from timApp.answer.answer_models import UserAnswer
 from timApp.plugin.plugintype import PluginType
 from timApp.plugin.taskid import TaskId
 from timApp.timdb.sqa import db, include_if_loaded
 
+TASK_ID_DOC_RE = re.compile(r"([0-9]+)\.(.*)", re.DOTALL)
+
 
 class AnswerSaver(db.Model):
     """Holds information about who has saved an answer. For example, in teacher view, "Save teacher's fix"
@@ -25,9 +29,16 @@ class Answer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     """Answer identifier."""
 
-    task_id = db.Column(db.Text, nullable=False, index=True)
+    task_id = db.Column(db.Text, nullable=False)
     """Task id to which this answer was posted. In the form "doc_id.name", for example "2.task1"."""
 
+    doc_id = db.Column(db.Integer)
+    """The document part of the task id. Set automatically from task_id; null if task_id is not of the form
+    "doc_id.name"."""
+
+    task_name = db.Column(db.Text)
+    """The name part of the task id. Set automatically from task_id like doc_id."""
+
     origin_doc_id = db.Column(db.Integer, db.ForeignKey("block.id"), nullable=True)
     """The document in which the answer was saved"""
 
@@ -70,6 +81,21 @@ class Answer(db.Model):
         "User", lazy="select", secondary=AnswerSaver.__table__, uselist=False
     )
 
+    __table_args__ = (
+        db.Index("answer_task_id_answered_on_idx", "task_id", "answered_on"),
+        db.Index("answer_doc_id_task_name_idx", "doc_id", "task_name"),
+    )
+
+    @validates("task_id")
+    def validate_task_id(self, _key: str, task_id: str) -> str:
+        # Must match the backfill of migration 93ffad8dd508.
+        m = TASK_ID_DOC_RE.match(task_id)
+        if m:
+            self.doc_id, self.task_name = int(m[1]), m[2]
+        else:
+            self.doc_id, self.task_name = None, None
+        return task_id
+
     @property
     def content_as_json(self) -> dict:
         return json.loads(self.content)
@@ -80,10 +106,6 @@ class Answer(db.Model):
             return 1
         return u.get_answers_for_task(self.task_id).filter(Answer.id <= self.id).count()
 
-    @property
-    def task_name(self) -> str:
-        return self.parsed_task_id.task_name
-
     def to_json(self) -> dict:
         return {
             "id": self.id,
@@ -35,4 +35,32 @@ class UserAnswer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     answer_id = db.Column(db.Integer, db.ForeignKey("answer.id"), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey("useraccount.id"), nullable=False)
-    __table_args__ = (db.UniqueConstraint("answer_id", "user_id"),)
+    __table_args__ = (
+        db.UniqueConstraint("answer_id", "user_id"),
+        db.Index("useranswer_user_id_answer_id_idx", "user_id", "answer_id"),
+    )
+
+
+class LatestAnswer(db.Model):
+    """The latest answer of each user in each task.
+
+    This is derived from the answers so that the latest answers need not be computed from the whole answer history.
+    The table is kept up to date by :func:`timApp.answer.answers.save_answer` and
+    :func:`timApp.answer.answers.refresh_latest_answers`.
+    """
+
+    __tablename__ = "latest_answer"
+    task_id = db.Column(db.Text, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("useraccount.id"), primary_key=True)
+
+    answer_id = db.Column(db.Integer, nullable=False)
+    """The latest answer of the user in the task."""
+
+    valid_answer_id = db.Column(db.Integer)
+    """The latest valid answer of the user in the task, or None if there are no valid answers."""
+
+    count = db.Column(db.Integer, nullable=False)
+    """The number of answers of the user in the task."""
+
+    valid_count = db.Column(db.Integer, nullable=False)
+    """The number of valid answers of the user in the task."""
@@ -20,12 +20,20 @@ from typing import (
 # noinspection PyUnresolvedReferences
 from bs4 import UnicodeDammit
 from flask import current_app
-from sqlalchemy import func, Numeric, Float, true, case
-from sqlalchemy.dialects.postgresql import aggregate_order_by
-from sqlalchemy.orm import selectinload, defaultload, Query, joinedload, contains_eager
+from sqlalchemy import func, Numeric, Float, true, case, tuple_, event, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert
+from sqlalchemy.orm import (
+    selectinload,
+    defaultload,
+    Query,
+    joinedload,
+    contains_eager,
+    Session,
+)
+from sqlalchemy.orm.attributes import get_history, History, PASSIVE_NO_INITIALIZE
 
 from timApp.answer.answer import Answer
-from timApp.answer.answer_models import AnswerTag, UserAnswer
+from timApp.answer.answer_models import AnswerTag, UserAnswer, LatestAnswer
 from timApp.answer.pointsumrule import PointSumRule, PointType, Group
 from timApp.document.viewcontext import OriginInfo
 from timApp.plugin.plugintype import PluginType, PluginTypeLazy, PluginTypeBase
@@ -193,6 +201,182 @@ def save_answer(
     return a
 
 
+LatestAnswerKey = tuple[int, str]
+"""A (user id, task id) pair of the latest_answer table."""
+
+
+def refresh_latest_answers(keys: Iterable[LatestAnswerKey]) -> None:
+    """Recomputes the latest answers of the given users and tasks from the answer history.
+
+    Changes made through the ORM are applied automatically when the session is flushed
+    (see :func:`update_latest_answers`), so this is only needed after bulk queries that change answers.
+    """
+    db.session.flush()
+    _refresh_latest_answers(db.session, keys)
+
+
+def _refresh_latest_answers(session: Session, keys: Iterable[LatestAnswerKey]) -> None:
+    keys = list(set(keys))
+    t = LatestAnswer.__table__
+    for i in range(0, len(keys), 1000):
+        chunk = keys[i : i + 1000]
+        session.execute(t.delete().where(tuple_(t.c.user_id, t.c.task_id).in_(chunk)))
+        latest = (
+            select(
+                [
+                    Answer.task_id,
+                    UserAnswer.user_id,
+                    func.max(Answer.id),
+                    func.max(Answer.id).filter(Answer.valid == True),
+                    func.count(Answer.id),
+                    func.count(Answer.id).filter(Answer.valid == True),
+                ]
+            )
+            .select_from(UserAnswer.__table__.join(Answer.__table__))
+            .where(tuple_(UserAnswer.user_id, Answer.task_id).in_(chunk))
+            .group_by(UserAnswer.user_id, Answer.task_id)
+        )
+        session.execute(
+            t.insert().from_select(
+                [
+                    "task_id",
+                    "user_id",
+                    "answer_id",
+                    "valid_answer_id",
+                    "count",
+                    "valid_count",
+                ],
+                latest,
+            )
+        )
+
+
+def _add_latest_answers(
+    session: Session, answers: Iterable[tuple[int, Answer]]
+) -> None:
+    """Adds new answers to the latest answers of their users.
+
+    The rows are updated relative to their current values, so concurrent answers of the same user are counted
+    correctly.
+    """
+    rows: dict[LatestAnswerKey, dict[str, Any]] = {}
+    for uid, a in answers:
+        row = rows.setdefault(
+            (uid, a.task_id),
+            {
+                "task_id": a.task_id,
+                "user_id": uid,
+                "answer_id": a.id,
+                "valid_answer_id": None,
+                "count": 0,
+                "valid_count": 0,
+            },
+        )
+        row["answer_id"] = max(row["answer_id"], a.id)
+        row["count"] += 1
+        if a.valid:
+            row["valid_answer_id"] = max(row["valid_answer_id"] or 0, a.id)
+            row["valid_count"] += 1
+    if not rows:
+        return
+    t = LatestAnswer.__table__
+    stmt = insert(t).values(list(rows.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[t.c.task_id, t.c.user_id],
+        set_={
+            # GREATEST ignores nulls.
+            "answer_id": func.greatest(t.c.answer_id, stmt.excluded.answer_id),
+            "valid_answer_id": func.greatest(
+                t.c.valid_answer_id, stmt.excluded.valid_answer_id
+            ),
+            "count": t.c.count + stmt.excluded.count,
+            "valid_count": t.c.valid_count + stmt.excluded.valid_count,
+        },
+    )
+    session.execute(stmt)
+
+
+def pending_history(obj: Any, attr: str) -> History:
+    """Returns the unflushed changes of the attribute without loading it."""
+    h = get_history(obj, attr, passive=PASSIVE_NO_INITIALIZE)
+    # The parts of the history are None if the attribute has not been loaded.
+    return History(h.added or (), h.unchanged or (), h.deleted or ())
+
+
+@event.listens_for(db.session, "after_flush")
+def update_latest_answers(session: Session, _flush_context: Any) -> None:
+    """Updates the latest_answer table for the answers and answer users that were changed in the flush.
+
+    New answers are added to the existing rows. For other changes, i.e. when the validity, the task or the users of
+    an existing answer change, the rows of the affected users and tasks are recomputed.
+    """
+    new_answers: dict[tuple[int, int], Answer] = {}
+    changed_answer_ids: set[int] = set()
+    old_tasks: set[tuple[int, str]] = set()
+    keys: set[LatestAnswerKey] = set()
+
+    def answer_user_changed(u: User, a: Answer, added: bool) -> None:
+        if not added:
+            keys.add((u.id, a.task_id))
+        elif a in session.new:
+            new_answers[u.id, a.id] = a
+        else:
+            changed_answer_ids.add(a.id)
+
+    for obj in (*session.new, *session.dirty):
+        if isinstance(obj, Answer):
+            for attr in ("users", "users_all"):
+                h = pending_history(obj, attr)
+                for u in h.added:
+                    answer_user_changed(u, obj, True)
+                for u in h.deleted:
+                    answer_user_changed(u, obj, False)
+                    keys.update(
+                        (u.id, task_id)
+                        for task_id in pending_history(obj, "task_id").deleted
+                    )
+            if obj in session.new:
+                continue
+            if pending_history(obj, "valid").has_changes():
+                changed_answer_ids.add(obj.id)
+            h = pending_history(obj, "task_id")
+            if h.has_changes():
+                changed_answer_ids.add(obj.id)
+                old_tasks.update((obj.id, task_id) for task_id in h.deleted)
+        elif isinstance(obj, User):
+            for attr in ("answers", "answers_alt"):
+                h = pending_history(obj, attr)
+                for a in h.added:
+                    answer_user_changed(obj, a, True)
+                for a in h.deleted:
+                    answer_user_changed(obj, a, False)
+    for obj in session.deleted:
+        if isinstance(obj, Answer):
+            h = pending_history(obj, "users_all")
+            keys.update((u.id, obj.task_id) for u in (*h.unchanged, *h.deleted))
+
+    if changed_answer_ids:
+        rows = session.execute(
+            select([UserAnswer.user_id, UserAnswer.answer_id, Answer.task_id])
+            .select_from(UserAnswer.__table__.join(Answer.__table__))
+            .where(UserAnswer.answer_id.in_(changed_answer_ids))
+        )
+        for uid, aid, task_id in rows:
+            keys.add((uid, task_id))
+            keys.update((uid, t) for a_id, t in old_tasks if a_id == aid)
+    if keys:
+        _refresh_latest_answers(session, keys)
+    # Recomputed rows already include the new answers.
+    _add_latest_answers(
+        session,
+        (
+            (uid, a)
+            for (uid, _), a in new_answers.items()
+            if (uid, a.task_id) not in keys
+        ),
+    )
+
+
 class AgeOptions(Enum):
     MIN = "min"
     MAX = "max"
@@ -220,6 +404,7 @@ class SortOptions(Enum):
 class FormatOptions(Enum):
     JSON = "json"
     TEXT = "text"
+    CSV = "csv"
 
 
 class AnswerPrintOptions(Enum):
@@ -255,14 +440,23 @@ class AllAnswersOptions(AnswerPeriodOptions):
     )
 
 
-def get_all_answers(
+ALL_ANSWERS_BATCH_SIZE = 1000
+"""The number of rows to fetch from the database at a time when iterating all answers."""
+
+
+def iter_all_answers(
     task_ids: list[TaskId],
     options: AllAnswersOptions,
-) -> list[str] | list[dict]:
+) -> Generator[str | dict | list[str], None, None]:
     """Gets all answers to the specified tasks.
 
+    The answers are fetched from the database in batches of ALL_ANSWERS_BATCH_SIZE rows and formatted one at a time,
+    so the whole result is never held in memory.
+
     :param task_ids: The ids of the tasks to get answers for.
     :param options: The options for getting and printing the answers.
+    :return: The answers as strings for the text format, as dicts for the JSON format and as rows for the CSV
+     format. For the CSV format, the first row is the header row.
     """
     print_header = options.print in (AnswerPrintOptions.ALL, AnswerPrintOptions.HEADER)
     print_answers = options.print in (
@@ -312,9 +506,7 @@ def get_all_answers(
             q = q.order_by(User.name, Answer.task_id, Answer.answered_on)
         case SortOptions.TASK:
             q = q.order_by(Answer.task_id, User.name, Answer.answered_on)
-    q = q.with_entities(Answer, User, sub.c.count)
-    result = []
-    result_json = []
+    q = q.with_entities(Answer, User, sub.c.count).yield_per(ALL_ANSWERS_BATCH_SIZE)
 
     lf = "\n"
     if options.print == AnswerPrintOptions.ANSWERS_NO_LINE:
@@ -344,6 +536,28 @@ def get_all_answers(
             hashes.add(hash_result)
             return hash_result
 
+    if options.format == FormatOptions.CSV:
+        if options.print == AnswerPrintOptions.KORPPI:
+            yield ["name", "task", "answer"]
+        else:
+            yield (
+                (["real_name"] if options.name == NameOptions.BOTH else [])
+                + (
+                    [
+                        "name",
+                        "origin_doc_id",
+                        "task_id",
+                        "plugin",
+                        "answered_on",
+                        "count",
+                        "points",
+                    ]
+                    if print_header
+                    else []
+                )
+                + (["answer"] if print_answers else [])
+            )
+
     for a, u, n in qq:
         points = str(a.points)
         if points == "None":
@@ -412,7 +626,7 @@ def get_all_answers(
                         taskid = taskid[i + 1 :]
                     res += taskid + ";" + answ.replace("\n", "\\n")
 
-                result.append(res)
+                yield res
             case FormatOptions.JSON:
                 user_json = u.to_json() if print_header else {}
                 user_json["name"] = name
@@ -448,11 +662,27 @@ def get_all_answers(
                 if print_answers:
                     result_json_item |= {"resolved_content": answ}
 
-                result_json.append(result_json_item)
-    if options.format == FormatOptions.TEXT:
-        return result
-    else:
-        return result_json
+                yield result_json_item
+            case FormatOptions.CSV:
+                if options.print == AnswerPrintOptions.KORPPI:
+                    yield [name, a.task_id.partition(".")[2] or a.task_id, answ]
+                    continue
+                row = []
+                if options.name == NameOptions.BOTH:
+                    row.append(str(u.real_name))
+                if print_header:
+                    row += [
+                        name,
+                        str(a.origin_doc_id),
+                        a.task_id,
+                        a.plugin_type.type if a.plugin_type else "",
+                        str(a.answered_on),
+                        ns,
+                        points,
+                    ]
+                if print_answers:
+                    row.append(answ)
+                yield row
 
 
 def get_all_answer_initial_query(
@@ -550,8 +780,6 @@ def get_users_for_tasks(
     subquery_answers = Answer.query.with_entities(
         Answer.id, Answer.points, Answer.answered_on, Answer.valid
     ).subquery()
-    if answer_filter is None:
-        answer_filter = true()
     time_labels = (
         [
             func.min(Answer.answered_on).label("answered_on_min"),
@@ -560,20 +788,41 @@ def get_users_for_tasks(
         if with_answer_time
         else []
     )
-    subquery_user_answers = (
-        valid_answers_query(task_ids, True if show_valid_only else None)
-        .filter(answer_filter)
-        .join(UserAnswer, UserAnswer.answer_id == Answer.id)
-        .group_by(UserAnswer.user_id, Answer.task_id)
-        .with_entities(
-            Answer.task_id,
-            UserAnswer.user_id.label("uid"),
-            func.max(Answer.id).filter(Answer.valid == True).label("aid_valid"),
-            func.max(Answer.id).label("aid_any"),
-            *time_labels,
+    if answer_filter is None and not with_answer_time and not group_by_doc:
+        # The latest answers are read from the latest_answer table when they do not depend on the history.
+        q = LatestAnswer.query.filter(
+            LatestAnswer.task_id.in_(task_ids_to_strlist(task_ids))
+        )
+        if show_valid_only:
+            q = q.filter(LatestAnswer.valid_answer_id != None)
+        subquery_user_answers = q.with_entities(
+            LatestAnswer.task_id,
+            LatestAnswer.user_id.label("uid"),
+            LatestAnswer.valid_answer_id.label("aid_valid"),
+            (
+                LatestAnswer.valid_answer_id
+                if show_valid_only
+                else LatestAnswer.answer_id
+            ).label("aid_any"),
+        ).subquery()
+    else:
+        if answer_filter is None:
+            answer_filter = true()
+        subquery_user_answers = (
+            valid_answers_query(task_ids, True if show_valid_only else None)
+            .filter(answer_filter)
+            .join(UserAnswer, UserAnswer.answer_id == Answer.id)
+            .group_by(UserAnswer.user_id, Answer.task_id, Answer.doc_id)
+            .with_entities(
+                Answer.task_id,
+                Answer.doc_id,
+                UserAnswer.user_id.label("uid"),
+                func.max(Answer.id).filter(Answer.valid == True).label("aid_valid"),
+                func.max(Answer.id).label("aid_any"),
+                *time_labels,
+            )
+            .subquery()
         )
-        .subquery()
-    )
 
     sub_joined = (
         db.session.query(subquery_user_answers, subquery_answers, subquery_annotantions)
@@ -618,9 +867,8 @@ def get_users_for_tasks(
         group_by_cols.append(sub_joined.c.task_id)
         cols.append(min_task_id)
     if group_by_doc:
-        doc_id = func.substring(sub_joined.c.task_id, r"(\d+)\..+").label("doc_id")
-        group_by_cols.append(doc_id)
-        cols.append(doc_id)
+        group_by_cols.append(sub_joined.c.doc_id)
+        cols.append(sub_joined.c.doc_id)
     if user_ids is not None:
         main = main.filter(User.id.in_(user_ids))
     if current_app.config["LOAD_STUDENT_IDS_IN_TEACHER"]:
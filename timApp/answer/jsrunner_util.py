@@ -4,9 +4,8 @@ from collections import defaultdict
 from dataclasses import dataclass, field
 from typing import TypedDict, Any, DefaultDict
 
-from sqlalchemy import func
-
 from timApp.answer.answer import Answer
+from timApp.answer.answer_models import LatestAnswer
 from timApp.answer.answers import get_global_answers
 from timApp.auth.accesshelper import (
     verify_user_create_right,
@@ -306,16 +305,17 @@ def save_fields(
         for key in user["fields"].keys()
     }
     sq = (
-        Answer.query.filter(
-            Answer.task_id.in_(
+        LatestAnswer.query.filter(
+            LatestAnswer.task_id.in_(
                 [tid.doc_task for tid in parsed_task_ids.values() if not tid.is_global]
             )
-            & (Answer.valid == True)
+            & LatestAnswer.user_id.in_(user_map.keys())
+            & (LatestAnswer.valid_answer_id != None)
+        )
+        .with_entities(
+            LatestAnswer.valid_answer_id.label("aid"),
+            LatestAnswer.user_id.label("uid"),
         )
-        .join(User, Answer.users)
-        .filter(User.id.in_(user_map.keys()))
-        .group_by(User.id, Answer.task_id)
-        .with_entities(func.max(Answer.id).label("aid"), User.id.label("uid"))
         .subquery()
     )
     datas: list[tuple[int, Answer]] = (
@@ -4,7 +4,7 @@ import re
 from collections import defaultdict
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from typing import Union, Any, Callable, TypedDict
+from typing import Union, Any, Callable, TypedDict, Iterable
 
 from flask import Response
 from flask import current_app
@@ -27,7 +27,8 @@ from timApp.answer.answers import (
     AllAnswersOptions,
     FormatOptions,
     AnswerPrintOptions,
-    get_all_answers,
+    iter_all_answers,
+    ALL_ANSWERS_BATCH_SIZE,
 )
 from timApp.answer.backup import send_answer_backup_if_enabled
 from timApp.answer.exportedanswer import ExportedAnswer
@@ -125,7 +126,15 @@ from timApp.util.flask.requesthelper import (
     get_from_url,
     view_ctx_with_urlmacros,
 )
-from timApp.util.flask.responsehelper import json_response, ok_response, to_dict
+from timApp.util.flask.responsehelper import (
+    json_response,
+    ok_response,
+    to_dict,
+    json_stream_response,
+    stream_response,
+    iter_joined,
+    iter_csv,
+)
 from timApp.util.flask.typedblueprint import TypedBlueprint
 from timApp.util.get_fields import (
     get_fields_and_users,
@@ -692,7 +701,6 @@ def post_answer_impl(
     if tid.doc_id is None:
         raise PluginException(f"Task ID is missing document ID: {task_id_ext}")
     d = get_doc_or_abort(tid.doc_id)
-    d.document.insert_preamble_pars()
 
     # It is rare but possible that the current user has been deleted (for example as the result of merging 2 accounts).
     # We assume it's the case here, so we clear the session and ask to log in again.
@@ -700,8 +708,10 @@ def post_answer_impl(
         clear_session()
         raise AccessDenied("Please refresh the page and log in again.")
 
-    rights = get_user_rights_for_item(d, curr_user)
-    if has_no_higher_right(d.document.get_settings().disable_answer(), rights):
+    disable_answer = d.document.get_settings().disable_answer()
+    if disable_answer and has_no_higher_right(
+        disable_answer, get_user_rights_for_item(d, curr_user)
+    ):
         raise AccessDenied("Answering is disabled for this document.")
 
     force_answer = answer_options.get(
@@ -1508,25 +1518,23 @@ def export_answers(doc_path: str) -> Response:
     if not d:
         raise RouteException("Document not found")
     verify_teacher_access(d)
-    answer_list: list[tuple[Answer, str]] = (
-        Answer.query.filter(Answer.task_id.startswith(f"{d.id}."))
+    answer_list: Iterable[tuple[Answer, str]] = (
+        Answer.query.filter(Answer.doc_id == d.id)
         .join(User, Answer.users)
         .with_entities(Answer, User.email)
-        .all()
+        .yield_per(ALL_ANSWERS_BATCH_SIZE)
     )
-    return json_response(
-        [
-            {
-                "email": email,
-                "content": a.content,
-                "valid": a.valid,
-                "points": a.points,
-                "time": a.answered_on,
-                "task": a.task_name,
-                "doc": doc_path,
-            }
-            for a, email in answer_list
-        ]
+    return json_stream_response(
+        {
+            "email": email,
+            "content": a.content,
+            "valid": a.valid,
+            "points": a.points,
+            "time": a.answered_on,
+            "task": a.task_name,
+            "doc": doc_path,
+        }
+        for a, email in answer_list
     )
 
 
@@ -1554,9 +1562,7 @@ def import_answers(
         raise RouteException(f"Some documents not found: {missing_docs}")
     for d in docs:
         verify_teacher_access(d)
-    filter_cond = Answer.task_id.startswith(f"{docs[0].id}.")
-    for d in docs[1:]:
-        filter_cond |= Answer.task_id.startswith(f"{d.id}.")
+    filter_cond = Answer.doc_id.in_([d.id for d in docs])
 
     no_identifier_answers = {
         a for a in exported_answers if not a.email and not a.username
@@ -1775,9 +1781,12 @@ def get_all_answers_plain(task_id: str, options: AllAnswersOptions) -> Response:
 def get_all_answers_list_plain(
     task_ids: list[TaskId], options: AllAnswersOptions
 ) -> Response:
-    all_answers = get_all_answers_as_list(task_ids, options)
-    if options.format == FormatOptions.JSON:
-        return json_response(all_answers)
+    all_answers = get_all_answers_iter(task_ids, options)
+    match options.format:
+        case FormatOptions.JSON:
+            return json_stream_response(all_answers)
+        case FormatOptions.CSV:
+            return stream_response(iter_csv(all_answers, "excel"))
     jointext = "\n"
     print_answers = (
         options.print == AnswerPrintOptions.ALL
@@ -1785,13 +1794,16 @@ def get_all_answers_list_plain(
     )
     if print_answers:
         jointext = "\n\n----------------------------------------------------------------------------------\n"
-    text = jointext.join(all_answers)
-    return Response(text, mimetype="text/plain")
+    return stream_response(iter_joined(all_answers, jointext))
 
 
-def get_all_answers_as_list(
+def get_all_answers_iter(
     task_ids: list[TaskId], options: AllAnswersOptions
-) -> list[str]:
+) -> Iterable[str | dict | list[str]]:
+    """Checks the rights and options for getting all answers to the tasks and returns the answers.
+
+    The checks are done before returning so that the errors are reported before the answers are streamed.
+    """
     verify_logged_in()
     if not task_ids:
         return []
@@ -1829,7 +1841,7 @@ def get_all_answers_as_list(
                 "For optimal results, use at least 10 characters for the hash"
             )
 
-    return get_all_answers(task_ids, options)
+    return iter_all_answers(task_ids, options)
 
 
 class GraphData(TypedDict):
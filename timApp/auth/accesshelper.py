@@ -37,14 +37,19 @@ from timApp.notification.send_email import send_email
 from timApp.peerreview.util.peerreview_utils import is_peerreview_enabled
 from timApp.plugin.plugin import (
     Plugin,
-    find_plugin_from_document,
+    find_plugin_from_document_or_preamble,
     maybe_get_plugin_from_par,
 )
 from timApp.plugin.pluginexception import PluginException
 from timApp.plugin.taskid import TaskId, TaskIdAccess
 from timApp.timdb.exceptions import TimDbException
 from timApp.timdb.sqa import db
-from timApp.user.user import ItemOrBlock, User
+from timApp.user.user import (
+    ItemOrBlock,
+    User,
+    access_sets,
+    clear_request_access_memo,
+)
 from timApp.user.usergroup import UserGroup
 from timApp.user.userutils import grant_access
 from timApp.util.flask.requesthelper import get_option, RouteException, NotExist
@@ -166,6 +171,31 @@ def check_inherited_right(
     return has_access
 
 
+def get_accesses(
+    u: User,
+    items: list[ItemOrBlock],
+    access_type: AccessType,
+    grace_period: timedelta = timedelta(seconds=0),
+    duration: bool = False,
+) -> dict[int, BlockAccess | None]:
+    """Checks the access of the user to many items at once.
+
+    The result is the same as calling :meth:`User.has_access` for each item (including the rights inherited from
+    the parent folder), but the accesses of all the items are loaded with one query.
+
+    :return: The best access for each item id, or None if the user has no access to the item.
+    """
+    accesses = u.get_some_accesses(
+        items, access_sets[access_type], grace_period=grace_period, duration=duration
+    )
+    if current_app.config["INHERIT_FOLDER_RIGHTS_DOCS"]:
+        for i in items:
+            inherited = check_inherited_right(u, i, access_type, grace_period)
+            if inherited:
+                accesses[i.id] = inherited
+    return accesses
+
+
 def get_inherited_right_blocks(b: ItemOrBlock) -> list[Block]:
     inherited_right_docs = current_app.config["INHERIT_FOLDER_RIGHTS_DOCS"]
     if not inherited_right_docs:
@@ -493,7 +523,7 @@ def get_plugin_from_request(
     orig_doc_id, orig_par_id = (
         (orig_info.doc_id, orig_info.par_id) if orig_info else (None, None)
     )
-    plug = find_plugin_from_document(doc, task_id, u, view_ctx)
+    plug = find_plugin_from_document_or_preamble(doc, task_id, u, view_ctx)
     par_id = plug.par.get_id()
     if orig_doc_id is None or orig_par_id is None:
         if not doc.has_paragraph(par_id):
@@ -800,6 +830,7 @@ def grant_access_to_session_users(i: ItemOrBlock):
 
 
 def reset_request_access_cache():
+    clear_request_access_memo()
     del_attr_if_exists(g, "manageable")
     del_attr_if_exists(g, "viewable")
     del_attr_if_exists(g, "teachable")
@@ -57,6 +57,38 @@ SECRET_KEY = "85db8764yhfZz7-U.-y968buyn89b54y8y45tg"
 PERMANENT_SESSION_LIFETIME = timedelta(days=14)
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 IMMEDIATE_PRELOAD = False
+# Whether new documents store their paragraphs also in a packed segment file (see timApp/document/parpack.py).
+# Existing documents can be packed with "flask item pack_pars".
+PACK_NEW_DOCUMENTS = False
+# If nonzero, document versions are stored as deltas against the previous version, and a full snapshot of the
+# paragraph list is stored every this many versions (see timApp/document/versionfile.py).
+DOC_VERSION_SNAPSHOT_INTERVAL = 0
+# Maximum size of the per-process cache of paragraph data (see timApp/document/parcache.py). 0 disables the cache.
+PAR_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Whether the paragraph data cache is also shared between workers and hosts via Redis.
+PAR_CACHE_REDIS = False
+# Maximum number of resolved references in the per-process reference cache (see timApp/document/refcache.py).
+# 0 disables the cache.
+REF_CACHE_MAX_ENTRIES = 100_000
+# Backend of the auto macro and heading caches: "sqlite" (shared by the workers of one host) or "redis"
+# (shared by all hosts). See timApp/document/macrocache.py.
+AUTO_MACRO_CACHE_BACKEND = "sqlite"
+AUTO_MACRO_CACHE_SQLITE_PATH = "/tmp/tim_auto_macros.sqlite"
+# Seconds after which the entries that have not been written are pruned from the SQLite auto macro cache.
+AUTO_MACRO_CACHE_MAX_AGE = 3600 * 24 * 7
+# Dumbo (markdown converter) instances. Large conversion batches are split into shards of DUMBO_SHARD_SIZE items
+# (0 disables sharding) that are sent concurrently, at most DUMBO_MAX_WORKERS at a time, to the instances in
+# round-robin order. A request that fails to connect is retried DUMBO_RETRIES times on the next instance.
+# DUMBO_TIMEOUT is the timeout of a request in seconds; None waits for the conversion however long it takes.
+DUMBO_URLS = ["http://dumbo:5000"]
+DUMBO_SHARD_SIZE = 200
+DUMBO_MAX_WORKERS = 8
+DUMBO_RETRIES = 1
+DUMBO_TIMEOUT = None
+# Maximum size of the per-process cache of Dumbo results (see timApp/markdown/dumbocache.py). 0 disables the cache.
+DUMBO_CACHE_MAX_BYTES = 32 * 1024 * 1024
+# Whether the Dumbo result cache is also shared between workers and hosts via Redis.
+DUMBO_CACHE_REDIS = False
 LIBSASS_STYLE = "compressed"
 LIBSASS_INCLUDES = [
     "node_modules/bootstrap-sass/assets/stylesheets",
@@ -85,6 +117,27 @@ LAST_READ_BOOKMARK_LIMIT = 15
 PLUGIN_COUNT_LAZY_LIMIT = 20
 QST_PLUGIN_PORT = 5000
 PLUGIN_CONNECT_TIMEOUT = 0.5
+# Maximum number of concurrent plugin calls when rendering a page. 1 renders the plugins one at a time.
+PLUGIN_MAX_CONCURRENT_CALLS = 8
+# Maximum number of kept-alive connections per plugin host in each worker process.
+PLUGIN_POOL_SIZE = 20
+# Backend of the search routes: "index" uses the full-text index (timApp/util/flask/searchindex.py) and "grep"
+# uses ripgrep on the combined search files. The index is updated incrementally by the update-search-index task
+# and can be rebuilt with "flask search rebuild_index".
+SEARCH_BACKEND = "index"
+# How long plugin reqs responses are cached in Redis and in each worker process, in seconds.
+PLUGIN_REQS_CACHE_TTL = 3600
+PLUGIN_REQS_LOCAL_TTL = 60
+# Maximum duration of a lecture event stream (/lectureEvents) in seconds. The client reconnects after that.
+LECTURE_EVENT_STREAM_SECS = 300
+# Whether documents are printed by Celery print jobs instead of within the print requests.
+PRINT_JOBS_ASYNC = True
+# Maximum number of print jobs running at the same time.
+PRINT_MAX_CONCURRENT_JOBS = 2
+# Maximum duration of a print job in seconds. A job that runs longer no longer blocks identical jobs.
+PRINT_JOB_TIMEOUT = 900
+# Whether the parsed Markdown of printed paragraphs is cached so that reprinting only parses the changed ones.
+PRINT_FRAGMENT_CACHE = True
 
 # When enabled, the readingtypes on_screen and hover_par will not be saved in the database.
 DISABLE_AUTOMATIC_READINGS = False
@@ -116,6 +169,10 @@ CELERYBEAT_SCHEDULE = {
         "task": "timApp.tim_celery.update_search_files",
         "schedule": crontab(hour="*/12", minute="0"),
     },
+    "update-search-index": {
+        "task": "timApp.tim_celery.update_search_index",
+        "schedule": timedelta(seconds=10),
+    },
     "process-notifications": {
         "task": "timApp.tim_celery.process_notifications",
         "schedule": crontab(minute="*/5"),
@@ -0,0 +1,132 @@
+"""An index of the authors of the paragraphs of a document for the show_authors setting.
+
+The index (``authors.json`` in the document directory) is derived from the append-only changelog. For each
+paragraph, it has the user groups that have edited the paragraph, with the number of edits and the time of the
+first edit. It also records how far the changelog has been read, so new changelog entries are added to the index
+incrementally: the document updates the index whenever it writes a changelog entry (:func:`update_author_index`),
+and entries that are missing from the index for some other reason are read from the recorded offset when the
+index is used.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from datetime import timezone
+from pathlib import Path
+from tempfile import mkstemp
+from typing import TYPE_CHECKING, Iterable
+
+import dateutil.parser
+
+from timApp.document.changelog import (
+    AuthorEdits,
+    AuthorInfo,
+    get_authorinfo_for_edits,
+)
+
+if TYPE_CHECKING:
+    from timApp.document.docparagraph import DocParagraph
+    from timApp.document.document import Document
+
+
+class AuthorIndex:
+    def __init__(self, offset: int = 0, seq: int = 0, pars: dict | None = None):
+        # The number of changelog bytes that have been read.
+        self.offset = offset
+        # The number of changelog entries that have been read.
+        self.seq = seq
+        # Paragraph id -> list of [group id, number of edits, time of first edit, seq of last edit].
+        self.pars: dict[str, list[list]] = pars if pars is not None else {}
+
+    @staticmethod
+    def load(path: Path) -> AuthorIndex:
+        try:
+            with path.open("r") as f:
+                d = json.load(f)
+            return AuthorIndex(d["offset"], d["seq"], d["pars"])
+        except (OSError, ValueError, KeyError):
+            return AuthorIndex()
+
+    def save(self, path: Path) -> None:
+        destfd, tmpname = mkstemp(dir=path.parent)
+        with os.fdopen(destfd, "w") as f:
+            json.dump({"offset": self.offset, "seq": self.seq, "pars": self.pars}, f)
+        os.replace(tmpname, path)
+
+    def add_entry(self, entry: dict) -> None:
+        self.seq += 1
+        edits = self.pars.setdefault(entry["par_id"], [])
+        for e in edits:
+            if e[0] == entry["group_id"]:
+                e[1] += 1
+                e[3] = self.seq
+                return
+        edits.append([entry["group_id"], 1, entry["time"], self.seq])
+
+    def catch_up(self, log_path: Path) -> bool:
+        """Adds the changelog entries that have been written after the index was last updated.
+
+        :return: Whether any entries were added.
+        """
+        try:
+            with log_path.open("rb") as f:
+                size = f.seek(0, os.SEEK_END)
+                if size < self.offset:
+                    # The changelog has been rewritten, so the index is rebuilt.
+                    self.offset, self.seq, self.pars = 0, 0, {}
+                f.seek(self.offset)
+                data = f.read()
+        except FileNotFoundError:
+            return False
+        # A concurrent writer may not have finished the last line.
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                self.add_entry(json.loads(line))
+            except (ValueError, KeyError):
+                pass
+        self.offset += end
+        return end > 0
+
+    def get_edits(self, par_ids: Iterable[str]) -> dict[str, dict[int, AuthorEdits]]:
+        """Returns the edits of the given paragraphs, the author with the latest edit first."""
+        result = {}
+        for par_id in par_ids:
+            edits = self.pars.get(par_id)
+            if not edits:
+                continue
+            result[par_id] = {
+                group_id: AuthorEdits(
+                    count,
+                    dateutil.parser.parse(first_time).replace(tzinfo=timezone.utc),
+                )
+                for group_id, count, first_time, _ in sorted(
+                    edits, key=lambda e: e[3], reverse=True
+                )
+            }
+        return result
+
+
+def get_author_index_path(doc: Document) -> Path:
+    return doc.get_doc_dir() / "authors.json"
+
+
+def update_author_index(doc: Document) -> None:
+    """Adds the new changelog entries of the document to its author index. The caller holds the changelog lock."""
+    path = get_author_index_path(doc)
+    index = AuthorIndex.load(path)
+    if index.catch_up(doc.get_appendlog_filename()):
+        index.save(path)
+
+
+def get_authorinfo(doc: Document, pars: list[DocParagraph]) -> dict[str, AuthorInfo]:
+    """Returns the author info of the given paragraphs of the document."""
+    # Documents whose changelog has not been converted have older entries in the legacy file, which is not indexed.
+    if doc.getlogfilename().is_file():
+        return doc.get_changelog(-1).get_authorinfo(pars)
+    index = AuthorIndex.load(get_author_index_path(doc))
+    if index.catch_up(doc.get_appendlog_filename()):
+        with doc.get_changelog_lock():
+            update_author_index(doc)
+    return get_authorinfo_for_edits(index.get_edits({p.get_id() for p in pars}))
@@ -1,4 +1,6 @@
 from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
 from typing import List, Tuple, Optional
 
 import timApp
@@ -8,18 +10,26 @@ from timApp.timdb.sqa import db
 from timApp.timtypes import UserOrGroup
 
 
-def get_author_str(u: UserOrGroup, es: list[ChangelogEntry]):
+@dataclass
+class AuthorEdits:
+    """The edits of one author to a paragraph."""
+
+    count: int
+    first_time: datetime
+
+
+def get_author_str(u: UserOrGroup, edits: AuthorEdits):
     display_name = u.pretty_full_name
-    num_changes = len(es)
+    num_changes = edits.count
     return display_name if num_changes <= 1 else f"{display_name} ({num_changes} edits)"
 
 
 class AuthorInfo:
     def __init__(
-        self, user_map: dict[int, UserOrGroup], entries: dict[int, list[ChangelogEntry]]
+        self, user_map: dict[int, UserOrGroup], edits: dict[int, AuthorEdits]
     ) -> None:
-        self.authors: dict[UserOrGroup, list[ChangelogEntry]] = {}
-        for k, v in entries.items():
+        self.authors: dict[UserOrGroup, AuthorEdits] = {}
+        for k, v in edits.items():
             self.authors[user_map[k]] = v
 
     @property
@@ -28,7 +38,35 @@ class AuthorInfo:
 
     @property
     def time(self):
-        return max(entries[-1].time for entries in self.authors.values())
+        return max(edits.first_time for edits in self.authors.values())
+
+
+def get_authorinfo_for_edits(
+    par_edits: dict[str, dict[int, AuthorEdits]]
+) -> dict[str, AuthorInfo]:
+    """Returns the author info of paragraphs.
+
+    :param par_edits: The edits of each author of each paragraph, the author with the latest edit first.
+    """
+    usergroup_ids = {ug_id for edits in par_edits.values() for ug_id in edits}
+    if not usergroup_ids:
+        return {}
+    ug_obj_map = {}
+    User = timApp.user.user.User
+    UserGroup = timApp.user.usergroup.UserGroup
+    result = (
+        db.session.query(UserGroup, User)
+        .filter(UserGroup.id.in_(usergroup_ids))
+        .outerjoin(User, User.name == UserGroup.name)
+        .all()
+    )  # type: List[Tuple[UserGroup, Optional[User]]]
+    for ug, u in result:
+        ug_obj_map[ug.id] = u or ug
+    return {
+        par_id: AuthorInfo(ug_obj_map, edits)
+        for par_id, edits in par_edits.items()
+        if edits
+    }
 
 
 class Changelog:
@@ -42,33 +80,18 @@ class Changelog:
         return self.entries
 
     def get_authorinfo(self, pars: list[DocParagraph]) -> dict[str, AuthorInfo]:
-        usergroup_ids = set()
+        """Returns the author info of the given paragraphs. The changelog must have the newest entry first.
+
+        Documents normally use the author index instead; see :func:`timApp.document.authorindex.get_authorinfo`.
+        """
         par_ids = {p.get_id() for p in pars}
-        par_author_map = {}
-        if not par_ids:
-            return par_author_map
-        par_entry_map: dict[str, dict[int, list[ChangelogEntry]]] = defaultdict(
-            lambda: defaultdict(list)
-        )
-        ug_obj_map = {}
+        par_edits: dict[str, dict[int, AuthorEdits]] = defaultdict(dict)
         for e in self.entries:
             if e.par_id in par_ids:
-                usergroup_ids.add(e.group_id)
-                par_entry_map[e.par_id][e.group_id].append(e)
-        User = timApp.user.user.User
-        UserGroup = timApp.user.usergroup.UserGroup
-        result = (
-            db.session.query(UserGroup, User)
-            .filter(UserGroup.id.in_(usergroup_ids))
-            .outerjoin(User, User.name == UserGroup.name)
-            .all()
-        )  # type: List[Tuple[UserGroup, Optional[User]]]
-        for ug, u in result:
-            ug_obj_map[ug.id] = u or ug
-        for i in par_ids:
-            entry = par_entry_map.get(i)
-            if not entry:
-                continue
-            par_author_map[i] = AuthorInfo(ug_obj_map, par_entry_map[i])
-
-        return par_author_map
+                edits = par_edits[e.par_id].get(e.group_id)
+                if edits is None:
+                    par_edits[e.par_id][e.group_id] = AuthorEdits(1, e.time)
+                else:
+                    edits.count += 1
+                    edits.first_time = e.time
+        return get_authorinfo_for_edits(par_edits)
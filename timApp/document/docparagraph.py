@@ -2,21 +2,32 @@ from __future__ import annotations
 
 import json
 import os
-import shelve
 from collections import defaultdict
 from copy import copy
 from typing import TYPE_CHECKING
 
 import commonmark
-import filelock
 from commonmark.node import Node
 from jinja2.sandbox import SandboxedEnvironment
 
 from timApp.document.documentparser import DocumentParser
 from timApp.document.documentparseroptions import DocumentParserOptions
 from timApp.document.documentwriter import DocumentWriter
+from timApp.document.macrocache import (
+    get_auto_macro_key,
+    get_cached_auto_macros,
+    get_macro_cache_views,
+    clear_macro_cache,
+)
 from timApp.document.macroinfo import MacroInfo
 from timApp.document.par_basic_data import ParBasicData
+from timApp.document.parcache import par_data_cache
+from timApp.document.refcache import (
+    RefCacheValue,
+    get_ref_cache_key,
+    ref_cache,
+)
+from timApp.document.parpack import get_pack, ParPack, CURRENT_KEY
 from timApp.document.preloadoption import PreloadOption
 from timApp.document.prepared_par import PreparedPar
 from timApp.document.randutils import random_id, hashfunc
@@ -244,9 +255,14 @@ class DocParagraph:
         :return: The retrieved DocParagraph.
 
         """
+        pack = get_pack(doc.doc_id)
+        if pack is not None:
+            d = pack.read(par_id, CURRENT_KEY)
+            if d is not None:
+                return cls.from_dict(doc, d)
         try:
             t = os.readlink(cls._get_path(doc, par_id, "current"))
-            return cls.get(doc, par_id, t)
+            return cls.get_from_pack(pack, doc, par_id, t)
         except FileNotFoundError:
             doc._raise_not_found(par_id)
 
@@ -260,17 +276,46 @@ class DocParagraph:
         :return: The retrieved DocParagraph.
 
         """
-        try:
-            par_path = cls._get_path(doc, par_id, t)
-            with open(par_path) as f:
-                try:
-                    return cls.from_dict(doc, json.loads(f.read()))
-                except json.JSONDecodeError as ex:
-                    raise ValueError(
-                        f"Invalid JSON read from {par_path}: '{ex.doc}'"
-                    ) from ex
-        except FileNotFoundError:
-            doc._raise_not_found(par_id)
+        cached = par_data_cache.get(doc.doc_id, par_id, t)
+        if cached is not None:
+            return cls.from_dict(doc, cached)
+        return cls.__load(get_pack(doc.doc_id), doc, par_id, t)
+
+    @classmethod
+    def get_from_pack(
+        cls, pack: ParPack | None, doc, par_id: str, t: str
+    ) -> DocParagraph:
+        """Retrieves a specific paragraph version, preferring the given pack over the per-paragraph files.
+
+        :param pack: The pack of the document or None if the document is not packed.
+        :param doc: The Document object for which to retrieve the paragraph.
+        :param par_id: The paragraph id.
+        :param t: The paragraph hash.
+        :return: The retrieved DocParagraph.
+
+        """
+        cached = par_data_cache.get(doc.doc_id, par_id, t)
+        if cached is not None:
+            return cls.from_dict(doc, cached)
+        return cls.__load(pack, doc, par_id, t)
+
+    @classmethod
+    def __load(cls, pack: ParPack | None, doc, par_id: str, t: str) -> DocParagraph:
+        d = pack.read(par_id, t) if pack is not None else None
+        if d is None:
+            try:
+                par_path = cls._get_path(doc, par_id, t)
+                with open(par_path) as f:
+                    try:
+                        d = json.loads(f.read())
+                    except json.JSONDecodeError as ex:
+                        raise ValueError(
+                            f"Invalid JSON read from {par_path}: '{ex.doc}'"
+                        ) from ex
+            except FileNotFoundError:
+                return doc._raise_not_found(par_id)
+        par_data_cache.put(doc.doc_id, par_id, t, d)
+        return cls.from_dict(doc, d)
 
     @classmethod
     def _get_path(cls, doc, par_id: str, t: str) -> str:
@@ -584,8 +629,6 @@ class DocParagraph:
             return []
 
         doc_id = pars[0].doc.doc_id
-        macro_cache_file = f"/tmp/tim_auto_macros_{doc_id}"
-        heading_cache_file = f"/tmp/heading_cache_{doc_id}"
 
         first_pars = []
         if context_par is not None:
@@ -593,44 +636,34 @@ class DocParagraph:
             pars = first_pars + pars
 
         if not persist:
+            # The cache objects must be non-persistent, so only the values of the context paragraph are
+            # copied from the persistent cache.
             cache = {}
             heading_cache = {}
-            with shelve.open(macro_cache_file) as c, shelve.open(
-                heading_cache_file
-            ) as hc:
-
-                # Basically we want the cache objects to be non-persistent, so we convert them to normal dicts
-                # Find out better way if possible...
-                for par in first_pars:
-                    key = str((par.get_id(), par.doc.get_version()))
-                    value = c.get(key)
-                    if value is not None:
-                        cache[key] = value
-                    value = hc.get(par.get_id())
-                    if value is not None:
-                        heading_cache[par.get_id()] = value
+            c, hc = get_macro_cache_views(doc_id)
+            for par in first_pars:
+                key = get_auto_macro_key(par)
+                value = c.get(key)
+                if value is not None:
+                    cache[key] = value
+                value = hc.get(key)
+                if value is not None:
+                    heading_cache[key] = value
             unloaded_pars = cls.get_unloaded_pars(
                 pars, settings, cache, heading_cache, clear_cache
             )
         else:
-            with filelock.FileLock(f"/tmp/cache_lock_{doc_id}"):
-                if clear_cache:
-                    try:
-                        os.remove(macro_cache_file + ".db")
-                    except FileNotFoundError:
-                        pass
-                    try:
-                        os.remove(heading_cache_file + ".db")
-                    except FileNotFoundError:
-                        pass
-                with shelve.open(macro_cache_file) as cache, shelve.open(
-                    heading_cache_file
-                ) as heading_cache:
-                    unloaded_pars = cls.get_unloaded_pars(
-                        pars, settings, cache, heading_cache, clear_cache
-                    )
-                    for k, v in heading_cache.items():
-                        heading_cache[k] = v
+            if clear_cache:
+                clear_macro_cache(doc_id)
+            cache, heading_cache = get_macro_cache_views(doc_id)
+            keys = [get_auto_macro_key(par) for par in pars]
+            cache.prefetch(keys)
+            heading_cache.prefetch(keys)
+            unloaded_pars = cls.get_unloaded_pars(
+                pars, settings, cache, heading_cache, clear_cache
+            )
+            cache.flush()
+            heading_cache.flush()
 
         changed_pars = []
         if len(unloaded_pars) > 0:
@@ -684,8 +717,8 @@ class DocParagraph:
         :param pars: The list of paragraphs to be processed.
         :param settings: The settings for the document.
         :param auto_macro_cache: The cache object from which to retrieve and store the auto macro data.
-        :param heading_cache: A cache object to store headings into. The key is paragraph id and value is a list of headings
-         in that paragraph.
+        :param heading_cache: A cache object to store headings into. The key is the same as in auto_macro_cache and
+         value is a list of headings in that paragraph.
         :param clear_cache: Whether all caches should be refreshed.
         :return: A 5-tuple of the form:
           (paragraph, hash of the auto macro values, auto macros, so far used headings, old HTML).
@@ -716,7 +749,7 @@ class DocParagraph:
                 )
             auto_macro_hash = hashfunc(settings_hash + str(auto_macros))
 
-            par_headings = heading_cache.get(par.get_id())
+            par_headings = heading_cache.get(get_auto_macro_key(par))
             if cumulative_headings:
                 # Performance optimization: copy only if the set of headings changes
                 if par_headings:
@@ -778,8 +811,8 @@ class DocParagraph:
         """Returns the auto macros values for the current paragraph. Auto macros include things like current
         heading/table/figure numbers.
 
-        :param heading_cache: A cache object to store headings into. The key is paragraph id and value is a list of headings
-         in that paragraph.
+        :param heading_cache: A cache object to store headings into. The key is the same as in auto_macro_cache and
+         value is a list of headings in that paragraph.
         :param macros: Macros to apply for the paragraph.
         :param auto_macro_cache: The cache object from which to retrieve and store the auto macro data.
         :param auto_number_start: Object of heading start numbers.
@@ -789,7 +822,7 @@ class DocParagraph:
 
         """
 
-        key = str((self.get_id(), self.doc.get_version()))
+        key = get_auto_macro_key(self)
         cached = auto_macro_cache.get(key)
         if cached is not None:
             return cached
@@ -797,7 +830,7 @@ class DocParagraph:
         prev_par: DocParagraph = self.doc.get_previous_par(self)
         if prev_par is None:
             prev_par_auto_values = {"h": auto_number_start}
-            heading_cache[self.get_id()] = []
+            heading_cache[key] = []
         else:
             prev_par_auto_values = prev_par.get_auto_macro_values(
                 macros, env, auto_macro_cache, heading_cache, auto_number_start
@@ -818,7 +851,7 @@ class DocParagraph:
             or (deref and deref.has_class("nonumber"))
         ):
             auto_macro_cache[key] = prev_par_auto_values
-            heading_cache[self.get_id()] = []
+            heading_cache[key] = []
             return prev_par_auto_values
 
         md_expanded = prev_par.md
@@ -850,7 +883,7 @@ class DocParagraph:
                 deltas[level] += 1
                 for i in range(level + 1, 7):
                     deltas[i] = auto_number_start.get(i, 0)
-        heading_cache[self.get_id()] = title_ids
+        heading_cache[key] = title_ids
         result = {"h": deltas}
         auto_macro_cache[key] = result
         return result
@@ -956,8 +989,13 @@ class DocParagraph:
             if not os.path.exists(base_path):
                 os.makedirs(base_path)
 
+        d = self.dict(include_html_cache=True)
         with open(file_name, "w") as f:
-            f.write(json.dumps(self.dict(include_html_cache=True)))
+            f.write(json.dumps(d))
+        par_data_cache.put(self.doc.doc_id, self.id, self.hash, d)
+        pack = get_pack(self.doc.doc_id, for_write=True)
+        if pack is not None:
+            pack.append(d)
 
     def set_latest(self):
         """Updates the 'current' symlink to point to this paragraph version."""
@@ -967,6 +1005,9 @@ class DocParagraph:
         if os.path.islink(linkpath) or os.path.isfile(linkpath):
             os.unlink(linkpath)
         os.symlink(self.get_hash(), linkpath)
+        pack = get_pack(self.doc.doc_id, for_write=True)
+        if pack is not None and not pack.set_current(self.get_id(), self.get_hash()):
+            pack.append(self.dict(include_html_cache=True), set_current=True)
 
     def clone(self) -> DocParagraph:
         """Clones the paragraph.
@@ -1085,36 +1126,33 @@ class DocParagraph:
         if not ref_doc.exists():
             raise InvalidReferenceException("The referenced document does not exist.")
 
-        if self.is_par_reference():
-            try:
-                par = ref_doc.get_paragraph(attrs["rp"])
-                par.prev_deref = self
-            except TimDbException:
-                raise InvalidReferenceException(
-                    "The referenced paragraph does not exist."
-                )
-
-            if par.is_reference():
-                ref_pars = par.get_referenced_pars_impl(visited_pars=visited_pars)
-            else:
-                ref_pars = [par]
-        elif self.is_area_reference():
-            if self.is_translation():
-                raise InvalidReferenceException(
-                    "A translated paragraph cannot be an area reference."
-                )
-            section_pars = ref_doc.get_named_section(attrs["ra"])
-            ref_pars = []
-            for p in section_pars:
-                p.prev_deref = self
-                if p.is_reference():
-                    ref_pars.extend(
-                        p.get_referenced_pars_impl(visited_pars=visited_pars)
+        if self.is_area_reference() and self.is_translation():
+            raise InvalidReferenceException(
+                "A translated paragraph cannot be an area reference."
+            )
+        key = get_ref_cache_key(self, ref_doc)
+        pars = get_cached_ref_pars(ref_doc, ref_cache.get(key))
+        if pars is None:
+            if self.is_par_reference():
+                try:
+                    pars = [ref_doc.get_paragraph(attrs["rp"])]
+                except TimDbException:
+                    raise InvalidReferenceException(
+                        "The referenced paragraph does not exist."
                     )
-                else:
-                    ref_pars.append(p)
-        else:
-            assert False
+            elif self.is_area_reference():
+                pars = ref_doc.get_named_section(attrs["ra"])
+            else:
+                assert False
+            ref_cache.put(key, pars)
+
+        ref_pars = []
+        for p in pars:
+            p.prev_deref = self
+            if p.is_reference():
+                ref_pars.extend(p.get_referenced_pars_impl(visited_pars=visited_pars))
+            else:
+                ref_pars.append(p)
         return ref_pars
 
     def is_dynamic(self) -> bool:
@@ -1268,6 +1306,24 @@ def create_reference(
     return par
 
 
+def get_cached_ref_pars(
+    ref_doc: Document, entry: RefCacheValue | None
+) -> list[DocParagraph] | None:
+    """Returns the paragraphs of a cached reference, or None if they are not available in the referenced document."""
+    if entry is None:
+        return None
+    pars = []
+    for par_id, t in entry:
+        try:
+            p = ref_doc.get_paragraph(par_id)
+        except TimDbException:
+            return None
+        if p.get_hash() != t:
+            return None
+        pars.append(p)
+    return pars
+
+
 def create_final_par(
     reached_par: DocParagraph, view_ctx: ViewContext | None
 ) -> DocParagraph:
@@ -1347,12 +1403,7 @@ def create_final_par(
 
 
 def get_heading_counts(ctx: DocParagraph):
-    d = ctx.doc
-    macro_cache_file = f"/tmp/tim_auto_macros_{d.doc_id}"
-    ps = commonmark.Parser()
-    with shelve.open(macro_cache_file) as cache:
-        vals = cache.get(str((ctx.get_id(), d.get_version())), {}).get("h")
-        return vals
+    return (get_cached_auto_macros(ctx) or {}).get("h")
 
 
 def add_heading_numbers(
@@ -1364,13 +1415,10 @@ def add_heading_numbers(
     counters: AutoCounters = None,
     initial_heading_counts: dict[int, int] | None = None,
 ):
-    d = ctx.doc
-    macro_cache_file = f"/tmp/tim_auto_macros_{ctx.doc.doc_id}"
     # TODO: Cache sould be picked up only once and used as a paramter
     ps = commonmark.Parser()
     parsed = ps.parse(s)
-    with shelve.open(macro_cache_file) as cache:
-        vals = cache.get(str((ctx.get_id(), d.get_version())), {}).get("h")
+    vals = (get_cached_auto_macros(ctx) or {}).get("h")
     if not vals:
         return s
     lines = s.splitlines(keepends=False)
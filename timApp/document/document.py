@@ -8,12 +8,13 @@ from difflib import SequenceMatcher
 from pathlib import Path
 from tempfile import mkstemp
 from time import time
-from typing import Iterable, Generator
+from typing import Iterable, Generator, Callable
 from typing import TYPE_CHECKING
 
 from filelock import FileLock
 from lxml import etree, html
 
+from timApp.document.authorindex import get_author_index_path, update_author_index
 from timApp.document.changelog import Changelog
 from timApp.document.changelogentry import ChangelogEntry
 from timApp.document.docparagraph import DocParagraph
@@ -23,9 +24,17 @@ from timApp.document.documentparseroptions import DocumentParserOptions
 from timApp.document.documentwriter import DocumentWriter
 from timApp.document.editing.documenteditresult import DocumentEditResult
 from timApp.document.exceptions import DocExistsError, ValidationException
+from timApp.document.parpack import get_pack, init_pack, pack_new_documents
 from timApp.document.preloadoption import PreloadOption
 from timApp.document.validationresult import ValidationResult
 from timApp.document.version import Version
+from timApp.document.versioncache import set_latest_version
+from timApp.document.versionfile import (
+    ParEntry,
+    VersionDelta,
+    read_version_file,
+    write_version_file,
+)
 from timApp.document.viewcontext import ViewContext, default_view_ctx
 from timApp.document.yamlblock import YamlBlock
 from timApp.timdb.exceptions import (
@@ -34,11 +43,22 @@ from timApp.timdb.exceptions import (
     InvalidReferenceException,
 )
 from timApp.timtypes import DocInfoType
-from timApp.util.utils import get_error_html, trim_markdown, cache_folder_path
+from timApp.util.utils import (
+    get_error_html,
+    trim_markdown,
+    cache_folder_path,
+    read_lines_reversed,
+)
 from tim_common.html_sanitize import presanitize_html_body
 
 if TYPE_CHECKING:
     from timApp.document.docinfo import DocInfo
+    from timApp.plugin.taskindex import TaskIndex
+
+
+# Functions that are called with the document id whenever a new version of a document has been published.
+# Modules that keep data derived from the document contents (e.g. the search index) register themselves here.
+new_version_hooks: list[Callable[[int], None]] = []
 
 
 def get_duplicate_id_msg(conflicting_ids):
@@ -92,6 +112,8 @@ class Document:
         self.par_map = None
         # List of preamble pars if they have been inserted
         self.preamble_pars = None
+        # The task index and the version it was updated for; see timApp/plugin/taskindex.py
+        self.task_index_cache: tuple[Version, TaskIndex] | None = None
 
     @property
     def id(self):
@@ -103,7 +125,7 @@ class Document:
 
         return get_files_path() / "docs"
 
-    def get_doc_dir(self):
+    def get_doc_dir(self) -> Path:
         return self.get_documents_dir() / str(self.doc_id)
 
     def __repr__(self):
@@ -298,6 +320,8 @@ class Document:
         if not path.exists():
             path.mkdir(exist_ok=True, parents=True)
             self.__exists = None
+            if pack_new_documents():
+                init_pack(self.doc_id)
         elif not ignore_exists:
             raise DocExistsError(self.doc_id)
 
@@ -394,11 +418,45 @@ class Document:
     def get_version(self) -> Version:
         """Gets the latest version of the document as a major-minor tuple.
 
-        :return: Latest version, or (-1, 0) if there isn't yet one.
+        The latest version is read from the version file of the document (see :meth:`get_version_file`).
+
+        :return: Latest version, or (0, 0) if there isn't yet one.
 
         """
         if self.version is not None:
             return self.version
+        ver = self.__read_version_file()
+        if ver is None:
+            ver = self.__repair_version_file()
+        self.version = ver
+        return ver
+
+    def get_version_file(self) -> Path:
+        """Returns the path of the file that has the latest version of the document.
+
+        The file is updated under the version lock after the contents of a new version have been written, so
+        reading the latest version does not require listing the version directories and the version that it
+        points to is always complete.
+        """
+        return self.get_doc_dir() / "version"
+
+    def get_version_lock(self) -> FileLock:
+        return FileLock(f"/tmp/doc_{self.doc_id}_version_lock")
+
+    def __read_version_file(self) -> Version | None:
+        try:
+            major, minor = self.get_version_file().read_text().split()
+            return int(major), int(minor)
+        except (OSError, ValueError):
+            return None
+
+    def __write_version_file(self, ver: Version):
+        destfd, tmpname = mkstemp(dir=self.get_doc_dir())
+        with os.fdopen(destfd, "w") as f:
+            f.write(f"{ver[0]} {ver[1]}")
+        os.replace(tmpname, self.get_version_file())
+
+    def __scan_latest_version(self) -> Version:
         basedir = self.get_doc_dir()
         major = self.__get_largest_file_number(basedir, default=0)
         minor = (
@@ -406,9 +464,22 @@ class Document:
             if major < 1
             else self.__get_largest_file_number(basedir / str(major), default=0)
         )
-        self.version = major, minor
         return major, minor
 
+    def __repair_version_file(self) -> Version:
+        """Determines the latest version from the version directories and writes it to the version file.
+
+        This is only needed for documents created before the version file existed or if the file is corrupted.
+        """
+        if not self.get_doc_dir().exists():
+            return 0, 0
+        with self.get_version_lock():
+            ver = self.__read_version_file()
+            if ver is None:
+                ver = self.__scan_latest_version()
+                self.__write_version_file(ver)
+        return ver
+
     def get_id_version(self) -> tuple[int, int, int]:
         major, minor = self.get_version()
         return self.doc_id, major, minor
@@ -445,16 +516,19 @@ class Document:
         return self.get_refs_dir(ver) / "reflist_to"
 
     def getlogfilename(self) -> Path:
+        """Returns the path of the legacy changelog file that has the newest entry first.
+
+        New entries are never written to this file; see :meth:`get_appendlog_filename`.
+        """
         return self.get_doc_dir() / "changelog"
 
+    def get_appendlog_filename(self) -> Path:
+        """Returns the path of the append-only changelog file that has the newest entry last."""
+        return self.get_doc_dir() / "changelog.log"
+
     def __write_changelog(
         self, ver: Version, operation: str, par_id: str, op_params: dict | None = None
     ):
-        logname = self.getlogfilename()
-        src = logname.open("r") if logname.exists() else None
-        destfd, tmpname = mkstemp()
-        dest = os.fdopen(destfd, "w")
-
         ts = time()
         timestamp = datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
         entry = {
@@ -465,40 +539,89 @@ class Document:
             "ver": ver,
             "time": timestamp,
         }
-        dest.write(json.dumps(entry))
-        dest.write("\n")
+        with self.get_changelog_lock():
+            with self.get_appendlog_filename().open("a") as f:
+                f.write(json.dumps(entry) + "\n")
+            update_author_index(self)
 
-        while src:
-            line = src.readline()
-            if line:
-                dest.write(line)
-            else:
-                src.close()
-                src = None
+    def get_changelog_lock(self) -> FileLock:
+        return FileLock(f"/tmp/doc_{self.doc_id}_changelog_lock")
 
-        dest.close()
-        shutil.copyfile(tmpname, logname)
-        os.unlink(tmpname)
+    def convert_changelog(self) -> int:
+        """Merges the legacy changelog file into the append-only changelog file.
+
+        :return: The number of converted entries.
+        """
+        legacy_name = self.getlogfilename()
+        if not legacy_name.is_file():
+            return 0
+        appendlog_name = self.get_appendlog_filename()
+        with self.get_changelog_lock():
+            with legacy_name.open("r") as f:
+                legacy_lines = [line for line in f if line.strip()]
+            destfd, tmpname = mkstemp(dir=self.get_doc_dir())
+            with os.fdopen(destfd, "w") as dest:
+                for line in reversed(legacy_lines):
+                    dest.write(line if line.endswith("\n") else line + "\n")
+                if appendlog_name.is_file():
+                    with appendlog_name.open("r") as src:
+                        shutil.copyfileobj(src, dest)
+            os.replace(tmpname, appendlog_name)
+            legacy_name.unlink()
+            # The index offsets refer to the old file.
+            get_author_index_path(self).unlink(missing_ok=True)
+        return len(legacy_lines)
 
     def __increment_version(
-        self, op: str, par_id: str, increment_major: bool, op_params: dict | None = None
+        self,
+        op: str,
+        par_id: str,
+        increment_major: bool,
+        old_ver: Version,
+        old_depth: int,
+        entries: list[ParEntry],
+        delta: VersionDelta,
+        op_params: dict | None = None,
     ) -> Version:
+        """Writes a new version of the document.
+
+        The contents of the new version are written before it becomes the latest version, so readers never see
+        a version without its contents.
+
+        :param old_ver: The version that the new version is based on.
+        :param old_depth: The delta depth of the old version.
+        :param entries: The paragraph list of the new version.
+        :param delta: The operations that transform the old version into the new one.
+        :return: The new version.
+        """
         ver_exists = True
         ver = self.get_version()
-        old_ver = None
-        while ver_exists:
-            old_ver = ver
-            ver = (
-                (old_ver[0] + 1, 0) if increment_major else (old_ver[0], old_ver[1] + 1)
+        with self.get_version_lock():
+            while ver_exists:
+                prev_ver = ver
+                ver = (
+                    (prev_ver[0] + 1, 0)
+                    if increment_major
+                    else (prev_ver[0], prev_ver[1] + 1)
+                )
+                ver_exists = (self.get_version_path(ver)).is_file()
+            if increment_major:
+                (self.get_documents_dir() / str(self.doc_id) / str(ver[0])).mkdir()
+            write_version_file(
+                self.get_version_path(ver),
+                entries,
+                base_ver=old_ver if self.version_exists(self.doc_id, old_ver) else None,
+                base_depth=old_depth,
+                delta=delta,
             )
-            ver_exists = (self.get_version_path(ver)).is_file()
-        if increment_major:
-            (self.get_documents_dir() / str(self.doc_id) / str(ver[0])).mkdir()
-        if old_ver[0] > 0:
-            shutil.copyfile(self.get_version_path(old_ver), self.get_version_path(ver))
-        else:
-            with self.get_version_path(ver).open("w"):
-                pass
+            latest = self.__read_version_file()
+            if latest is None or latest < ver:
+                # The version file and the Redis hint are published together and only after the contents, so
+                # neither points to an incomplete version or goes back to an older one.
+                self.__write_version_file(ver)
+                set_latest_version(self.doc_id, ver)
+        for hook in new_version_hooks:
+            hook(self.doc_id)
         self.__write_changelog(ver, op, par_id, op_params)
         self.version = ver
         self.par_cache = None
@@ -512,6 +635,12 @@ class Document:
         self.ref_doc_cache = {}
         return ver
 
+    def __read_version_entries(self, ver: Version) -> tuple[list[ParEntry], int]:
+        path = self.get_version_path(ver)
+        if not path.is_file():
+            return [], 0
+        return read_version_file(path)
+
     def __update_metadata(
         self, pars: list[DocParagraph], old_ver: Version, new_ver: Version
     ):
@@ -593,15 +722,13 @@ class Document:
         p.store()
         p.set_latest()
         old_ver = self.get_version()
-        new_ver = self.__increment_version("Added", p.get_id(), increment_major=True)
-        old_path = self.get_version_path(old_ver)
-        new_path = self.get_version_path(new_ver)
-        if old_path.exists():
-            shutil.copyfile(old_path, new_path)
-
-        with new_path.open("a") as f:
-            f.write(p.get_id() + "/" + p.get_hash())
-            f.write("\n")
+        entries, depth = self.__read_version_entries(old_ver)
+        delta = VersionDelta()
+        delta.insert(len(entries), (p.get_id(), p.get_hash()))
+        entries.append((p.get_id(), p.get_hash()))
+        new_ver = self.__increment_version(
+            "Added", p.get_id(), True, old_ver, depth, entries, delta
+        )
         if update_meta:
             self.__update_metadata([p], old_ver, new_ver)
         return p
@@ -628,20 +755,19 @@ class Document:
         """
         self.raise_if_not_exist(par_id)
         old_ver = self.get_version()
-        new_ver = self.__increment_version("Deleted", par_id, increment_major=True)
+        entries, depth = self.__read_version_entries(old_ver)
+        delta = VersionDelta()
+        new_entries = []
+        for entry in entries:
+            if entry[0] == par_id:
+                delta.delete(len(new_entries))
+            else:
+                new_entries.append(entry)
+        new_ver = self.__increment_version(
+            "Deleted", par_id, True, old_ver, depth, new_entries, delta
+        )
         self.__update_metadata([], old_ver, new_ver)
 
-        with self.get_version_path(old_ver).open("r") as f_src:
-            with self.get_version_path(new_ver).open("w") as f:
-                while True:
-                    line = f_src.readline()
-                    if not line:
-                        return
-                    if line.startswith(par_id):
-                        pass
-                    else:
-                        f.write(line)
-
     def insert_paragraph(
         self,
         text: str,
@@ -681,29 +807,30 @@ class Document:
         p.store()
         p.set_latest()
         old_ver = self.get_version()
+        new_entry = p.get_id(), p.get_hash()
+        entries, depth = self.__read_version_entries(old_ver)
+        delta = VersionDelta()
+        new_entries = []
+        for par_id, t in entries:
+            if insert_before_id and par_id == insert_before_id:
+                delta.insert(len(new_entries), new_entry)
+                new_entries.append(new_entry)
+            new_entries.append((par_id, t))
+            if insert_after_id and par_id == insert_after_id:
+                delta.insert(len(new_entries), new_entry)
+                new_entries.append(new_entry)
         new_ver = self.__increment_version(
             "Inserted",
             p.get_id(),
-            increment_major=True,
+            True,
+            old_ver,
+            depth,
+            new_entries,
+            delta,
             op_params={"before_id": insert_before_id}
             if insert_before_id
             else {"after_id": insert_after_id},
         )
-
-        new_line = p.get_id() + "/" + p.get_hash() + "\n"
-        with self.get_version_path(old_ver).open("r") as f_src, self.get_version_path(
-            new_ver
-        ).open("w") as f:
-            while True:
-                line = f_src.readline()
-                if not line:
-                    break
-
-                if insert_before_id and line.startswith(insert_before_id):
-                    f.write(new_line)
-                f.write(line)
-                if insert_after_id and line.startswith(insert_after_id):
-                    f.write(new_line)
         self.__update_metadata([p], old_ver, new_ver)
         return p
 
@@ -740,27 +867,22 @@ class Document:
         old_hash = p_src.get_hash()
         if p.is_same_as(p_src):
             return p
+        entries, depth = self.__read_version_entries(old_ver)
+        delta = VersionDelta()
+        for i, entry in enumerate(entries):
+            if entry[0] == par_id:
+                entries[i] = par_id, new_hash
+                delta.replace(i, entries[i])
         new_ver = self.__increment_version(
             "Modified",
             par_id,
-            increment_major=False,
+            False,
+            old_ver,
+            depth,
+            entries,
+            delta,
             op_params={"old_hash": old_hash, "new_hash": new_hash},
         )
-
-        old_line_start = f"{par_id}/"
-        old_line_legacy = f"{par_id}\n"
-        new_line = f"{par_id}/{new_hash}\n"
-        with self.get_version_path(old_ver).open("r") as f_src, self.get_version_path(
-            new_ver
-        ).open("w") as f:
-            while True:
-                line = f_src.readline()
-                if not line:
-                    break
-                if line.startswith(old_line_start) or line == old_line_legacy:
-                    f.write(new_line)
-                else:
-                    f.write(line)
         self.__update_metadata([p], old_ver, new_ver)
         return p
 
@@ -978,22 +1100,29 @@ class Document:
 
     def get_changelog(self, max_entries: int = 100) -> Changelog:
         log = Changelog()
-        logname = self.getlogfilename()
-        if not logname.is_file():
-            return Changelog()
-
         lc = max_entries
-        with logname.open("r") as f:
-            while lc != 0:
-                line = f.readline()
-                if not line:
-                    break
-                try:
-                    entry = json.loads(line)
-                    log.append(ChangelogEntry(**entry))
-                except ValueError:
-                    print(f"doc id {self.doc_id}: malformed log line: {line}")
-                lc -= 1
+
+        def read_lines() -> Generator[str, None, None]:
+            appendlog_name = self.get_appendlog_filename()
+            if appendlog_name.is_file():
+                yield from read_lines_reversed(appendlog_name)
+            # Documents whose changelog has not been converted have older entries in the legacy file.
+            logname = self.getlogfilename()
+            if logname.is_file():
+                with logname.open("r") as f:
+                    yield from f
+
+        lines = read_lines()
+        for line in lines:
+            if lc == 0:
+                break
+            try:
+                entry = json.loads(line)
+                log.append(ChangelogEntry(**entry))
+            except ValueError:
+                print(f"doc id {self.doc_id}: malformed log line: {line}")
+            lc -= 1
+        lines.close()
 
         return log
 
@@ -1165,18 +1294,10 @@ class Document:
         self.par_hashes = []
         if not self.get_version_path().exists():
             return
-        with self.get_version_path().open("r", encoding="UTF-8") as f:
-            while True:
-                line = f.readline()
-                if not line:
-                    break
-                if len(line) > 14:
-                    # Line contains both par_id and t
-                    par_id, t = line.replace("\n", "").split("/")
-                else:
-                    par_id, t = line.replace("\n", ""), None
-                self.par_ids.append(par_id)
-                self.par_hashes.append(t)
+        entries, _ = read_version_file(self.get_version_path())
+        for par_id, t in entries:
+            self.par_ids.append(par_id)
+            self.par_hashes.append(t)
 
     def insert_preamble_pars(self, class_names: list[str] | None = None):
         """
@@ -1314,7 +1435,8 @@ class DocParagraphIter:
         self.doc = doc
         self.next_index = 0
         name = doc.get_version_path(doc.get_version())
-        self.f = name.open("r") if name.is_file() else None
+        self.entries = iter(read_version_file(name)[0]) if name.is_file() else None
+        self.pack = get_pack(doc.doc_id) if self.entries else None
 
     def __enter__(self):
         return self
@@ -1326,31 +1448,25 @@ class DocParagraphIter:
         return self
 
     def __next__(self) -> DocParagraph:
-        if not self.f:
+        if not self.entries:
             raise StopIteration
-        while True:
-            line = self.f.readline()
-            if not line:
-                self.close()
-                raise StopIteration
-            if line != "\n":
-                if len(line) > 14:
-                    # Line contains both par_id and t
-                    par_id, t = line.rstrip("\n").split("/")
-                    cached = self.doc.single_par_cache.get(par_id)
-                    if cached:
-                        return cached
-                    fetched = DocParagraph.get(self.doc, par_id, t)
-                    self.doc.single_par_cache[par_id] = fetched
-                    return fetched
-                else:
-                    # Line contains just par_id, use the latest t
-                    return DocParagraph.get_latest(self.doc, line.rstrip("\n"))
+        try:
+            par_id, t = next(self.entries)
+        except StopIteration:
+            self.close()
+            raise
+        if t is None:
+            # Entry contains just par_id, use the latest t
+            return DocParagraph.get_latest(self.doc, par_id)
+        cached = self.doc.single_par_cache.get(par_id)
+        if cached:
+            return cached
+        fetched = DocParagraph.get_from_pack(self.pack, self.doc, par_id, t)
+        self.doc.single_par_cache[par_id] = fetched
+        return fetched
 
     def close(self):
-        if self.f:
-            self.f.close()
-            self.f = None
+        self.entries = None
 
 
 def get_index_from_html_list(html_table) -> list[tuple]:
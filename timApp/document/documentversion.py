@@ -6,6 +6,7 @@ from timApp.document.docsettings import DocSettings
 from timApp.document.document import Document
 from timApp.document.preloadoption import PreloadOption
 from timApp.document.version import Version
+from timApp.document.versionfile import read_version_file
 
 
 class DocumentVersion(Document):
@@ -27,16 +28,9 @@ class DocumentVersion(Document):
 
     def cache_index(self):
         if self.index is None:
-            self.index = {}
-            with open(self.get_version_path(self.version)) as f:
-                while True:
-                    line = f.readline()
-                    if line == "":
-                        self.indexlen = len(self.index)
-                        return
-                    entry = line.rstrip("\n").split("/")
-                    if len(entry) > 1:
-                        self.index[entry[0]] = entry[1]
+            entries, _ = read_version_file(self.get_version_path(self.version))
+            self.index = {par_id: t for par_id, t in entries if t is not None}
+            self.indexlen = len(self.index)
 
     def __len__(self) -> int:
         self.cache_index()
@@ -0,0 +1,240 @@
+"""Caches for auto macro values (heading numbers) and headings of paragraphs.
+
+Computing the auto macro values of a paragraph requires the values of all previous paragraphs, so they are cached
+per document. The cache keys contain the document version (see :func:`get_auto_macro_key`), which means a cached
+value never becomes stale and concurrent writers always write the same value. Therefore no locking is needed.
+
+There are two backends, selected with ``AUTO_MACRO_CACHE_BACKEND``:
+
+* ``sqlite``: an SQLite database in WAL mode (``AUTO_MACRO_CACHE_SQLITE_PATH``) shared by the workers of one host.
+  Entries that have not been written for ``AUTO_MACRO_CACHE_MAX_AGE`` seconds are pruned, so the entries of old
+  document versions do not accumulate.
+* ``redis``: Redis hashes shared by all hosts. The hashes expire after a week without writes.
+
+Values are pickled because the auto macro values are dicts with integer keys.
+"""
+
+from __future__ import annotations
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from functools import cache
+from typing import Any, Iterable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from timApp.document.docparagraph import DocParagraph
+
+AUTO_MACROS = "auto_macros"
+HEADINGS = "headings"
+
+REDIS_EXPIRE_SECS = 3600 * 24 * 7
+
+_missing = object()
+
+
+def get_auto_macro_key(par: DocParagraph) -> str:
+    return str((par.get_id(), par.doc.get_version()))
+
+
+class MacroCacheBackend(ABC):
+    @abstractmethod
+    def get_many(self, doc_id: int, kind: str, keys: list[str]) -> dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def set_many(self, doc_id: int, kind: str, items: dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self, doc_id: int | None) -> None:
+        """Clears the cache of the given document or, if doc_id is None, of all documents."""
+
+
+class SqliteMacroCacheBackend(MacroCacheBackend):
+    # How often (at most) each process prunes the old entries.
+    PRUNE_INTERVAL_SECS = 3600
+
+    def __init__(self, path: str, max_age: int):
+        self.path = path
+        self.max_age = max_age
+        # SQLite connections must not be shared between threads or with forked worker processes.
+        self.local = threading.local()
+        self.last_prune = 0.0
+
+    def get_conn(self) -> sqlite3.Connection:
+        conn: sqlite3.Connection | None = getattr(self.local, "conn", None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            columns = [r[1] for r in conn.execute("PRAGMA table_info(macro_cache)")]
+            if columns and "updated" not in columns:
+                # The table was created before entries were pruned; it is only a cache.
+                conn.execute("DROP TABLE macro_cache")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS macro_cache ("
+                "doc_id INTEGER NOT NULL, kind TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, "
+                "updated REAL NOT NULL, PRIMARY KEY (doc_id, kind, key)) WITHOUT ROWID"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS macro_cache_updated_idx ON macro_cache (updated)"
+            )
+        return conn
+
+    def get_many(self, doc_id: int, kind: str, keys: list[str]) -> dict[str, Any]:
+        result = {}
+        conn = self.get_conn()
+        # Stay below the default maximum number of SQLite host parameters.
+        for i in range(0, len(keys), 900):
+            chunk = keys[i : i + 900]
+            rows = conn.execute(
+                f"SELECT key, value FROM macro_cache WHERE doc_id = ? AND kind = ? "
+                f"AND key IN ({','.join('?' * len(chunk))})",
+                [doc_id, kind, *chunk],
+            )
+            for key, value in rows:
+                result[key] = pickle.loads(value)
+        return result
+
+    def set_many(self, doc_id: int, kind: str, items: dict[str, Any]) -> None:
+        conn = self.get_conn()
+        now = time.time()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT OR REPLACE INTO macro_cache (doc_id, kind, key, value, updated) VALUES (?, ?, ?, ?, ?)",
+                [(doc_id, kind, k, pickle.dumps(v), now) for k, v in items.items()],
+            )
+        if now - self.last_prune > self.PRUNE_INTERVAL_SECS:
+            self.last_prune = now
+            self.prune(now - self.max_age)
+
+    def prune(self, older_than: float) -> None:
+        """Deletes the entries that have not been written since the given time."""
+        self.get_conn().execute(
+            "DELETE FROM macro_cache WHERE updated < ?", [older_than]
+        )
+
+    def clear(self, doc_id: int | None) -> None:
+        conn = self.get_conn()
+        if doc_id is None:
+            conn.execute("DELETE FROM macro_cache")
+        else:
+            conn.execute("DELETE FROM macro_cache WHERE doc_id = ?", [doc_id])
+
+
+class RedisMacroCacheBackend(MacroCacheBackend):
+    @staticmethod
+    def get_redis_key(doc_id: int, kind: str) -> str:
+        return f"tim-{kind}-{doc_id}"
+
+    def get_many(self, doc_id: int, kind: str, keys: list[str]) -> dict[str, Any]:
+        from timApp.document.caching import rclient
+
+        if not keys:
+            return {}
+        values = rclient.hmget(self.get_redis_key(doc_id, kind), keys)
+        return {k: pickle.loads(v) for k, v in zip(keys, values) if v is not None}
+
+    def set_many(self, doc_id: int, kind: str, items: dict[str, Any]) -> None:
+        from timApp.document.caching import rclient
+
+        rkey = self.get_redis_key(doc_id, kind)
+        pipe = rclient.pipeline()
+        pipe.hset(rkey, mapping={k: pickle.dumps(v) for k, v in items.items()})
+        pipe.expire(rkey, REDIS_EXPIRE_SECS)
+        pipe.execute()
+
+    def clear(self, doc_id: int | None) -> None:
+        from timApp.document.caching import rclient
+
+        if doc_id is None:
+            for kind in (AUTO_MACROS, HEADINGS):
+                for key in rclient.scan_iter(match=f"tim-{kind}-*", count=1000):
+                    rclient.delete(key)
+            return
+        rclient.delete(
+            self.get_redis_key(doc_id, AUTO_MACROS),
+            self.get_redis_key(doc_id, HEADINGS),
+        )
+
+
+@cache
+def get_macro_cache_backend() -> MacroCacheBackend:
+    from timApp.tim_app import app
+
+    backend = app.config["AUTO_MACRO_CACHE_BACKEND"]
+    if backend == "redis":
+        return RedisMacroCacheBackend()
+    if backend == "sqlite":
+        return SqliteMacroCacheBackend(
+            app.config["AUTO_MACRO_CACHE_SQLITE_PATH"],
+            app.config["AUTO_MACRO_CACHE_MAX_AGE"],
+        )
+    raise Exception(f"Unknown AUTO_MACRO_CACHE_BACKEND: {backend}")
+
+
+class MacroCacheView:
+    """A dict-like view to one kind of cache of a document.
+
+    Values are read through from the backend and memoized locally. Writes are buffered until :meth:`flush`.
+    """
+
+    def __init__(self, backend: MacroCacheBackend, doc_id: int, kind: str):
+        self.backend = backend
+        self.doc_id = doc_id
+        self.kind = kind
+        self.local: dict[str, Any] = {}
+        self.dirty: dict[str, Any] = {}
+
+    def prefetch(self, keys: Iterable[str]) -> None:
+        """Fetches the given keys from the backend in one batch."""
+        missing = [k for k in keys if k not in self.local]
+        if not missing:
+            return
+        found = self.backend.get_many(self.doc_id, self.kind, missing)
+        for k in missing:
+            self.local[k] = found.get(k)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.local.get(key, _missing)
+        if value is _missing:
+            value = self.backend.get_many(self.doc_id, self.kind, [key]).get(key)
+            self.local[key] = value
+        return default if value is None else value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.local[key] = value
+        self.dirty[key] = value
+
+    def flush(self) -> None:
+        if self.dirty:
+            self.backend.set_many(self.doc_id, self.kind, self.dirty)
+            self.dirty = {}
+
+
+def get_macro_cache_views(doc_id: int) -> tuple[MacroCacheView, MacroCacheView]:
+    """Returns the auto macro cache and the heading cache of the given document."""
+    backend = get_macro_cache_backend()
+    return (
+        MacroCacheView(backend, doc_id, AUTO_MACROS),
+        MacroCacheView(backend, doc_id, HEADINGS),
+    )
+
+
+def get_cached_auto_macros(par: DocParagraph) -> dict | None:
+    return (
+        get_macro_cache_backend()
+        .get_many(par.doc.doc_id, AUTO_MACROS, [get_auto_macro_key(par)])
+        .get(get_auto_macro_key(par))
+    )
+
+
+def clear_macro_cache(doc_id: int | None) -> None:
+    get_macro_cache_backend().clear(doc_id)
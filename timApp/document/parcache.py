@@ -0,0 +1,125 @@
+"""A process-wide cache for the persistent data of paragraphs.
+
+The data of a paragraph version, i.e. ``(doc_id, par_id, hash)``, never changes except for its HTML cache,
+so the parsed data can be shared between requests. The cache has two tiers:
+
+* a bounded in-process LRU whose size is limited by ``PAR_CACHE_MAX_BYTES`` and
+* optionally (``PAR_CACHE_REDIS``), Redis, which is shared between workers and hosts.
+
+The cache stores plain dicts (see :meth:`DocParagraph.dict`), not DocParagraph objects, because paragraph
+objects are bound to a Document and are mutated during rendering. Callers always get a copy.
+
+Hits, misses and evictions are counted with :func:`timApp.util.timtiming.count_stat`.
+"""
+
+from __future__ import annotations
+
+import json
+from collections import OrderedDict
+from functools import cache
+from threading import Lock
+
+from timApp.util.timtiming import count_stat
+
+ParCacheKey = tuple[int, str, str]
+
+# Approximate per-entry overhead of the dict and key objects.
+ENTRY_OVERHEAD_BYTES = 400
+REDIS_EXPIRE_SECS = 3600 * 24
+
+
+@cache
+def get_cache_config() -> tuple[int, bool]:
+    from timApp.tim_app import app
+
+    return app.config["PAR_CACHE_MAX_BYTES"], app.config["PAR_CACHE_REDIS"]
+
+
+def estimate_size(d: dict) -> int:
+    size = ENTRY_OVERHEAD_BYTES + len(d["md"])
+    if h := d.get("h"):
+        size += sum(len(v) for v in h.values()) if isinstance(h, dict) else len(h)
+    if attrs := d.get("attrs"):
+        size += sum(len(str(k)) + len(str(v)) for k, v in attrs.items())
+    return size
+
+
+def copy_par_data(d: dict) -> dict:
+    """Copies the mutable parts of paragraph data so that the cached data stays intact."""
+    result = dict(d)
+    if attrs := d.get("attrs"):
+        result["attrs"] = dict(attrs)
+    if isinstance(h := d.get("h"), dict):
+        result["h"] = dict(h)
+    return result
+
+
+def get_redis_key(key: ParCacheKey) -> str:
+    doc_id, par_id, t = key
+    return f"timpar-{doc_id}-{par_id}-{t}"
+
+
+class ParDataCache:
+    def __init__(self) -> None:
+        self.entries: OrderedDict[ParCacheKey, tuple[dict, int]] = OrderedDict()
+        self.size = 0
+        self.lock = Lock()
+
+    def get(self, doc_id: int, par_id: str, t: str) -> dict | None:
+        max_bytes, use_redis = get_cache_config()
+        key = (doc_id, par_id, t)
+        if max_bytes:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry is not None:
+                    self.entries.move_to_end(key)
+            if entry is not None:
+                count_stat("par_cache.hit")
+                return copy_par_data(entry[0])
+        if use_redis:
+            from timApp.document.caching import rclient
+
+            raw = rclient.get(get_redis_key(key))
+            if raw is not None:
+                count_stat("par_cache.redis_hit")
+                d = json.loads(raw)
+                self.__put_local(key, d, max_bytes)
+                return copy_par_data(d)
+        count_stat("par_cache.miss")
+        return None
+
+    def put(self, doc_id: int, par_id: str, t: str, d: dict) -> None:
+        """Stores paragraph data to the cache, replacing any earlier data of the same paragraph version."""
+        max_bytes, use_redis = get_cache_config()
+        key = (doc_id, par_id, t)
+        d = copy_par_data(d)
+        self.__put_local(key, d, max_bytes)
+        if use_redis:
+            from timApp.document.caching import rclient
+
+            rclient.set(get_redis_key(key), json.dumps(d), ex=REDIS_EXPIRE_SECS)
+
+    def __put_local(self, key: ParCacheKey, d: dict, max_bytes: int) -> None:
+        if not max_bytes:
+            return
+        size = estimate_size(d)
+        if size > max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self.entries[key] = d, size
+            self.size += size
+            while self.size > max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+                count_stat("par_cache.evict")
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+par_data_cache = ParDataCache()
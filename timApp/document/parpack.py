@@ -0,0 +1,302 @@
+"""Packed storage for the paragraphs of a document.
+
+By default, every paragraph version is stored in its own JSON file under ``pars/<doc_id>/<par_id>/<hash>``.
+Loading a large document therefore costs one ``open`` per paragraph. A pack keeps the same data in a single
+append-only segment file per document, accompanied by an append-only offset index:
+
+* ``pars/<doc_id>/.pack/segment`` contains the paragraph JSON records, one per line.
+* ``pars/<doc_id>/.pack/index`` contains lines of the form ``<par_id>/<hash> <offset> <length>``.
+  The special hash ``current`` marks the latest version of the paragraph (like the ``current`` symlink
+  in the file layout).
+
+Later index lines override earlier ones, so rewriting a paragraph (e.g. when its HTML cache changes) only
+appends data. The segment is read through ``mmap``, so a whole document is read with a sequential scan
+of one file.
+
+The per-paragraph files are still written for packed documents. A document that has no pack, or a
+paragraph version that is missing from the pack, is transparently read from the file layout.
+
+Because the files are always up to date, readers may use a cached "not packed" result for a while (see
+:func:`get_pack`). Writers always check for the pack and append to it under the pack lock, which
+:func:`build_pack` holds while it builds the pack, so no write is lost when a pack replaces the old one.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import shutil
+import time
+from collections import OrderedDict
+from functools import cache
+from pathlib import Path
+
+from filelock import FileLock
+
+PACK_DIR_NAME = ".pack"
+SEGMENT_FILE_NAME = "segment"
+INDEX_FILE_NAME = "index"
+CURRENT_KEY = "current"
+
+# The number of packs to keep open (and mapped) per process.
+MAX_OPEN_PACKS = 256
+# How long a document may be assumed to be unpacked before checking again.
+MISSING_PACK_RECHECK_SECS = 60
+
+ParKey = tuple[str, str]
+
+
+@cache
+def pack_new_documents() -> bool:
+    from timApp.tim_app import app
+
+    return app.config["PACK_NEW_DOCUMENTS"]
+
+
+def get_pack_dir(doc_id: int) -> Path:
+    from timApp.timdb.dbaccess import get_files_path
+
+    return get_files_path() / "pars" / str(doc_id) / PACK_DIR_NAME
+
+
+class ParPack:
+    """A reader and writer for the pack of a single document."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.segment_path = path / SEGMENT_FILE_NAME
+        self.index_path = path / INDEX_FILE_NAME
+        self.offsets: dict[ParKey, tuple[int, int]] = {}
+        self.index_size = 0
+        self.index_inode: int | None = None
+        self.mapped: mmap.mmap | None = None
+
+    def get_lock(self) -> FileLock:
+        return FileLock(f"{self.path}.lock")
+
+    def exists(self) -> bool:
+        return self.index_path.is_file()
+
+    def refresh(self) -> bool:
+        """Reads the index lines that have been appended since the last refresh.
+
+        :return: Whether the pack still exists.
+        """
+        try:
+            st = os.stat(self.index_path)
+        except FileNotFoundError:
+            self.reset()
+            return False
+        size = st.st_size
+        if st.st_ino != self.index_inode:
+            # The pack was (re)built; start from scratch.
+            self.reset()
+            self.index_inode = st.st_ino
+        if size == self.index_size:
+            return True
+        with self.index_path.open("rb") as f:
+            f.seek(self.index_size)
+            data = f.read(size - self.index_size)
+        # Ignore a possibly partially written last line; it is read on the next refresh.
+        complete_len = data.rfind(b"\n") + 1
+        for line in data[:complete_len].decode().splitlines():
+            key, offset, length = line.split(" ")
+            par_id, t = key.split("/")
+            self.offsets[par_id, t] = int(offset), int(length)
+        self.index_size += complete_len
+        return True
+
+    def reset(self) -> None:
+        self.offsets = {}
+        self.index_size = 0
+        self.index_inode = None
+        self.close()
+
+    def close(self) -> None:
+        if self.mapped is not None:
+            self.mapped.close()
+            self.mapped = None
+
+    def __read_raw(self, offset: int, length: int) -> bytes:
+        end = offset + length
+        if self.mapped is None or len(self.mapped) < end:
+            self.close()
+            with self.segment_path.open("rb") as f:
+                self.mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.mapped[offset:end]
+
+    def has(self, par_id: str, t: str) -> bool:
+        return (par_id, t) in self.offsets
+
+    def get_current_hash(self, par_id: str) -> str | None:
+        d = self.read(par_id, CURRENT_KEY)
+        return d["t"] if d else None
+
+    def read(self, par_id: str, t: str) -> dict | None:
+        """Reads the paragraph data with the given id and hash.
+
+        :param par_id: The paragraph id.
+        :param t: The paragraph hash or "current".
+        :return: The paragraph data or None if the pack does not contain it.
+        """
+        loc = self.offsets.get((par_id, t))
+        if loc is None:
+            return None
+        raw = self.__read_raw(*loc)
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError as ex:
+            raise ValueError(
+                f"Invalid JSON read from {self.segment_path} at {loc[0]}: '{ex.doc}'"
+            ) from ex
+
+    def append(self, d: dict, set_current: bool = False) -> None:
+        """Appends paragraph data to the pack.
+
+        :param d: The persistent paragraph data, see :meth:`DocParagraph.dict`.
+        :param set_current: Whether the data should be marked as the latest version of the paragraph.
+        """
+        record = json.dumps(d).encode() + b"\n"
+        with self.get_lock():
+            with self.segment_path.open("ab") as f:
+                offset = f.tell()
+                f.write(record)
+            lines = [f"{d['id']}/{d['t']} {offset} {len(record)}\n"]
+            if set_current:
+                lines.append(f"{d['id']}/{CURRENT_KEY} {offset} {len(record)}\n")
+            with self.index_path.open("a") as f:
+                f.write("".join(lines))
+
+    def set_current(self, par_id: str, t: str) -> bool:
+        """Marks an already packed paragraph version as the latest one.
+
+        :return: Whether the version was found from the pack.
+        """
+        # The offsets are looked up under the lock so that they refer to the same pack that the line is
+        # written to even if the pack is rebuilt concurrently.
+        with self.get_lock():
+            if not self.refresh():
+                return False
+            loc = self.offsets.get((par_id, t))
+            if loc is None:
+                return False
+            if self.offsets.get((par_id, CURRENT_KEY)) == loc:
+                return True
+            with self.index_path.open("a") as f:
+                f.write(f"{par_id}/{CURRENT_KEY} {loc[0]} {loc[1]}\n")
+        return True
+
+
+# Document id -> the pack, or the time when the document was found to be unpacked.
+# Evicted packs are not closed explicitly because they may still be in use; the mapping is closed when the
+# pack object is garbage collected.
+_packs: OrderedDict[int, ParPack | float] = OrderedDict()
+
+
+def _cache_pack(doc_id: int, entry: ParPack | float) -> None:
+    _packs[doc_id] = entry
+    _packs.move_to_end(doc_id)
+    while len(_packs) > MAX_OPEN_PACKS:
+        _packs.popitem(last=False)
+
+
+def get_pack(doc_id: int, for_write: bool = False) -> ParPack | None:
+    """Returns the up-to-date pack of the given document or None if the document is not packed.
+
+    :param doc_id: The document id.
+    :param for_write: Whether the pack is needed for writing. Readers may get None for up to
+     MISSING_PACK_RECHECK_SECS after a pack has been built by another process, which is fine because the
+     per-paragraph files are always up to date. Writers must not miss the pack, so they always check for it.
+    """
+    entry = _packs.get(doc_id)
+    if isinstance(entry, ParPack):
+        _packs.move_to_end(doc_id)
+        if entry.refresh():
+            return entry
+    elif (
+        entry is not None
+        and not for_write
+        and time.monotonic() - entry < MISSING_PACK_RECHECK_SECS
+    ):
+        return None
+    pack = ParPack(get_pack_dir(doc_id))
+    if not pack.refresh():
+        _cache_pack(doc_id, time.monotonic())
+        return None
+    _cache_pack(doc_id, pack)
+    return pack
+
+
+def init_pack(doc_id: int) -> ParPack:
+    """Creates an empty pack for the given document if it does not exist yet."""
+    pack_dir = get_pack_dir(doc_id)
+    pack_dir.mkdir(parents=True, exist_ok=True)
+    pack = ParPack(pack_dir)
+    with pack.get_lock():
+        pack.segment_path.touch()
+        pack.index_path.touch()
+    _packs.pop(doc_id, None)
+    return pack
+
+
+def build_pack(doc_id: int) -> int:
+    """Builds (or rebuilds) the pack of a document from the per-paragraph files.
+
+    The new pack is written to a temporary directory and moved in place afterwards, so readers never see a
+    partial pack. Rebuilding also compacts the pack by dropping superseded records.
+
+    The pack lock is held during the whole build. An empty pack is created first if the document is not packed
+    yet, so the writers that write paragraphs during the build append them to the pack after waiting for the
+    lock instead of skipping the pack. Until the build finishes, readers fall back to the files for the
+    paragraphs that are missing from the empty pack.
+
+    :param doc_id: The document id.
+    :return: The number of paragraph versions written to the pack.
+    """
+    pars_dir = get_pack_dir(doc_id).parent
+    if not pars_dir.is_dir():
+        return 0
+    final = ParPack(get_pack_dir(doc_id))
+    with final.get_lock():
+        if not final.exists():
+            final.path.mkdir(exist_ok=True)
+            final.segment_path.touch()
+            final.index_path.touch()
+        count = _build_pack_files(pars_dir, final)
+    _packs.pop(doc_id, None)
+    return count
+
+
+def _build_pack_files(pars_dir: Path, final: ParPack) -> int:
+    tmp = ParPack(pars_dir / f"{PACK_DIR_NAME}.tmp")
+    shutil.rmtree(tmp.path, ignore_errors=True)
+    tmp.path.mkdir()
+    count = 0
+    with tmp.segment_path.open("wb") as seg, tmp.index_path.open("w") as idx:
+        for par_dir in sorted(pars_dir.iterdir()):
+            if par_dir.name.startswith(".") or not par_dir.is_dir():
+                continue
+            current_link = par_dir / CURRENT_KEY
+            current = os.readlink(current_link) if current_link.is_symlink() else None
+            for par_file in sorted(par_dir.iterdir()):
+                if par_file.name == CURRENT_KEY:
+                    continue
+                record = par_file.read_bytes().rstrip(b"\n") + b"\n"
+                offset = seg.tell()
+                seg.write(record)
+                idx.write(f"{par_dir.name}/{par_file.name} {offset} {len(record)}\n")
+                if par_file.name == current:
+                    idx.write(f"{par_dir.name}/{CURRENT_KEY} {offset} {len(record)}\n")
+                count += 1
+    shutil.rmtree(final.path, ignore_errors=True)
+    tmp.path.rename(final.path)
+    return count
+
+
+def remove_pack(doc_id: int) -> None:
+    """Removes the pack of a document, reverting it to the per-paragraph file layout."""
+    pack = ParPack(get_pack_dir(doc_id))
+    with pack.get_lock():
+        shutil.rmtree(pack.path, ignore_errors=True)
+    _packs.pop(doc_id, None)
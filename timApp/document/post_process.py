@@ -8,6 +8,7 @@ import pytz
 
 from timApp.auth.get_user_rights_for_item import get_user_rights_for_item
 from timApp.document.areainfo import AreaStart, AreaEnd
+from timApp.document.authorindex import get_authorinfo
 from timApp.document.docentry import DocEntry
 from timApp.document.docparagraph import DocParagraph
 from timApp.document.docsettings import DocSettings
@@ -31,7 +32,7 @@ from timApp.readmark.readings import (
 )
 from timApp.readmark.readmarkcollection import ReadMarkCollection
 from timApp.readmark.readparagraph import ReadParagraph
-from timApp.user.user import User, has_no_higher_right
+from timApp.user.user import User, has_no_higher_right, teacher_access_set
 from timApp.util.flask.responsehelper import flash_if_visible
 from timApp.util.timtiming import taketime
 from timApp.util.utils import getdatetime, get_boolean
@@ -124,7 +125,7 @@ def post_process_pars(
 
     if settings.show_authors():
         hide_authors = view_ctx.hide_names_requested
-        authors = doc.get_changelog(-1).get_authorinfo(pars)
+        authors = get_authorinfo(doc, pars)
         if hide_authors:
             for ainfo in authors.values():
                 for a in ainfo.authors:
@@ -217,18 +218,19 @@ def post_process_pars(
         curr_user, docinfo
     )
     comment_docs = {docinfo.id: docinfo}
-    teacher_access_cache = {}
+    for n, _ in notes:
+        if n.doc_id not in comment_docs and pars_dict.get((n.par_id, n.doc_id)):
+            comment_docs[n.doc_id] = DocEntry.find_by_id(n.doc_id)
+    teacher_accesses = (
+        curr_user.get_some_accesses(comment_docs.values(), teacher_access_set)
+        if notes
+        else {}
+    )
     for n, u in notes:
         key = (n.par_id, n.doc_id)
         pars = pars_dict.get(key)
         if pars:
-            if n.doc_id not in comment_docs:
-                comment_docs[n.doc_id] = DocEntry.find_by_id(n.doc_id)
-            has_teacher = teacher_access_cache.get(n.doc_id)
-            if has_teacher is None:
-                has_teacher = bool(curr_user.has_teacher_access(comment_docs[n.doc_id]))
-                teacher_access_cache[n.doc_id] = has_teacher
-            editable = n.usergroup_id == group or has_teacher
+            editable = n.usergroup_id == group or bool(teacher_accesses[n.doc_id])
             private = n.access == "justme"
             for p in pars:
                 if p.notes is None:
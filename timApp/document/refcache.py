@@ -0,0 +1,89 @@
+"""A process-wide cache of resolved paragraph references.
+
+Resolving an area reference (``ra``) scans the referenced document for the named area, and resolving a
+paragraph reference (``rp``) looks up the paragraph, on every render. For documents that consist mostly of
+references, this dominates the rendering time. The cache remembers which paragraphs of the referenced document a
+reference resolves to, i.e. the ids and hashes of the paragraphs in the area or of the referenced paragraph.
+
+The key is ``(source par id, source hash, referenced doc id, referenced doc version, preamble)`` where
+*preamble* identifies the preamble paragraphs of the referenced document, which may contain areas too. The
+referenced paragraphs of a given version never change, so entries never become stale; a new version of the
+referenced document simply gets a new key. References of the referenced paragraphs are resolved the same way, so
+each level of a reference chain is cached separately.
+
+The size of the cache is limited by ``REF_CACHE_MAX_ENTRIES``. Hits and misses are counted with
+:func:`timApp.util.timtiming.count_stat`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from collections import OrderedDict
+from functools import cache
+from typing import TYPE_CHECKING
+
+from timApp.util.timtiming import count_stat
+
+if TYPE_CHECKING:
+    from timApp.document.docparagraph import DocParagraph
+    from timApp.document.document import Document
+
+RefCacheKey = tuple[str, str, int, tuple[int, int], str]
+RefCacheValue = tuple[tuple[str, str], ...]
+
+
+@cache
+def get_max_entries() -> int:
+    from timApp.tim_app import app
+
+    return app.config["REF_CACHE_MAX_ENTRIES"]
+
+
+def get_preamble_key(ref_doc: Document) -> str:
+    pars = ref_doc.preamble_pars
+    if not pars:
+        return ""
+    return hashlib.sha1(
+        "\n".join(f"{p.get_id()}/{p.get_hash()}" for p in pars).encode()
+    ).hexdigest()
+
+
+def get_ref_cache_key(par: DocParagraph, ref_doc: Document) -> RefCacheKey:
+    return (
+        par.get_id(),
+        par.get_hash(),
+        ref_doc.doc_id,
+        ref_doc.get_version(),
+        get_preamble_key(ref_doc),
+    )
+
+
+class RefCache:
+    def __init__(self) -> None:
+        self.entries: OrderedDict[RefCacheKey, RefCacheValue] = OrderedDict()
+
+    def get(self, key: RefCacheKey) -> RefCacheValue | None:
+        entry = self.entries.get(key)
+        if entry is None:
+            count_stat("ref_cache.miss")
+            return None
+        self.entries.move_to_end(key)
+        count_stat("ref_cache.hit")
+        return entry
+
+    def put(self, key: RefCacheKey, pars: list[DocParagraph]) -> None:
+        """Stores the paragraphs of the referenced document that the reference resolves to."""
+        max_entries = get_max_entries()
+        if not max_entries:
+            return
+        self.entries[key] = tuple((p.get_id(), p.get_hash()) for p in pars)
+        self.entries.move_to_end(key)
+        while len(self.entries) > max_entries:
+            self.entries.popitem(last=False)
+            count_stat("ref_cache.evict")
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+
+ref_cache = RefCache()
@@ -0,0 +1,107 @@
+"""Redis caches for the live updates of documents (the ``/getParDiff`` route).
+
+* ``tim-doc-version-<doc_id>`` is the latest version of the document. It is set after each new version has been
+  written, so a client that polls with the latest version is answered without reading the document. If the
+  writer cannot update it, the key is removed, and it expires soon in any case, so a stale version is not
+  served for long.
+* ``tim-par-diff-<doc_id>-<from>-<to>`` is the user-independent part of the route response between two versions:
+  the paragraph diff (with paragraph ids in place of the paragraphs) and the live update interval. Written
+  versions never change, so the entries expire only to save memory.
+
+The caches are hints: if Redis is unavailable, the route reads the document as before.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from redis import RedisError
+
+from timApp.document.version import Version
+from timApp.util.logger import log_warning
+
+VERSION_KEY_PREFIX = "tim-doc-version-"
+PAR_DIFF_KEY_PREFIX = "tim-par-diff-"
+VERSION_EXPIRE_SECS = 300
+PAR_DIFF_EXPIRE_SECS = 3600
+
+
+def get_par_diff_key(doc_id: int, from_ver: Version, to_ver: Version) -> str:
+    return f"{PAR_DIFF_KEY_PREFIX}{doc_id}-{from_ver[0]}.{from_ver[1]}-{to_ver[0]}.{to_ver[1]}"
+
+
+def get_latest_version(doc_id: int) -> Version | None:
+    from timApp.document.caching import rclient
+
+    try:
+        value = rclient.get(f"{VERSION_KEY_PREFIX}{doc_id}")
+    except RedisError:
+        return None
+    if value is None:
+        return None
+    major, minor = value.decode().split(".")
+    return int(major), int(minor)
+
+
+def set_latest_version(
+    doc_id: int, ver: Version, only_if_missing: bool = False
+) -> None:
+    """Stores the latest version of the document.
+
+    :param only_if_missing: Whether to keep an existing value. Readers use this so that they never overwrite the
+     version set by a concurrent writer with an older one.
+    """
+    from timApp.document.caching import rclient
+
+    key = f"{VERSION_KEY_PREFIX}{doc_id}"
+    try:
+        rclient.set(
+            key,
+            f"{ver[0]}.{ver[1]}",
+            ex=VERSION_EXPIRE_SECS,
+            nx=only_if_missing,
+        )
+    except RedisError as e:
+        log_warning(f"Failed to store the version of document {doc_id}: {e}")
+        if only_if_missing:
+            return
+        # Otherwise readers would answer that the document has not changed until the old value expires.
+        try:
+            rclient.delete(key)
+        except RedisError as e:
+            log_warning(f"Failed to remove the version of document {doc_id}: {e}")
+
+
+def get_par_diff(doc_id: int, from_ver: Version, to_ver: Version) -> dict | None:
+    from timApp.document.caching import rclient
+
+    try:
+        value = rclient.get(get_par_diff_key(doc_id, from_ver, to_ver))
+    except RedisError:
+        return None
+    return json.loads(value) if value is not None else None
+
+
+def set_par_diff(
+    doc_id: int, from_ver: Version, to_ver: Version, value: dict[str, Any]
+) -> None:
+    from timApp.document.caching import rclient
+
+    try:
+        rclient.set(
+            get_par_diff_key(doc_id, from_ver, to_ver),
+            json.dumps(value),
+            ex=PAR_DIFF_EXPIRE_SECS,
+        )
+    except RedisError:
+        pass
+
+
+def clear_version_cache() -> None:
+    """Clears the caches of all documents. Only needed when document ids are reused, i.e. in tests."""
+    from timApp.document.caching import rclient
+
+    for prefix in (VERSION_KEY_PREFIX, PAR_DIFF_KEY_PREFIX):
+        for key in rclient.scan_iter(match=f"{prefix}*", count=1000):
+            rclient.delete(key)
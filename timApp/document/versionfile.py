@@ -0,0 +1,144 @@
+"""Reading and writing of document version files.
+
+A version file (``docs/<doc_id>/<major>/<minor>``) lists the paragraphs of a document version, one
+``<par_id>/<hash>`` per line. Very old documents may also have lines with just ``<par_id>``.
+
+If ``DOC_VERSION_SNAPSHOT_INTERVAL`` is set, a version file may instead be a delta against the previous
+version. A delta file starts with a header line ``@delta <major>/<minor> <depth>``, where the version is the
+base version and depth is the number of deltas between this version and the nearest full snapshot.
+The header is followed by operations that are applied in order:
+
+* ``+<index> <par_id>/<hash>`` inserts a paragraph at the given index,
+* ``-<index>`` deletes the paragraph at the given index and
+* ``=<index> <par_id>/<hash>`` replaces the paragraph at the given index.
+
+A full snapshot is written whenever the depth would reach the interval, so reading a version never
+needs more than ``DOC_VERSION_SNAPSHOT_INTERVAL`` file reads.
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass, field
+from functools import cache
+from pathlib import Path
+from tempfile import mkstemp
+
+from timApp.document.version import Version
+
+DELTA_HEADER = "@delta"
+
+ParEntry = tuple[str, str | None]
+
+
+@cache
+def get_snapshot_interval() -> int:
+    from timApp.tim_app import app
+
+    return app.config["DOC_VERSION_SNAPSHOT_INTERVAL"]
+
+
+def parse_entry(line: str) -> ParEntry:
+    if len(line) > 14:
+        # Line contains both par_id and t
+        par_id, t = line.split("/")
+        return par_id, t
+    return line, None
+
+
+def format_entry(entry: ParEntry) -> str:
+    par_id, t = entry
+    return par_id if t is None else f"{par_id}/{t}"
+
+
+@dataclass
+class VersionDelta:
+    """A list of operations that transforms the paragraph list of one version into the next one."""
+
+    ops: list[str] = field(default_factory=list)
+
+    def insert(self, index: int, entry: ParEntry) -> None:
+        self.ops.append(f"+{index} {format_entry(entry)}")
+
+    def delete(self, index: int) -> None:
+        self.ops.append(f"-{index}")
+
+    def replace(self, index: int, entry: ParEntry) -> None:
+        self.ops.append(f"={index} {format_entry(entry)}")
+
+
+def apply_ops(entries: list[ParEntry], ops: list[str]) -> None:
+    for op in ops:
+        kind, rest = op[0], op[1:]
+        if kind == "-":
+            del entries[int(rest)]
+            continue
+        index, entry = rest.split(" ", 1)
+        if kind == "+":
+            entries.insert(int(index), parse_entry(entry))
+        elif kind == "=":
+            entries[int(index)] = parse_entry(entry)
+        else:
+            raise ValueError(f"Unknown version delta operation: {op}")
+
+
+def read_version_file(path: Path) -> tuple[list[ParEntry], int]:
+    """Reads the paragraph list of a version, following the delta chain if needed.
+
+    :param path: The path of the version file.
+    :return: The paragraph list and the delta depth of the version (0 for a full snapshot).
+    """
+    chain: list[list[str]] = []
+    depth = None
+    while True:
+        with path.open("r", encoding="UTF-8") as f:
+            lines = [line for line in f.read().split("\n") if line]
+        if not lines or not lines[0].startswith(DELTA_HEADER):
+            break
+        _, base, base_depth = lines[0].split(" ")
+        if depth is None:
+            depth = int(base_depth) + 1
+        chain.append(lines[1:])
+        major, minor = base.split("/")
+        path = path.parent.parent / major / minor
+    entries = [parse_entry(line) for line in lines]
+    for ops in reversed(chain):
+        apply_ops(entries, ops)
+    return entries, depth or 0
+
+
+def write_version_file(
+    path: Path,
+    entries: list[ParEntry],
+    base_ver: Version | None = None,
+    base_depth: int = 0,
+    delta: VersionDelta | None = None,
+) -> None:
+    """Writes the paragraph list of a version either as a delta or as a full snapshot.
+
+    The file is written to a temporary file first and moved in place, so the version file never exists with
+    partial contents.
+
+    :param path: The path of the version file.
+    :param entries: The full paragraph list of the version.
+    :param base_ver: The version that the delta is relative to.
+    :param base_depth: The delta depth of the base version.
+    :param delta: The operations that transform the base version into this one.
+    """
+    interval = get_snapshot_interval()
+    # The name of the temporary file is not a number, so it is never taken for a version.
+    destfd, tmpname = mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    with os.fdopen(destfd, "w", encoding="UTF-8") as f:
+        if (
+            interval
+            and base_ver is not None
+            and delta is not None
+            and base_depth + 1 < interval
+        ):
+            f.write(f"{DELTA_HEADER} {base_ver[0]}/{base_ver[1]} {base_depth}\n")
+            for op in delta.ops:
+                f.write(op + "\n")
+        else:
+            for entry in entries:
+                f.write(format_entry(entry) + "\n")
+    os.replace(tmpname, path)
@@ -139,7 +139,7 @@ def get_demo_data(demo_paths, default_max):
             doc_max_points = doc_set.max_points() or default_max
         if doc_max_points is not None:
             temp_dict["maxPoints"] = doc_max_points
-        temp_dict["gotPoints"] = task_info_dict[str(doc.id)]
+        temp_dict["gotPoints"] = task_info_dict[doc.id]
         results.append(temp_dict)
     return results
 
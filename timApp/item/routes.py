@@ -64,6 +64,13 @@ from timApp.document.viewcontext import (
     viewmode_templates,
     DEFAULT_VIEWMODE_TEMPLATE,
 )
+from timApp.document.version import Version
+from timApp.document.versioncache import (
+    get_latest_version,
+    get_par_diff,
+    set_latest_version,
+    set_par_diff,
+)
 from timApp.document.viewparams import ViewParams, ViewParamsSchema
 from timApp.folder.folder import Folder
 from timApp.folder.folder_view import try_return_folder
@@ -105,7 +112,12 @@ from timApp.timdb.sqa import db
 from timApp.user.groups import verify_group_view_access
 from timApp.user.settings.style_utils import resolve_themes
 from timApp.user.settings.styles import generate_style
-from timApp.user.user import User, has_no_higher_right
+from timApp.user.user import (
+    User,
+    has_no_higher_right,
+    manage_access_set,
+    view_access_set,
+)
 from timApp.user.usergroup import (
     UserGroup,
     get_usergroup_eager_query,
@@ -305,8 +317,9 @@ def items_route(
     items = get_items(f.path, recurse=recursive)
     if include_rights:
         u = get_current_user_object()
+        accesses = u.get_some_accesses(items, manage_access_set)
         rights = get_rights_holders_all(
-            [i.id for i in items if u.has_manage_access(i)], order_by=BlockAccess.type
+            [i.id for i in items if accesses[i.id]], order_by=BlockAccess.type
         )
         items = [ItemWithRights(i, rights[i.id]) for i in items]
     return json_response(items)
@@ -1087,7 +1100,8 @@ def get_items(folder: str, recurse=False):
     docs.sort(key=lambda d: d.title.lower())
     folders = Folder.get_all_in_path(root_path=folder, recurse=recurse)
     folders.sort(key=lambda d: d.title.lower())
-    return [f for f in folders if u.has_view_access(f)] + docs
+    accesses = u.get_some_accesses(folders, view_access_set)
+    return [f for f in folders if accesses[f.id]] + docs
 
 
 def get_linked_groups(i: Item) -> tuple[list[UserGroupWithSisuInfo], list[str]]:
@@ -1138,55 +1152,68 @@ def is_exam_mode(settings: DocSettings, rights: dict):
 
 @view_page.get("/getParDiff/<int:doc_id>/<int:major>/<int:minor>")
 def check_updated_pars(doc_id, major, minor):
-    # return json_response({'diff': None,
-    #                       'version': None})
-    # taketime("before verify")
     doc = get_doc_or_abort(doc_id)
     verify_view_access(doc)
-    # taketime("before liveupdates")
+    client_ver = major, minor
+    # Fast path for the common case that the document has not changed: no need to read the document.
+    if get_latest_version(doc_id) == client_ver:
+        cached = get_par_diff(doc_id, client_ver, client_ver)
+        if cached is not None:
+            return json_response(
+                {"diff": [], "version": client_ver, "live": cached["live"]}
+            )
     d = doc.document
-    settings = d.get_settings()
-    live_updates = settings.live_updates(0)  # this cost 1-3 ms.
+    ver = d.get_version()
+    set_latest_version(doc_id, ver, only_if_missing=True)
+    cached = get_par_diff(doc_id, client_ver, ver)
+    if cached is None:
+        cached = compute_par_diff(d, client_ver)
+        set_par_diff(doc_id, client_ver, ver, cached)
+    diffs = cached["diff"]
+    if any(diff.get("content") for diff in diffs):
+        curr_user = get_current_user_object()
+        rights = get_user_rights_for_item(doc, curr_user)  # about 30-40 ms
+        hide_readmarks = should_hide_readmarks(curr_user, d.get_settings())
+        for diff in diffs:
+            if diff.get("content"):
+                post_process_result = post_process_pars(
+                    d,
+                    [d.get_paragraph(par_id) for par_id in diff["content"]],
+                    UserContext.from_one_user(curr_user),
+                    default_view_ctx,
+                )
+                diff["content"] = {
+                    "texts": render_template(
+                        "partials/paragraphs.jinja2",
+                        text=post_process_result.texts,
+                        rights=rights,
+                        preview=False,
+                        hide_readmarks=hide_readmarks,
+                    ),
+                    "js": post_process_result.js_paths,
+                    "css": post_process_result.css_paths,
+                }
+    return json_response({"diff": diffs, "version": ver, "live": cached["live"]})
+
+
+def compute_par_diff(d: Document, from_ver: Version) -> dict[str, Any]:
+    """Computes the user-independent part of the /getParDiff response from the given version to the latest one.
+
+    The changed paragraphs are returned as ids so that the result can be cached.
+    """
+    live_updates = d.get_settings().live_updates(0)
     global_live_updates = 2  # TODO: take this from somewhere that it is possible to admin to change it by a route
 
     if 0 < live_updates < global_live_updates:
         live_updates = global_live_updates
     if global_live_updates == 0:  # To stop all live updates
         live_updates = 0
-    # taketime("after liveupdates")
-    view_ctx = default_view_ctx
-    diffs = list(
-        d.get_doc_version((major, minor)).parwise_diff(d, view_ctx)
-    )  # TODO cache this, about <5 ms
-    # taketime("after diffs")
-    curr_user = get_current_user_object()
-    rights = get_user_rights_for_item(
-        doc, curr_user
-    )  # about 30-40 ms # TODO: this is the slowest part
-    # taketime("after rights")
-    for diff in diffs:  # about < 1 ms
-        if diff.get("content"):
-            post_process_result = post_process_pars(
-                d,
-                diff["content"],
-                UserContext.from_one_user(curr_user),
-                view_ctx,
-            )
-            diff["content"] = {
-                "texts": render_template(
-                    "partials/paragraphs.jinja2",
-                    text=post_process_result.texts,
-                    rights=rights,
-                    preview=False,
-                    hide_readmarks=should_hide_readmarks(curr_user, settings),
-                ),
-                "js": post_process_result.js_paths,
-                "css": post_process_result.css_paths,
-            }
-    # taketime("after for diffs")
-    return json_response(
-        {"diff": diffs, "version": d.get_version(), "live": live_updates}
-    )
+    diffs = []
+    for diff in d.get_doc_version(from_ver).parwise_diff(d, default_view_ctx):
+        if "content" in diff:
+            diff["content"] = [p.get_id() for p in diff["content"]]
+        diffs.append(diff)
+    return {"diff": diffs, "live": live_updates}
 
 
 @view_page.get("/manage")
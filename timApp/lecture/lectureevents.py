@@ -0,0 +1,146 @@
+"""Push notifications of lecture state changes.
+
+Routes that change the state of a running lecture publish an event to the Redis channel of the lecture
+(:func:`publish_lecture_event`). Each worker process has a single subscription to all lecture channels
+(:class:`LectureEventHub`) that fans the events out to the requests waiting in that process: the event stream
+route ``/lectureEvents`` and the long-polling ``/getUpdates`` route. A waiting client therefore does not query
+the database until something has changed in its lecture.
+
+Events only tell what kind of state has changed; clients fetch the changes from ``/getUpdates`` as before, so
+a lost event only delays an update until the next poll.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from enum import Enum
+from queue import Queue, Empty
+from typing import Generator
+
+from redis import RedisError
+
+from timApp.util.logger import log_warning
+from timApp.util.timtiming import count_stat
+
+LECTURE_CHANNEL_PREFIX = "tim-lecture-"
+RECONNECT_DELAY_SECS = 5
+
+
+class LectureEventKind(Enum):
+    Message = "message"
+    Question = "question"
+    Answer = "answer"
+    Points = "points"
+    Lecture = "lecture"
+    Users = "users"
+
+
+def publish_lecture_event(lecture_id: int, kind: LectureEventKind) -> None:
+    """Notifies the clients of the lecture about a change. Call this after the change has been committed."""
+    from timApp.document.caching import rclient
+
+    try:
+        rclient.publish(f"{LECTURE_CHANNEL_PREFIX}{lecture_id}", kind.value)
+    except RedisError as e:
+        log_warning(f"Failed to publish lecture event {kind.value}: {e}")
+    else:
+        count_stat("lecture_events.published")
+
+
+class LectureSubscription:
+    def __init__(self, lecture_id: int):
+        self.lecture_id = lecture_id
+        self.queue: Queue[str] = Queue()
+
+    def wait(self, timeout: float) -> set[str]:
+        """Waits at most timeout seconds for an event.
+
+        :return: The kinds of all the events received since the last call, or an empty set on timeout.
+        """
+        try:
+            kinds = {self.queue.get(timeout=timeout)}
+        except Empty:
+            return set()
+        while True:
+            try:
+                kinds.add(self.queue.get_nowait())
+            except Empty:
+                return kinds
+
+
+class LectureEventHub:
+    """Fans out the lecture events of one worker process to the subscribed requests.
+
+    The Redis subscription is opened by a background thread (a greenlet under the gevent worker class) when the
+    first request subscribes.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.subscriptions: defaultdict[int, set[LectureSubscription]] = defaultdict(
+            set
+        )
+        self.listener: threading.Thread | None = None
+
+    @contextmanager
+    def subscribe(self, lecture_id: int) -> Generator[LectureSubscription, None, None]:
+        sub = LectureSubscription(lecture_id)
+        with self.lock:
+            self.subscriptions[lecture_id].add(sub)
+            if self.listener is None:
+                self.listener = threading.Thread(target=self.listen, daemon=True)
+                self.listener.start()
+        try:
+            yield sub
+        finally:
+            with self.lock:
+                subs = self.subscriptions[lecture_id]
+                subs.discard(sub)
+                if not subs:
+                    del self.subscriptions[lecture_id]
+
+    def get_subscriber_count(self) -> int:
+        with self.lock:
+            return sum(len(subs) for subs in self.subscriptions.values())
+
+    def dispatch(self, lecture_id: int, kind: str) -> None:
+        with self.lock:
+            subs = list(self.subscriptions.get(lecture_id, ()))
+        for sub in subs:
+            sub.queue.put(kind)
+        count_stat("lecture_events.delivered", len(subs))
+
+    def listen(self) -> None:
+        from timApp.document.caching import rclient
+
+        while True:
+            try:
+                pubsub = rclient.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(f"{LECTURE_CHANNEL_PREFIX}*")
+                for message in pubsub.listen():  # type: ignore[no-untyped-call]
+                    if message["type"] != "pmessage":
+                        continue
+                    channel = message["channel"].decode()
+                    self.dispatch(
+                        int(channel[len(LECTURE_CHANNEL_PREFIX) :]),
+                        message["data"].decode(),
+                    )
+            except RedisError as e:
+                log_warning(f"Lecture event subscription failed: {e}")
+                time.sleep(RECONNECT_DELAY_SECS)
+
+
+_hubs: dict[int, LectureEventHub] = {}
+
+
+def get_lecture_event_hub() -> LectureEventHub:
+    """Returns the event hub of the current process. Forked worker processes get their own hub."""
+    pid = os.getpid()
+    hub = _hubs.get(pid)
+    if hub is None:
+        hub = _hubs[pid] = LectureEventHub()
+    return hub
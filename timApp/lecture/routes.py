@@ -1,5 +1,6 @@
 import json
 import time
+from contextlib import nullcontext
 from dataclasses import dataclass, field
 from datetime import timedelta
 from random import randrange
@@ -36,6 +37,11 @@ from timApp.lecture.askedquestion import (
     user_activity_lock,
 )
 from timApp.lecture.lecture import Lecture
+from timApp.lecture.lectureevents import (
+    LectureEventKind,
+    publish_lecture_event,
+    get_lecture_event_hub,
+)
 from timApp.lecture.lectureanswer import LectureAnswer, get_totals
 from timApp.lecture.lectureutils import (
     is_lecturer_of,
@@ -173,12 +179,49 @@ def get_updates(m: GetUpdatesModel):
     return json_response(ret, date_conversion=True)
 
 
+@lecture_routes.get("/lectureEvents")
+def lecture_events():
+    """Streams the events of the current lecture as server-sent events.
+
+    Each event is a JSON list of the kinds of state that have changed (see LectureEventKind); the client then
+    fetches the changes from /getUpdates. The stream is closed after LECTURE_EVENT_STREAM_SECS seconds, after
+    which the client reconnects.
+    """
+    lecture = get_current_lecture_or_abort()
+    lecture_id = lecture.lecture_id
+    stream_secs = current_app.config["LECTURE_EVENT_STREAM_SECS"]
+    # The stream must not keep a database connection open.
+    db.session.commit()
+
+    def generate():
+        with get_lecture_event_hub().subscribe(lecture_id) as events:
+            # Lets the client know the subscription is active, so it can fetch the changes it may have missed.
+            yield ": connected\n\n"
+            deadline = time.monotonic() + stream_secs
+            while (remaining := deadline - time.monotonic()) > 0:
+                kinds = events.wait(min(remaining, EVENT_STREAM_KEEPALIVE_SECS))
+                if kinds:
+                    yield f"data: {json.dumps(sorted(kinds))}\n\n"
+                else:
+                    yield ": keepalive\n\n"
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @lecture_routes.before_request
 def lecture_before_request():
     tim_main_execute("SET LOCAL lock_timeout = '1s'")
 
 
 EXTRA_FIELD_NAME = "extra"
+# Maximum duration of a long poll request in seconds.
+LONG_POLL_SECS = 10
+# Interval of the keepalive comments in the lecture event stream in seconds.
+EVENT_STREAM_KEEPALIVE_SECS = 15
 
 
 @suppress_wuff(
@@ -189,7 +232,7 @@ EXTRA_FIELD_NAME = "extra"
 def do_get_updates(m: GetUpdatesModel):
     """Gets updates from some lecture.
 
-    Checks updates in 1 second frequently and answers if there is updates.
+    In long poll mode, waits for lecture events and answers if there are updates.
 
     """
     client_last_id = m.client_last_id
@@ -199,7 +242,6 @@ def do_get_updates(m: GetUpdatesModel):
     use_questions = m.use_questions
     session["use_questions"] = use_questions
 
-    step = 0
     lecture = get_current_lecture()
 
     doc_id = m.doc_id
@@ -267,70 +309,79 @@ def do_get_updates(m: GetUpdatesModel):
     basic_info = {
         "ms": poll_interval_ms,
     }
-    while step <= 10:
-        lecture = get_current_lecture()
-        if not lecture:
-            return get_running_lectures(doc_id)
-        lecture_ending = check_if_lecture_is_ending(lecture)
-        if is_lecturer:
-            lecturers, students = get_lecture_users(lecture)
-        # Gets new messages if the wall is in use.
-        if use_wall:
-            list_of_new_messages = (
-                lecture.messages.filter(Message.msg_id > client_last_id)
-                .order_by(Message.msg_id.asc())
-                .all()
-            )
-
-        # Check if current question is still running and user hasn't already answered on it on another tab.
-        if current_question_id:
-            q = get_asked_question(current_question_id)
-            if q and q.running_question:
-                # Always report question end time in case it has been stopped or extended.
-                basic_info["question_end_time"] = q.running_question.end_time
-
-        base_resp = {
-            **basic_info,
-            "msgs": list_of_new_messages,
-            "lectureEnding": lecture_ending,
-            "lectureId": lecture_id,
-            "lecturers": lecturers,
-            "students": students,
-        }
+    # Instead of checking for updates every second, a long poll waits for an event of the lecture.
+    wait_for_events = long_poll and not current_app.config["TESTING"]
+    deadline = time.monotonic() + LONG_POLL_SECS
+    subscription = (
+        get_lecture_event_hub().subscribe(lecture_id)
+        if wait_for_events
+        else nullcontext()
+    )
+    with subscription as events:
+        while True:
+            lecture = get_current_lecture()
+            if not lecture:
+                return get_running_lectures(doc_id)
+            lecture_ending = check_if_lecture_is_ending(lecture)
+            if is_lecturer:
+                lecturers, students = get_lecture_users(lecture)
+            # Gets new messages if the wall is in use.
+            if use_wall:
+                list_of_new_messages = (
+                    lecture.messages.filter(Message.msg_id > client_last_id)
+                    .order_by(Message.msg_id.asc())
+                    .all()
+                )
 
-        if current_points_id:
-            q = get_asked_question(current_points_id)
-            if q and q.has_activity(QuestionActivityKind.Pointsclosed, u):
-                return {
-                    **base_resp,
-                    EXTRA_FIELD_NAME: {
-                        "points_closed": True,
-                    },
-                }
+            # Check if current question is still running and user hasn't already answered on it on another tab.
+            if current_question_id:
+                q = get_asked_question(current_question_id)
+                if q and q.running_question:
+                    # Always report question end time in case it has been stopped or extended.
+                    basic_info["question_end_time"] = q.running_question.end_time
+
+            base_resp = {
+                **basic_info,
+                "msgs": list_of_new_messages,
+                "lectureEnding": lecture_ending,
+                "lectureId": lecture_id,
+                "lecturers": lecturers,
+                "students": students,
+            }
+
+            if current_points_id:
+                q = get_asked_question(current_points_id)
+                if q and q.has_activity(QuestionActivityKind.Pointsclosed, u):
+                    return {
+                        **base_resp,
+                        EXTRA_FIELD_NAME: {
+                            "points_closed": True,
+                        },
+                    }
 
-        # Gets new questions if the questions are in use.
-        if use_questions:
-            new_question = get_new_question(
-                lecture, current_question_id, current_points_id
-            )
-            if new_question:
-                return {**base_resp, EXTRA_FIELD_NAME: new_question}
+            # Gets new questions if the questions are in use.
+            if use_questions:
+                new_question = get_new_question(
+                    lecture, current_question_id, current_points_id
+                )
+                if new_question:
+                    return {**base_resp, EXTRA_FIELD_NAME: new_question}
 
-        if list_of_new_messages:
-            return base_resp
+            if list_of_new_messages:
+                return base_resp
 
-        if not long_poll or current_app.config["TESTING"]:
-            # Don't loop when testing.
-            break
+            if not wait_for_events:
+                # Don't loop when testing.
+                break
 
-        # Database updates may have happened during sleep, so we have to expire all objects so that they will be
-        # reloaded. Additionally, we don't want to keep the connection open during sleep, so we call commit()
-        # instead of expire_all().
-        db.session.commit()
+            # Database updates may have happened while waiting, so we have to expire all objects so that they will
+            # be reloaded. Additionally, we don't want to keep the connection open while waiting, so we call
+            # commit() instead of expire_all().
+            db.session.commit()
 
-        # For long poll wait 1 sec before new check.
-        time.sleep(1)
-        step += 1
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not events.wait(remaining):
+                break
 
     if lecture_ending != 100 or lecturers or students:
         return base_resp
@@ -472,6 +523,7 @@ def send_message(m: SendMessageModel):
     msg = Message(message=m.message, user_id=get_current_user_id())
     lecture.messages.append(msg)
     db.session.commit()
+    publish_lecture_event(lecture.lecture_id, LectureEventKind.Message)
     return json_response(msg, date_conversion=True)
 
 
@@ -529,6 +581,7 @@ def start_future_lecture():
     lecture.start_time = time_now
     switch_to_lecture(lecture)
     db.session.commit()
+    publish_lecture_event(lecture.lecture_id, LectureEventKind.Lecture)
     return json_response(lecture_dict(lecture), date_conversion=True)
 
 
@@ -684,6 +737,7 @@ def create_lecture():
     if start_time <= current_time <= end_time and not get_current_lecture():
         switch_to_lecture(lecture)
     db.session.commit()
+    publish_lecture_event(lecture.lecture_id, LectureEventKind.Lecture)
     return json_response(lecture, date_conversion=True)
 
 
@@ -704,6 +758,7 @@ def end_lecture():
     lecture.end_time = now
     empty_lecture(lecture)
     db.session.commit()
+    publish_lecture_event(lecture.lecture_id, LectureEventKind.Lecture)
     return json_response(get_running_lectures(lecture.doc_id), date_conversion=True)
 
 
@@ -759,6 +814,7 @@ def extend_lecture():
     lecture = get_lecture_from_request()
     lecture.end_time = new_end_time
     db.session.commit()
+    publish_lecture_event(lecture.lecture_id, LectureEventKind.Lecture)
     return ok_response()
 
 
@@ -778,6 +834,7 @@ def delete_lecture(m: DeleteLectureModel):
         AskedQuestion.query.filter_by(lecture_id=lecture.lecture_id).delete()
         db.session.delete(lecture)
     db.session.commit()
+    publish_lecture_event(m.lecture_id, LectureEventKind.Lecture)
 
     return json_response(get_running_lectures(lecture.doc_id), date_conversion=True)
 
@@ -826,6 +883,7 @@ def join_lecture():
         update_activity(lecture, u)
 
         db.session.commit()
+        publish_lecture_event(lecture.lecture_id, LectureEventKind.Users)
 
     return json_response(
         {
@@ -846,6 +904,7 @@ def leave_lecture_route():
     lecture = get_lecture_from_request(check_access=False)
     leave_lecture(lecture)
     db.session.commit()
+    publish_lecture_event(lecture.lecture_id, LectureEventKind.Users)
     return ok_response()
 
 
@@ -867,6 +926,7 @@ def extend_question():
         raise RouteException("Question is not running")
     rq.end_time += timedelta(seconds=extend)
     db.session.commit()
+    publish_lecture_event(q.lecture_id, LectureEventKind.Question)
     return ok_response()
 
 
@@ -958,6 +1018,7 @@ def ask_question():
     )
     db.session.add(rq)
     db.session.commit()
+    publish_lecture_event(lecture.lecture_id, LectureEventKind.Question)
     return json_response(question, date_conversion=True)
 
 
@@ -984,6 +1045,7 @@ def show_points(m: ShowAnswerPointsModel):
     current_points_id = m.current_points_id
     new_question = get_new_question(lecture, current_question_id, current_points_id)
     db.session.commit()
+    publish_lecture_event(lecture.lecture_id, LectureEventKind.Points)
     if new_question is not None:
         return json_response(new_question, date_conversion=True)
     return empty_response()
@@ -1019,6 +1081,7 @@ def update_question_points():
             answer.get_parsed_answer(), points_table, default_points
         )
     db.session.commit()
+    publish_lecture_event(asked_question.lecture_id, LectureEventKind.Points)
     return ok_response()
 
 
@@ -1081,6 +1144,7 @@ def stop_question(m: AskedIdModel):
         aq, [QuestionActivityKind.Usershown, QuestionActivityKind.Useranswered]
     )
     db.session.commit()
+    publish_lecture_event(lecture.lecture_id, LectureEventKind.Question)
     return ok_response()
 
 
@@ -1184,6 +1248,7 @@ def answer_to_question(m: AnswerToQuestionModel):
             )
             db.session.add(ans)
         db.session.commit()
+        publish_lecture_event(lecture_id, LectureEventKind.Answer)
 
     return ok_response()
 
@@ -1204,5 +1269,6 @@ def close_points():
     if points:
         q.add_activity(QuestionActivityKind.Pointsclosed, get_current_user_object())
         db.session.commit()
+        publish_lecture_event(lecture.lecture_id, LectureEventKind.Points)
 
     return ok_response()
@@ -0,0 +1,118 @@
+"""A content-addressed cache for Dumbo conversions.
+
+The result of converting a piece of markdown depends only on the markdown and the Dumbo options, so results
+are cached by a hash of them (see :func:`get_cache_key`). The cache has two tiers:
+
+* a bounded in-process LRU whose size is limited by ``DUMBO_CACHE_MAX_BYTES`` and
+* optionally (``DUMBO_CACHE_REDIS``), Redis, which is shared between workers and hosts.
+
+Results are stored as JSON strings, so callers always get a fresh copy.
+
+Hits and misses are counted with :func:`timApp.util.timtiming.count_stat`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from collections import OrderedDict
+from functools import cache
+from threading import Lock
+from typing import Any
+
+from tim_common.timjsonencoder import TimJsonEncoder
+from timApp.util.timtiming import count_stat
+
+# Approximate per-entry overhead of the key and value objects.
+ENTRY_OVERHEAD_BYTES = 200
+REDIS_EXPIRE_SECS = 3600 * 24 * 7
+REDIS_KEY_PREFIX = "timdumbo-"
+
+
+@cache
+def get_cache_config() -> tuple[int, bool]:
+    from timApp.tim_app import app
+
+    return app.config["DUMBO_CACHE_MAX_BYTES"], app.config["DUMBO_CACHE_REDIS"]
+
+
+def get_cache_key(path: str, content: str | dict, options: dict) -> str:
+    """Returns the cache key of converting the given content with the given options."""
+    s = json.dumps([path, content, options], sort_keys=True, cls=TimJsonEncoder)
+    return hashlib.sha256(s.encode()).hexdigest()
+
+
+class DumboCache:
+    def __init__(self) -> None:
+        self.entries: OrderedDict[str, str] = OrderedDict()
+        self.size = 0
+        self.lock = Lock()
+
+    def get_many(self, keys: list[str]) -> list[Any | None]:
+        """Returns the cached results of the given keys, or None for the keys that are not cached."""
+        max_bytes, use_redis = get_cache_config()
+        raws: list[str | None] = [None] * len(keys)
+        if max_bytes:
+            with self.lock:
+                for i, key in enumerate(keys):
+                    raw = self.entries.get(key)
+                    if raw is not None:
+                        self.entries.move_to_end(key)
+                        raws[i] = raw
+        local_hits = sum(1 for r in raws if r is not None)
+        count_stat("dumbo_cache.hit", local_hits)
+        redis_hits = 0
+        if use_redis and local_hits < len(keys):
+            from timApp.document.caching import rclient
+
+            missing = [i for i, r in enumerate(raws) if r is None]
+            values = rclient.mget([REDIS_KEY_PREFIX + keys[i] for i in missing])
+            found = {}
+            for i, value in zip(missing, values):
+                if value is not None:
+                    raws[i] = found[keys[i]] = value.decode()
+            redis_hits = len(found)
+            count_stat("dumbo_cache.redis_hit", redis_hits)
+            self.__put_local(found, max_bytes)
+        count_stat("dumbo_cache.miss", len(keys) - local_hits - redis_hits)
+        return [json.loads(r) if r is not None else None for r in raws]
+
+    def put_many(self, items: dict[str, Any]) -> None:
+        if not items:
+            return
+        max_bytes, use_redis = get_cache_config()
+        raws = {k: json.dumps(v) for k, v in items.items()}
+        self.__put_local(raws, max_bytes)
+        if use_redis:
+            from timApp.document.caching import rclient
+
+            pipe = rclient.pipeline()
+            for k, v in raws.items():
+                pipe.set(REDIS_KEY_PREFIX + k, v, ex=REDIS_EXPIRE_SECS)
+            pipe.execute()
+
+    def __put_local(self, raws: dict[str, str], max_bytes: int) -> None:
+        if not max_bytes:
+            return
+        with self.lock:
+            for key, raw in raws.items():
+                size = ENTRY_OVERHEAD_BYTES + len(raw)
+                if size > max_bytes:
+                    continue
+                old = self.entries.pop(key, None)
+                if old is not None:
+                    self.size -= ENTRY_OVERHEAD_BYTES + len(old)
+                self.entries[key] = raw
+                self.size += size
+                while self.size > max_bytes:
+                    _, evicted = self.entries.popitem(last=False)
+                    self.size -= ENTRY_OVERHEAD_BYTES + len(evicted)
+                    count_stat("dumbo_cache.evict")
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+dumbo_cache = DumboCache()
@@ -1,11 +1,26 @@
-"""Defines a client interface for using Dumbo, the markdown converter."""
+"""Defines a client interface for using Dumbo, the markdown converter.
+
+Requests are sent through a pooled keep-alive session. Large lists are split into shards of
+``DUMBO_SHARD_SIZE`` items which are sent concurrently to the Dumbo instances listed in ``DUMBO_URLS``.
+Results are cached by content (see :mod:`timApp.markdown.dumbocache`), so only cache misses are sent to Dumbo.
+"""
 import json
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
 from enum import Enum
-from typing import NamedTuple, overload
+from functools import cache
+from itertools import count
+from threading import local
+from typing import NamedTuple, overload, Any
 
 import requests
 
 from tim_common.timjsonencoder import TimJsonEncoder
+from timApp.markdown.dumbocache import dumbo_cache, get_cache_key
+from timApp.util.logger import log_warning
+from timApp.util.timtiming import count_stat
 
 
 class DumboHTMLException(Exception):
@@ -67,11 +82,111 @@ class DumboOptions(NamedTuple):
         }
 
 
-DUMBO_URL = "http://dumbo:5000"
-
 KEYS_PATHS = {"/mdkeys", "/latexkeys"}
 
 
+@dataclass(frozen=True)
+class DumboConfig:
+    urls: list[str]
+    shard_size: int
+    max_workers: int
+    retries: int
+    timeout: float | None
+
+
+@cache
+def get_dumbo_config() -> DumboConfig:
+    from timApp.tim_app import app
+
+    return DumboConfig(
+        urls=app.config["DUMBO_URLS"],
+        shard_size=app.config["DUMBO_SHARD_SIZE"],
+        max_workers=app.config["DUMBO_MAX_WORKERS"],
+        retries=app.config["DUMBO_RETRIES"],
+        timeout=app.config["DUMBO_TIMEOUT"],
+    )
+
+
+class DumboClient:
+    """A pooled client for one or more Dumbo instances.
+
+    Each thread keeps its own keep-alive session. Requests are distributed to the Dumbo instances in
+    round-robin order, and a request that fails to connect is retried on the next instance.
+    """
+
+    def __init__(self, config: DumboConfig):
+        self.config = config
+        self.executor = ThreadPoolExecutor(
+            max_workers=config.max_workers, thread_name_prefix="dumbo"
+        )
+        self.tls = local()
+        self.counter = count()
+
+    def get_session(self) -> requests.Session:
+        session = getattr(self.tls, "session", None)
+        if session is None:
+            session = requests.Session()
+            self.tls.session = session
+        return session
+
+    def post_async(self, path: str, data_to_send: dict) -> Future:
+        return self.executor.submit(self.post, path, data_to_send)
+
+    def post(self, path: str, data_to_send: dict) -> Any:
+        body = json.dumps(data_to_send, cls=TimJsonEncoder)
+        urls = self.config.urls
+        start = next(self.counter)
+        for attempt in range(self.config.retries + 1):
+            url = urls[(start + attempt) % len(urls)]
+            time_before = time.perf_counter()
+            try:
+                r = self.get_session().post(
+                    url=url + path, data=body, timeout=self.config.timeout
+                )
+            except requests.ReadTimeout as e:
+                # The conversion itself took too long; retrying would only repeat it on another instance.
+                count_stat("dumbo.timeout")
+                raise Exception("Dumbo request timed out") from e
+            except requests.ConnectionError as e:
+                count_stat("dumbo.connection_error")
+                if attempt == self.config.retries:
+                    raise Exception("Failed to connect to Dumbo") from e
+                count_stat("dumbo.retry")
+                log_warning(f"Dumbo request to {url} failed, retrying: {e}")
+                continue
+            count_stat("dumbo.request")
+            count_stat(
+                "dumbo.latency_ms", round((time.perf_counter() - time_before) * 1000)
+            )
+            if r.status_code != 200:
+                raise DumboHTMLException()
+            r.encoding = "utf-8"
+            return r.json()
+
+
+_client: DumboClient | None = None
+_client_pid: int | None = None
+
+
+def get_dumbo_client() -> DumboClient:
+    """Returns the Dumbo client of the current process."""
+    global _client, _client_pid
+    # The connections and threads of the session must not be shared with forked worker processes.
+    if _client is None or _client_pid != os.getpid():
+        _client = DumboClient(get_dumbo_config())
+        _client_pid = os.getpid()
+    return _client
+
+
+def make_shards(data: list, shard_size: int) -> list[tuple[int, int]]:
+    """Splits the index range of the data into (start, end) pairs of at most shard_size items."""
+    if not shard_size or len(data) <= shard_size:
+        return [(0, len(data))]
+    return [
+        (i, min(i + shard_size, len(data))) for i in range(0, len(data), shard_size)
+    ]
+
+
 @overload
 def call_dumbo(
     data: list[str],
@@ -122,32 +237,60 @@ def call_dumbo(
     """
     is_dict = isinstance(data, dict)
     opts = options.dict()
-    try:
-        if path in KEYS_PATHS:
-            if is_dict:
-                data_to_send = {"content": [{"content": data}], **opts}
-            else:
-                if data_opts:
-                    data_to_send = {
-                        "content": [
-                            {"content": d, **o.dict()} for d, o in zip(data, data_opts)
-                        ],
-                        **opts,
-                    }
-                else:
-                    data_to_send = {"content": [{"content": d} for d in data], **opts}
-        else:
-            data_to_send = {"content": data, **opts}
-        r = requests.post(
-            url=DUMBO_URL + path, data=json.dumps(data_to_send, cls=TimJsonEncoder)
+    items = [data] if is_dict else data
+    wrap = is_dict or path in KEYS_PATHS
+    item_opts = [o.dict() for o in data_opts] if wrap and data_opts else None
+    keys = [
+        get_cache_key(path, item, {**opts, **item_opts[i]} if item_opts else opts)
+        for i, item in enumerate(items)
+    ]
+    results = dumbo_cache.get_many(keys)
+    missing = [i for i, r in enumerate(results) if r is None]
+    if missing:
+        converted = convert_with_dumbo(
+            path,
+            [items[i] for i in missing],
+            opts,
+            [item_opts[i] for i in missing] if item_opts else None,
+            wrap,
         )
-        r.encoding = "utf-8"
-    except requests.ConnectionError:
-        raise Exception("Failed to connect to Dumbo")
-    if r.status_code != 200:
-        raise DumboHTMLException()
-    returned = r.json()
-    if is_dict:
-        return returned[0]
-    else:
-        return returned
+        for i, result in zip(missing, converted):
+            results[i] = result
+        dumbo_cache.put_many({keys[i]: results[i] for i in missing})
+    return results[0] if is_dict else results
+
+
+def convert_with_dumbo(
+    path: str,
+    items: list,
+    opts: dict,
+    item_opts: list[dict] | None,
+    wrap: bool,
+) -> list:
+    """Sends the items to Dumbo, sharding them if needed.
+
+    :param wrap: Whether the items are sent as {"content": item} objects with optional per-item options.
+    """
+    client = get_dumbo_client()
+
+    def make_content(start: int, end: int) -> list:
+        if not wrap:
+            return items[start:end]
+        if item_opts:
+            return [
+                {"content": d, **o}
+                for d, o in zip(items[start:end], item_opts[start:end])
+            ]
+        return [{"content": d} for d in items[start:end]]
+
+    shards = make_shards(items, client.config.shard_size)
+    if len(shards) == 1:
+        return client.post(path, {"content": make_content(*shards[0]), **opts})
+    futures = [
+        client.post_async(path, {"content": make_content(start, end), **opts})
+        for start, end in shards
+    ]
+    returned = []
+    for f in futures:
+        returned += f.result()
+    return returned
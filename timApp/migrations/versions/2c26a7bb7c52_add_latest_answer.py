@@ -0,0 +1,50 @@
+"""Add latest_answer
+
+Revision ID: 2c26a7bb7c52
+Revises: 93ffad8dd508
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = "2c26a7bb7c52"
+down_revision = "93ffad8dd508"
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# noinspection SqlResolve
+def upgrade():
+    op.create_table(
+        "latest_answer",
+        sa.Column("task_id", sa.Text(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("answer_id", sa.Integer(), nullable=False),
+        sa.Column("valid_answer_id", sa.Integer(), nullable=True),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("valid_count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["useraccount.id"],
+        ),
+        sa.PrimaryKeyConstraint("task_id", "user_id"),
+    )
+    op.execute(
+        """
+INSERT INTO latest_answer (task_id, user_id, answer_id, valid_answer_id, count, valid_count)
+SELECT a.task_id,
+       ua.user_id,
+       max(a.id),
+       max(a.id) FILTER (WHERE a.valid),
+       count(a.id),
+       count(a.id) FILTER (WHERE a.valid)
+FROM useranswer ua
+         JOIN answer a ON a.id = ua.answer_id
+GROUP BY ua.user_id, a.task_id
+"""
+    )
+
+
+def downgrade():
+    op.drop_table("latest_answer")
@@ -0,0 +1,57 @@
+"""Add answer.doc_id and answer.task_name and composite indexes for answers
+
+Revision ID: 93ffad8dd508
+Revises: 3fec5685a240
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = "93ffad8dd508"
+down_revision = "3fec5685a240"
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# noinspection SqlResolve
+def upgrade():
+    op.add_column("answer", sa.Column("doc_id", sa.Integer(), nullable=True))
+    op.add_column("answer", sa.Column("task_name", sa.Text(), nullable=True))
+    op.execute(
+        r"""
+UPDATE answer
+SET doc_id    = split_part(task_id, '.', 1)::integer,
+    task_name = substring(task_id from position('.' in task_id) + 1)
+WHERE task_id ~ '^\d+\.'
+"""
+    )
+    op.create_index(
+        "answer_doc_id_task_name_idx",
+        "answer",
+        ["doc_id", "task_name"],
+        unique=False,
+    )
+    op.create_index(
+        "answer_task_id_answered_on_idx",
+        "answer",
+        ["task_id", "answered_on"],
+        unique=False,
+    )
+    # The composite index above covers the queries by task id.
+    op.execute("DROP INDEX IF EXISTS ix_answer_task_id")
+    op.create_index(
+        "useranswer_user_id_answer_id_idx",
+        "useranswer",
+        ["user_id", "answer_id"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index("useranswer_user_id_answer_id_idx", table_name="useranswer")
+    op.create_index("ix_answer_task_id", "answer", ["task_id"], unique=False)
+    op.drop_index("answer_task_id_answered_on_idx", table_name="answer")
+    op.drop_index("answer_doc_id_task_name_idx", table_name="answer")
+    op.drop_column("answer", "task_name")
+    op.drop_column("answer", "doc_id")
@@ -34,7 +34,7 @@ from timApp.notification.notify import notify_doc_watchers
 from timApp.notification.pending_notification import PendingNotification
 from timApp.timdb.exceptions import TimDbException
 from timApp.timdb.sqa import db
-from timApp.user.user import User
+from timApp.user.user import User, teacher_access_set
 from timApp.util.flask.requesthelper import RouteException, NotExist
 from timApp.util.flask.responsehelper import json_response
 from timApp.util.flask.typedblueprint import TypedBlueprint
@@ -125,7 +125,7 @@ def get_notes(
         all_docs = i.get_all_documents(
             include_subdirs=True,
         )
-        if not all(u.has_teacher_access(d) for d in all_docs):
+        if not all(u.get_some_accesses(all_docs, teacher_access_set).values()):
             raise AccessDenied(
                 "You do not have teacher access to all documents in this folder."
             )
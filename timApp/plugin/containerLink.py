@@ -1,12 +1,15 @@
 import json
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from functools import lru_cache
 from re import Pattern
-from typing import Any
+from typing import Any, Callable, TypeVar
 
 import requests
 from flask import current_app
+from redis import RedisError
 from requests import Response
 
 from timApp.document.docsettings import DocSettings
@@ -15,8 +18,10 @@ from timApp.markdown.dumboclient import call_dumbo, DumboOptions
 from timApp.plugin.plugin import Plugin, AUTOMD
 from timApp.plugin.pluginOutputFormat import PluginOutputFormat
 from timApp.plugin.pluginexception import PluginException
+from timApp.plugin.pluginsession import plugin_request
 from timApp.plugin.timtable import timTable
 from timApp.util.logger import log_warning
+from timApp.util.timtiming import count_stat
 
 CSPLUGIN_DOMAIN = "csplugin"
 DRAGPLUGIN_DOMAIN = "drag"
@@ -276,7 +281,7 @@ def do_request(
     headers: Any,
     read_timeout: int,
 ) -> requests.Response:
-    resp = requests.request(
+    resp = plugin_request(
         method,
         url,
         data=data,
@@ -292,9 +297,65 @@ def do_request(
 plugin_request_fn = do_request
 
 
-def render_plugin(
+@dataclass
+class PluginCall:
+    """A prepared call to a plugin route.
+
+    Preparing a call may need the database, but sending it does not, so calls can be sent concurrently
+    with :func:`run_concurrently`.
+    """
+
+    plugin: str
+    route: str
+    data: str
+
+    def send(self) -> str:
+        return call_plugin_generic(
+            self.plugin,
+            "post",
+            self.route,
+            data=self.data,
+            headers={"Content-type": "application/json"},
+        ).text
+
+
+T = TypeVar("T")
+
+
+def run_concurrently(fns: list[Callable[[], T]]) -> list[T | PluginException]:
+    """Calls the given functions concurrently, at most PLUGIN_MAX_CONCURRENT_CALLS at a time.
+
+    Under the gevent worker class, the threads are greenlets. The functions must not use the database session
+    of the calling thread, but they get an app context.
+
+    :return: The results in the same order as the functions. A PluginException raised by a function is returned
+     in place of its result.
+    """
+    # current_app is a LocalProxy; the threads need the app object itself to push an app context.
+    app = current_app._get_current_object()  # type: ignore[attr-defined]
+
+    def call(fn: Callable[[], T]) -> T | PluginException:
+        try:
+            return fn()
+        except PluginException as e:
+            return e
+
+    def call_in_app_context(fn: Callable[[], T]) -> T | PluginException:
+        with app.app_context():
+            return call(fn)
+
+    max_workers = min(len(fns), app.config["PLUGIN_MAX_CONCURRENT_CALLS"])
+    if max_workers <= 1:
+        return [call(fn) for fn in fns]
+    with ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="plugin"
+    ) as executor:
+        return list(executor.map(call_in_app_context, fns))
+
+
+def prepare_plugin_call(
     docsettings: DocSettings, plugin: Plugin, output_format: PluginOutputFormat
-) -> str:
+) -> PluginCall:
     plugin_data = plugin.render_json()
     if docsettings.plugin_md():
         convert_md(
@@ -304,13 +365,11 @@ def render_plugin(
             ),
             outtype="md" if output_format == PluginOutputFormat.HTML else "latex",
         )
-    return call_plugin_generic(
+    return PluginCall(
         plugin.type,
-        "post",
         output_format.value,
-        data=json.dumps(plugin_data, cls=TimJsonEncoder),
-        headers={"Content-type": "application/json"},
-    ).text
+        json.dumps(plugin_data, cls=TimJsonEncoder),
+    )
 
 
 def call_mock_dumbo_s(s: str) -> str:
@@ -412,13 +471,17 @@ def convert_tex_mock(plugin_data: dict | list) -> None:
         dict_to_dumbo(pm)
 
 
-def render_plugin_multi(
+def prepare_plugin_multi_call(
     docsettings: DocSettings,
     plugin: str,
     plugin_data: list[Plugin],
     plugin_output_format: PluginOutputFormat = PluginOutputFormat.HTML,
     default_auto_md: bool = False,
-) -> str:
+) -> PluginCall | str:
+    """Prepares a multihtml/multimd call to a plugin.
+
+    :return: The call, or the response directly if the plugin is rendered in-process.
+    """
     opts = docsettings.get_dumbo_options()
     plugin_dumbo_opts = [p.par.get_dumbo_options(base_opts=opts) for p in plugin_data]
     plugin_dicts = [p.render_json() for p in plugin_data]
@@ -457,13 +520,11 @@ def render_plugin_multi(
     if plugin_reg.instance and plugin_output_format == PluginOutputFormat.HTML:
         return plugin_reg.instance.multihtml_direct_call(plugin_dicts)
 
-    return call_plugin_generic(
+    return PluginCall(
         plugin,
-        "post",
-        ("multimd" if plugin_output_format == PluginOutputFormat.MD else "multihtml"),
-        data=json.dumps(plugin_dicts, cls=TimJsonEncoder),
-        headers={"Content-type": "application/json"},
-    ).text
+        "multimd" if plugin_output_format == PluginOutputFormat.MD else "multihtml",
+        json.dumps(plugin_dicts, cls=TimJsonEncoder),
+    )
 
 
 def has_auto_md(data: dict, default: bool) -> bool:
@@ -506,10 +567,74 @@ def call_plugin_answer(plugin: str, answer_data: dict) -> str:
     ).text
 
 
-# Get lists of js and css files required by plugin, as well as list of Angular modules they define.
-@lru_cache(maxsize=100)
-def plugin_reqs(plugin: str) -> str:
-    return call_plugin_generic(plugin, "get", "reqs").text
+PLUGIN_REQS_REDIS_PREFIX = "tim-plugin-reqs-"
+
+# Per-process reqs cache: plugin name -> (expiry time, parsed reqs).
+_local_reqs: dict[str, tuple[float, dict]] = {}
+
+
+def get_plugin_reqs(plugin: str) -> dict:
+    """Gets the lists of js and css files required by a plugin, as well as other plugin capabilities.
+
+    Reqs change only when a plugin is deployed, so they are cached per process for PLUGIN_REQS_LOCAL_TTL
+    seconds and in Redis (shared by all workers) for PLUGIN_REQS_CACHE_TTL seconds. If refreshing expired
+    reqs fails, the stale value is used. :func:`flush_plugin_reqs_cache` drops the cached reqs.
+
+    The returned dict is a copy that the caller may modify.
+    """
+    from timApp.document.caching import rclient
+
+    now = time.monotonic()
+    cached = _local_reqs.get(plugin)
+    if cached and cached[0] > now:
+        count_stat("plugin_reqs.hit")
+        return dict(cached[1])
+    redis_key = PLUGIN_REQS_REDIS_PREFIX + plugin
+    try:
+        raw = rclient.get(redis_key)
+    except RedisError as e:
+        # Redis is only a cache, so the reqs are fetched from the plugin directly.
+        log_warning(f"Failed to get the cached reqs of plugin {plugin}: {e}")
+        raw = None
+    if raw is not None:
+        count_stat("plugin_reqs.redis_hit")
+        reqs = json.loads(raw)
+    else:
+        count_stat("plugin_reqs.miss")
+        try:
+            text = call_plugin_generic(plugin, "get", "reqs").text
+            try:
+                reqs = json.loads(text)
+            except ValueError as e:
+                raise PluginException(
+                    f"Failed to parse JSON from plugin reqs route: {e}"
+                )
+        except PluginException as e:
+            if cached is None:
+                raise
+            log_warning(f"Using stale reqs of plugin {plugin}: {e}")
+            reqs = cached[1]
+        else:
+            try:
+                rclient.set(
+                    redis_key, text, ex=current_app.config["PLUGIN_REQS_CACHE_TTL"]
+                )
+            except RedisError as e:
+                log_warning(f"Failed to cache the reqs of plugin {plugin}: {e}")
+    _local_reqs[plugin] = now + current_app.config["PLUGIN_REQS_LOCAL_TTL"], reqs
+    return dict(reqs)
+
+
+def flush_plugin_reqs_cache() -> None:
+    """Drops the cached reqs of all plugins.
+
+    Other worker processes notice the flush when their local entries expire.
+    """
+    from timApp.document.caching import rclient
+
+    _local_reqs.clear()
+    for key in rclient.scan_iter(match=f"{PLUGIN_REQS_REDIS_PREFIX}*"):
+        rclient.delete(key)
 
 
 # Gets plugin info (host)
@@ -1,9 +1,8 @@
 from dataclasses import dataclass
 from typing import Any
 
-import requests
-
 from timApp.plugin.containerLink import get_plugin
+from timApp.plugin.pluginsession import plugin_request
 
 
 @dataclass
@@ -23,9 +22,7 @@ def jsrunner_run(params: JsRunnerParams) -> tuple[Any, str]:
     Run JavaScript code in jsrunner.
     """
     runurl = get_plugin("jsrunner").host + "runScript/"
-    r = requests.request(
-        "post", runurl, json={"code": params.code, "data": params.data}
-    )
+    r = plugin_request("post", runurl, json={"code": params.code, "data": params.data})
     result = r.json()
     error = result.get("error")
     if error:
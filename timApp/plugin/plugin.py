@@ -20,11 +20,11 @@ from timApp.document.editing.globalparid import GlobalParId
 from timApp.document.hide_names import is_hide_names
 from timApp.document.macroinfo import MacroInfo
 from timApp.document.usercontext import UserContext
-from timApp.document.viewcontext import ViewContext
+from timApp.document.viewcontext import ViewContext, default_view_ctx
 from timApp.document.yamlblock import strip_code_block, YamlBlock, merge
 from timApp.item.taskblock import TaskBlock
 from timApp.markdown.autocounters import TimSandboxedEnvironment
-from timApp.markdown.markdownconverter import expand_macros
+from timApp.markdown.markdownconverter import expand_macros, has_macros
 from timApp.plugin.pluginOutputFormat import PluginOutputFormat
 from timApp.plugin.pluginexception import PluginException
 from timApp.plugin.plugintype import CONTENT_FIELD_NAME_MAP, PluginTypeLazy
@@ -33,6 +33,7 @@ from timApp.printing.printsettings import PrintFormat
 from timApp.timdb.exceptions import TimDbException
 from timApp.user.user import User
 from timApp.util.rndutils import myhash, SeedClass
+from timApp.util.timtiming import count_stat
 from timApp.util.utils import try_load_json, get_current_time, Range
 from tim_common.markupmodels import PointsRule, KnownMarkupFields
 from tim_common.marshmallow_dataclass import class_schema
@@ -226,9 +227,10 @@ class Plugin:
         else:
             d = cached_doc
             assert d.id == tid.doc_id
-        doc = d.document
-        doc.insert_preamble_pars()
-        return find_plugin_from_document(doc, tid, user_ctx, view_ctx), d
+        return (
+            find_plugin_from_document_or_preamble(d.document, tid, user_ctx, view_ctx),
+            d,
+        )
 
     @staticmethod
     def from_paragraph(
@@ -866,23 +868,31 @@ class CachedPluginFinder:
 def find_plugin_from_document(
     d: Document, task_id: TaskId, u: UserContext, view_ctx: ViewContext
 ) -> Plugin:
+    from timApp.plugin.taskindex import get_task_candidates
+
+    # Only the paragraphs that the task index lists for the task are checked first.
+    # If the plugin is not found among them, the whole document is searched as before.
+    candidates = get_task_candidates(d, task_id.task_name)
+    if candidates is not None:
+        for par_id, t in candidates:
+            if task_id.block_id_hint and par_id != task_id.block_id_hint:
+                continue
+            try:
+                p = DocParagraph.get(d, par_id, t)
+            except TimDbException:
+                continue
+            plug = find_plugin_from_par(p, task_id, u, view_ctx)
+            if plug:
+                return plug
+        count_stat("task_index.miss")
+
     used_hint = False
     with d.__iter__() as it:
         for p in it:
             if task_id.block_id_hint and p.get_id() != task_id.block_id_hint:
                 used_hint = True
                 continue
-            if p.is_reference():
-                try:
-                    ref_pars = p.get_referenced_pars()
-                except TimDbException:  # Ignore invalid references
-                    continue
-                else:
-                    for rp in ref_pars:
-                        plug = maybe_get_plugin_from_par(rp, task_id, u, view_ctx, True)
-                        if plug:
-                            return plug
-            plug = maybe_get_plugin_from_par(p, task_id, u, view_ctx)
+            plug = find_plugin_from_par(p, task_id, u, view_ctx)
             if plug:
                 return plug
 
@@ -892,6 +902,78 @@ def find_plugin_from_document(
     raise TaskNotFoundException(err_msg)
 
 
+def find_plugin_from_document_or_preamble(
+    d: Document, task_id: TaskId, u: UserContext, view_ctx: ViewContext
+) -> Plugin:
+    """Finds the plugin like :func:`find_plugin_from_document`, but also from the preamble of the document.
+
+    The preamble paragraphs are inserted in the document only if the task is not found in the document itself,
+    so answering a task of the document needs neither the whole document nor the cloned preamble paragraphs.
+    """
+    if d.preamble_included:
+        return find_plugin_from_document(d, task_id, u, view_ctx)
+    try:
+        return find_plugin_from_document(d, task_id, u, view_ctx)
+    except TaskNotFoundException:
+        if not d.get_docinfo().get_preamble_docs():
+            raise
+    for p in d.insert_preamble_pars():
+        if task_id.block_id_hint and p.get_id() != task_id.block_id_hint:
+            continue
+        plug = find_plugin_from_par(p, task_id, u, view_ctx)
+        if plug:
+            return plug
+    raise TaskNotFoundException(f"Task not found in the document: {task_id.task_name}")
+
+
+def find_plugin_from_par(
+    p: DocParagraph, task_id: TaskId, u: UserContext, view_ctx: ViewContext
+) -> Plugin | None:
+    """Returns the plugin with the given task id from the paragraph or from the paragraphs that it references."""
+    if p.is_reference():
+        try:
+            ref_pars = p.get_referenced_pars()
+        except TimDbException:  # Ignore invalid references
+            return None
+        else:
+            for rp in ref_pars:
+                plug = maybe_get_plugin_from_par(rp, task_id, u, view_ctx, True)
+                if plug:
+                    return plug
+    return maybe_get_plugin_from_par(p, task_id, u, view_ctx)
+
+
+def get_par_task_names(p: DocParagraph) -> tuple[list[str], bool]:
+    """Returns the names of the tasks in the paragraph as :func:`maybe_get_plugin_from_par` finds them.
+
+    The task ids of inline plugins are read from the Markdown expanded without a user.
+
+    :return: The task names and whether the names may depend on the user, i.e. whether the paragraph has
+     inline plugins and macros.
+    """
+    names = []
+    t_attr = p.get_attr("taskId")
+    if t_attr and p.get_attr("plugin"):
+        try:
+            names.append(
+                TaskId.parse(
+                    t_attr, allow_block_hint=False, require_doc_id=False
+                ).task_name
+            )
+        except PluginException:
+            pass
+    if not p.get_attr("defaultplugin"):
+        return names, False
+    macroinfo = p.doc.get_settings().get_macroinfo(default_view_ctx)
+    dynamic = not p.get_nomacros() and has_macros(p.get_markdown(), macroinfo.jinja_env)
+    for p_task_id, _, _, _ in find_inline_plugins(block=p, macroinfo=macroinfo):
+        try:
+            names.append(p_task_id.validate().task_name)
+        except PluginException:
+            continue
+    return names, dynamic
+
+
 class InlinePlugin(Plugin):
     def __init__(
         self,
@@ -2,8 +2,9 @@
 import json
 from collections import OrderedDict, defaultdict
 from dataclasses import dataclass
+from functools import partial
 from itertools import chain
-from typing import Optional, Union, DefaultDict
+from typing import Optional, Union, DefaultDict, Callable
 from xml.sax.saxutils import quoteattr
 
 import attr
@@ -12,7 +13,8 @@ import yaml.parser
 from sqlalchemy import func
 
 from timApp.answer.answer import Answer
-from timApp.answer.answers import valid_answers_query, valid_taskid_filter
+from timApp.answer.answer_models import LatestAnswer
+from timApp.answer.answers import valid_answers_query
 from timApp.auth.accesshelper import has_edit_access, verify_view_access
 from timApp.document.docentry import DocEntry
 from timApp.document.docparagraph import DocParagraph
@@ -24,8 +26,14 @@ from timApp.document.usercontext import UserContext
 from timApp.document.viewcontext import ViewContext
 from timApp.document.yamlblock import YamlBlock
 from timApp.markdown.dumboclient import call_dumbo
-from timApp.plugin.containerLink import plugin_reqs, get_plugin
-from timApp.plugin.containerLink import render_plugin_multi, render_plugin, get_plugins
+from timApp.plugin.containerLink import get_plugin_reqs, get_plugin
+from timApp.plugin.containerLink import (
+    get_plugins,
+    prepare_plugin_call,
+    prepare_plugin_multi_call,
+    PluginCall,
+    run_concurrently,
+)
 from timApp.plugin.plugin import (
     Plugin,
     PluginRenderOptions,
@@ -49,6 +57,7 @@ from timApp.util.get_fields import (
     GetFieldsAccess,
 )
 from timApp.util.rndutils import SeedClass
+from timApp.util.answerutil import task_ids_to_strlist
 from timApp.util.timtiming import taketime
 from timApp.util.utils import (
     get_error_tex,
@@ -388,10 +397,15 @@ def get_answers(user, task_ids, answer_map):
         )
     else:
         sub = (
-            user.answers.filter(valid_taskid_filter(task_ids))
-            .add_columns(col, cnt)
-            .with_entities(col, cnt)
-            .group_by(Answer.task_id)
+            LatestAnswer.query.filter(
+                (LatestAnswer.user_id == user.id)
+                & LatestAnswer.task_id.in_(task_ids_to_strlist(task_ids))
+                & (LatestAnswer.valid_answer_id != None)
+            )
+            .with_entities(
+                LatestAnswer.valid_answer_id.label("col"),
+                LatestAnswer.valid_count.label("cnt"),
+            )
             .subquery()
         )
     answers: list[tuple[Answer, int]] = (
@@ -616,36 +630,83 @@ def pluginify(
     taketime("glb/ucu", "done")
     settings = doc.get_settings()
     all_plugins = []
+
+    def set_errors(plugin_block_map: dict, err: str) -> None:
+        for idx, r in plugin_block_map.keys():
+            placements[idx].set_error(r, err)
+
+    plugin_groups = []
     for plugin_name, plugin_block_map in plugins.items():
-        taketime("plg", plugin_name)
         try:
             plugin = get_plugin(plugin_name)
-            plugin_lazy = plugin.lazy
-
-            plugin_block_map_vals = [*plugin_block_map.values()]
-            for p in plugin_block_map_vals:
-                all_plugins.append(p)
-
-            resp = plugin_reqs(plugin_name)
         except PluginException as e:
             has_errors = True
-            for idx, r in plugin_block_map.keys():
-                placements[idx].set_error(r, str(e))
+            set_errors(plugin_block_map, str(e))
             continue
-        # taketime("plg e", plugin_name)
+        all_plugins.extend(plugin_block_map.values())
+        plugin_groups.append((plugin_name, plugin_block_map, plugin))
+
+    # The plugin calls are first prepared one plugin type at a time and then sent concurrently.
+    # Each handler places the outputs of its own call, so the placement does not depend on the order in which
+    # the calls finish.
+    taketime("plg", "reqs")
+    all_reqs = run_concurrently(
+        [partial(get_plugin_reqs, name) for name, _, _ in plugin_groups]
+    )
+    calls: list[PluginCall] = []
+    handlers: list[Callable[[str | PluginException], None]] = []
+
+    def handle_multi_response(
+        plugin_name: str,
+        plugin_block_map: dict,
+        plugin_lazy: bool,
+        response: str | PluginException,
+    ) -> None:
+        nonlocal has_errors
+        if isinstance(response, PluginException):
+            has_errors = True
+            set_errors(plugin_block_map, str(response))
+            return
         try:
-            reqs = json.loads(resp)
-            plugin.can_give_task = reqs.get("canGiveTask", False)
-            if plugin_name == "mmcq" or plugin_name == "mcq":
-                reqs["multihtml"] = True
-                reqs["multimd"] = True
+            plugin_htmls = json.loads(response)
         except ValueError as e:
             has_errors = True
-            for idx, r in plugin_block_map.keys():
+            set_errors(
+                plugin_block_map,
+                f"Failed to parse plugin response from multihtml route: {e}",
+            )
+            return
+        if not isinstance(plugin_htmls, list):
+            for ((idx, r), plugin) in plugin_block_map.items():
+                plugin.plugin_lazy = plugin_lazy
                 placements[idx].set_error(
-                    r, f"Failed to parse JSON from plugin reqs route: {e}"
+                    r,
+                    f"Multihtml response of {plugin_name} was not a list: {plugin_htmls}",
                 )
+        else:
+            for ((idx, r), plugin), html in zip(plugin_block_map.items(), plugin_htmls):
+                plugin.plugin_lazy = plugin_lazy
+                placements[idx].set_output(r, html)
+
+    def handle_response(idx: int, r: Range, html: str | PluginException) -> None:
+        nonlocal has_errors
+        if isinstance(html, PluginException):
+            has_errors = True
+            placements[idx].set_error(r, str(html))
+            return
+        placements[idx].set_output(r, html)
+
+    for (plugin_name, plugin_block_map, plugin), reqs in zip(plugin_groups, all_reqs):
+        taketime("plg", plugin_name)
+        plugin_lazy = plugin.lazy
+        if isinstance(reqs, PluginException):
+            has_errors = True
+            set_errors(plugin_block_map, str(reqs))
             continue
+        plugin.can_give_task = reqs.get("canGiveTask", False)
+        if plugin_name == "mmcq" or plugin_name == "mcq":
+            reqs["multihtml"] = True
+            reqs["multimd"] = True
         plugin_js_files, plugin_css_files = plugin_deps(reqs)
         for src in plugin_js_files:
             if src.startswith("http") or src.startswith("/"):  # absolute URL
@@ -668,43 +729,26 @@ def pluginify(
         default_auto_md = reqs.get("default_automd", False)
 
         if (html_out and reqs.get("multihtml")) or (md_out and reqs.get("multimd")):
+            handler = partial(
+                handle_multi_response, plugin_name, plugin_block_map, plugin_lazy
+            )
             try:
                 # taketime("plg m", plugin_name)
-                response = render_plugin_multi(
+                call = prepare_plugin_multi_call(
                     settings,
                     plugin_name,
                     list(plugin_block_map.values()),
                     plugin_output_format=output_format,
                     default_auto_md=default_auto_md,
                 )
-                taketime("plg e", plugin_name)
             except PluginException as e:
-                has_errors = True
-                for idx, r in plugin_block_map.keys():
-                    placements[idx].set_error(r, str(e))
+                handler(e)
                 continue
-            try:
-                plugin_htmls = json.loads(response)
-            except ValueError as e:
-                has_errors = True
-                for idx, r in plugin_block_map.keys():
-                    placements[idx].set_error(
-                        r, f"Failed to parse plugin response from multihtml route: {e}"
-                    )
-                continue
-            if not isinstance(plugin_htmls, list):
-                for ((idx, r), plugin) in plugin_block_map.items():
-                    plugin.plugin_lazy = plugin_lazy
-                    placements[idx].set_error(
-                        r,
-                        f"Multihtml response of {plugin_name} was not a list: {plugin_htmls}",
-                    )
+            if isinstance(call, str):
+                handler(call)
             else:
-                for ((idx, r), plugin), html in zip(
-                    plugin_block_map.items(), plugin_htmls
-                ):
-                    plugin.plugin_lazy = plugin_lazy
-                    placements[idx].set_output(r, html)
+                calls.append(call)
+                handlers.append(handler)
         else:
             for (idx, r), plugin in plugin_block_map.items():
                 if md_out:
@@ -715,17 +759,24 @@ def pluginify(
                     )
                     placements[idx].set_error(r, err_msg_md)
                 else:
+                    handler = partial(handle_response, idx, r)
                     try:
-                        html = render_plugin(
+                        call = prepare_plugin_call(
                             docsettings=settings,
                             plugin=plugin,
                             output_format=output_format,
                         )
                     except PluginException as e:
-                        has_errors = True
-                        placements[idx].set_error(r, str(e))
+                        handler(e)
                         continue
-                    placements[idx].set_output(r, html)
+                    calls.append(call)
+                    handlers.append(handler)
+
+    taketime("plg", "send")
+    for handler, response in zip(
+        handlers, run_concurrently([call.send for call in calls])
+    ):
+        handler(response)
     taketime("plg m", "Plugins done")
 
     taketime("plc", "Placement start")
@@ -785,14 +836,9 @@ def get_all_reqs():
         if vals.skip_reqs:
             continue
         try:
-            resp = plugin_reqs(plugin)
+            allreqs[plugin] = get_plugin_reqs(plugin)
         except PluginException:
             continue
-        try:
-            reqs = json.loads(resp)
-            allreqs[plugin] = reqs
-        except ValueError:
-            continue
     return allreqs
 
 
@@ -0,0 +1,78 @@
+"""Pooled HTTP sessions for calling plugins.
+
+Each worker process keeps one requests session per plugin host, so the connections to the plugins are kept
+alive and reused between calls. The connection pool of a host keeps at most ``PLUGIN_POOL_SIZE`` idle
+connections; calls beyond that use temporary connections instead of waiting. The pools are shared by the
+threads (greenlets under the gevent worker class) of the process.
+
+Because a session is shared by all users, it must not store cookies: a cookie that a plugin sets (internal plugins
+are TIM itself, which sets a session cookie) would otherwise be sent along with the calls made for other users.
+The sessions therefore reject all cookies. Cookies passed explicitly to a request are still sent with it.
+"""
+import os
+from functools import cache
+from http.cookiejar import DefaultCookiePolicy
+from typing import Any
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from timApp.util.timtiming import count_stat
+
+_sessions: dict[str, requests.Session] = {}
+_sessions_pid: int | None = None
+
+
+@cache
+def get_pool_size() -> int:
+    from timApp.tim_app import app
+
+    return app.config["PLUGIN_POOL_SIZE"]
+
+
+def get_plugin_session(url: str) -> requests.Session:
+    """Returns the pooled session for the host of the given URL."""
+    global _sessions_pid
+    # Connections must not be shared with forked worker processes.
+    if _sessions_pid != os.getpid():
+        _sessions.clear()
+        _sessions_pid = os.getpid()
+    parts = urlsplit(url)
+    host = f"{parts.scheme}://{parts.netloc}"
+    session = _sessions.get(host)
+    if session is None:
+        session = requests.Session()
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=get_pool_size())
+        session.mount(host, adapter)
+        _sessions[host] = session
+    return session
+
+
+def plugin_request(method: str, url: str, **kwargs: Any) -> requests.Response:
+    """Sends a request to a plugin through the pooled session of the plugin host.
+
+    :param kwargs: Arguments for :meth:`requests.Session.request`.
+    """
+    count_stat("plugin_http.request")
+    return get_plugin_session(url).request(method, url, **kwargs)
+
+
+def get_pool_stats() -> dict[str, dict[str, int]]:
+    """Returns the number of requests and opened connections per plugin host in the current process.
+
+    The difference of the two is the number of requests that reused a kept-alive connection.
+    """
+    result = {}
+    for host, session in _sessions.items():
+        adapter = session.get_adapter(host)
+        if not isinstance(adapter, HTTPAdapter):
+            continue
+        requests_count = connections = 0
+        for key in adapter.poolmanager.pools.keys():
+            pool = adapter.poolmanager.pools[key]
+            requests_count += pool.num_requests
+            connections += pool.num_connections
+        result[host] = {"requests": requests_count, "connections": connections}
+    return result
@@ -0,0 +1,154 @@
+"""An index of the tasks of a document for finding a plugin by its task id.
+
+Finding a plugin by searching the document (see :func:`find_plugin_from_document`) means loading, dereferencing
+and macro-expanding every paragraph before the task, which makes answering slow in long documents. The index
+(``tasks.json`` in the document directory) lists the task names of each paragraph, so only the paragraphs that
+may contain the task need to be checked.
+
+The index is kept up to date incrementally when it is used: each entry records the hash of the paragraph and,
+for references, the versions of the referenced documents, so only the paragraphs that have changed since the
+last use are indexed again. The whole index is rebuilt if the document settings change because the settings
+affect macro expansion.
+
+The index is only a hint. Paragraphs whose inline task ids contain macros may have different task names for
+different users, so they are listed for every task. If the task is not found among the listed paragraphs, the
+caller searches the whole document as before.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from tempfile import mkstemp
+
+from timApp.document.docparagraph import DocParagraph
+from timApp.document.document import Document
+from timApp.document.documentversion import DocumentVersion
+from timApp.document.version import Version
+from timApp.plugin.plugin import get_par_task_names
+from timApp.util.timtiming import count_stat
+
+# Paragraph id -> [paragraph hash, task names, whether the names may depend on the user,
+# {referenced document id: version}].
+TaskIndexEntry = list
+
+
+class TaskIndex:
+    def __init__(self, settings_key: str = "", pars: dict | None = None):
+        self.settings_key = settings_key
+        self.pars: dict[str, TaskIndexEntry] = pars if pars is not None else {}
+
+    @staticmethod
+    def load(path: Path) -> TaskIndex:
+        try:
+            with path.open("r") as f:
+                d = json.load(f)
+            return TaskIndex(d["settings"], d["pars"])
+        except (OSError, ValueError, KeyError):
+            return TaskIndex()
+
+    def save(self, path: Path) -> None:
+        destfd, tmpname = mkstemp(dir=path.parent)
+        with os.fdopen(destfd, "w") as f:
+            json.dump({"settings": self.settings_key, "pars": self.pars}, f)
+        os.replace(tmpname, path)
+
+    def update(self, d: Document) -> int:
+        """Indexes the paragraphs of the document that have changed since the index was last updated and removes
+        the deleted paragraphs.
+
+        :return: The number of indexed paragraphs.
+        """
+        versions: dict[int, Version] = {}
+
+        def refs_changed(refs: dict[str, list[int]]) -> bool:
+            for doc_id, ver in refs.items():
+                if int(doc_id) not in versions:
+                    versions[int(doc_id)] = Document(int(doc_id)).get_version()
+                if versions[int(doc_id)] != tuple(ver):
+                    return True
+            return False
+
+        d.ensure_par_ids_loaded()
+        assert d.par_ids is not None and d.par_hashes is not None
+        indexed = 0
+        pars = {}
+        for par_id, t in zip(d.par_ids, d.par_hashes):
+            entry = self.pars.get(par_id)
+            if entry is None or entry[0] != t or refs_changed(entry[3]):
+                entry = index_paragraph(DocParagraph.get(d, par_id, t))
+                indexed += 1
+            pars[par_id] = entry
+        self.pars = pars
+        return indexed
+
+    def get_candidates(self, task_name: str) -> list[tuple[str, str]]:
+        """Returns the ids and hashes of the paragraphs that may contain the task, in document order."""
+        return [
+            (par_id, entry[0])
+            for par_id, entry in self.pars.items()
+            if entry[2] or task_name in entry[1]
+        ]
+
+
+def index_paragraph(p: DocParagraph) -> TaskIndexEntry:
+    names = []
+    dynamic = False
+    refs = {}
+    try:
+        if p.is_reference():
+            for rp in p.get_referenced_pars():
+                rp_names, rp_dynamic = get_par_task_names(rp)
+                names += rp_names
+                dynamic = dynamic or rp_dynamic
+                for doc in (rp.doc, rp.ref_doc):
+                    if doc is not None:
+                        refs[str(doc.doc_id)] = doc.get_version()
+        p_names, p_dynamic = get_par_task_names(p)
+        names += p_names
+        dynamic = dynamic or p_dynamic
+    except Exception:
+        # E.g. an invalid reference may become valid without the paragraph changing, so the paragraph is always
+        # checked. The search reports the errors of the paragraph if there are any.
+        dynamic = True
+    return [p.get_hash(), names, dynamic, refs]
+
+
+def get_settings_key(d: Document) -> str:
+    return hashlib.sha1(
+        json.dumps(
+            d.get_settings().get_dict().values, sort_keys=True, default=str
+        ).encode()
+    ).hexdigest()
+
+
+def get_task_index_path(d: Document) -> Path:
+    return d.get_doc_dir() / "tasks.json"
+
+
+def get_task_candidates(d: Document, task_name: str) -> list[tuple[str, str]] | None:
+    """Returns the ids and hashes of the paragraphs of the document that may contain the task.
+
+    :return: The paragraphs in document order, or None if the index cannot be used for the document, e.g. for an
+     old version of the document or if preamble paragraphs have been inserted in it.
+    """
+    if isinstance(d, DocumentVersion) or d.preamble_included or not d.exists():
+        return None
+    ver = d.get_version()
+    if d.task_index_cache is not None and d.task_index_cache[0] == ver:
+        return d.task_index_cache[1].get_candidates(task_name)
+    path = get_task_index_path(d)
+    index = TaskIndex.load(path)
+    settings_key = get_settings_key(d)
+    if index.settings_key != settings_key:
+        index = TaskIndex(settings_key)
+    old_count = len(index.pars)
+    indexed = index.update(d)
+    if indexed:
+        count_stat("task_index.indexed", indexed)
+    if indexed or len(index.pars) != old_count:
+        index.save(path)
+    d.task_index_cache = ver, index
+    return index.get_candidates(task_name)
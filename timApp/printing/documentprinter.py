@@ -7,6 +7,7 @@ import re
 import subprocess
 import tempfile
 from pathlib import Path
+from typing import Callable
 
 from flask import current_app
 from pypandoc import _as_unicode, _validate_formats
@@ -46,6 +47,7 @@ from timApp.plugin.plugin import parse_plugin_values_macros
 from timApp.plugin.pluginControl import pluginify
 from timApp.plugin.pluginOutputFormat import PluginOutputFormat
 from timApp.plugin.pluginexception import PluginException
+from timApp.printing.fragmentcache import PANDOC_PATH, read_markdown_fragments
 from timApp.printing.printeddoc import PrintedDoc
 from timApp.printing.printsettings import PrintFormat
 from timApp.timdb.dbaccess import get_files_path
@@ -160,6 +162,7 @@ class DocumentPrinter:
         self._doc_entry = doc_entry
         self._template_to_use = template_to_use
         self._content = None
+        self._fragments: list[str] | None = None
         self._print_hash = None
         self._macros = {}
         self.texplain = False
@@ -438,7 +441,13 @@ class DocumentPrinter:
             # Paragraphs are separated by a blank line in the Markdown format.
             content = "\n\n".join(export_pars)
         else:
-            content = settings.get_doctexmacros() + "\n" + "\n\n".join(export_pars)
+            doctexmacros = settings.get_doctexmacros()
+            content = doctexmacros + "\n" + "\n\n".join(export_pars)
+            # The fragments joined with blank lines equal the content.
+            self._fragments = [
+                doctexmacros + "\n" + (export_pars[0] if export_pars else ""),
+                *export_pars[1:],
+            ]
 
         self._content = content
         return content
@@ -563,6 +572,7 @@ class DocumentPrinter:
         path: Path,
         plugins_user_print: bool = False,
         eol_type: str = "native",
+        on_progress: Callable[[str], None] | None = None,
     ):
         """
         Converts the document to latex and returns the converted document as a bytearray
@@ -573,6 +583,7 @@ class DocumentPrinter:
         :param plugins_user_print: Whether or not to print user input from plugins (instead of default values)
         :param path:  filepath to write
         :param eol_type: EOL type. Allows same option as Pandoc (crlf, lf, native)
+        :param on_progress: Called with the name of each printing phase ("rendering", "converting") when it starts.
         :return: Converted document as bytearray
         """
 
@@ -598,6 +609,8 @@ class DocumentPrinter:
             ):
                 top_level = "chapter"
 
+            if on_progress:
+                on_progress("rendering")
             src = self.get_content(
                 user_ctx,
                 view_ctx,
@@ -630,6 +643,19 @@ class DocumentPrinter:
             if self.textplain:
                 from_format = "latex"
 
+            if (
+                from_format == "markdown"
+                and self._fragments
+                and target_format in (PrintFormat.LATEX, PrintFormat.PDF)
+                and current_app.config["PRINT_FRAGMENT_CACHE"]
+            ):
+                parsed_src = read_markdown_fragments(
+                    self._doc_entry.id, self._fragments
+                )
+                if parsed_src is not None:
+                    src = parsed_src
+                    from_format = "json"
+
             texfiles = None
             if self.texfiles:
                 texfiles = []
@@ -650,6 +676,8 @@ class DocumentPrinter:
                         )
 
             # TODO: add also variables from texpandocvariables document setting, but this may lead to security hole?
+            if on_progress:
+                on_progress("converting")
             try:
 
                 tim_convert_text(
@@ -959,7 +987,7 @@ def tim_convert_input(
     texfiles=None,
     eol_type="native",
 ):
-    pandoc_path = "/usr/bin/pandoc"
+    pandoc_path = PANDOC_PATH
     stdout = ""
 
     from_format, to = _validate_formats(from_format, to, outputfile)
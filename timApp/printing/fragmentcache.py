@@ -0,0 +1,191 @@
+"""A cache of the parsed Markdown of printed paragraphs.
+
+Apart from LaTeX itself, most of the time of printing a long document goes to pandoc parsing the Markdown. The
+printer therefore splits the Markdown into fragments, one per printed paragraph (see
+:meth:`DocumentPrinter.get_content`), and :func:`read_markdown_fragments` parses each fragment to the pandoc AST
+separately. The ASTs are cached by the hash of the fragment, so after an edit only the changed paragraphs are
+parsed again. The cached ASTs are joined into one JSON document that pandoc converts with the template and the
+filters as before.
+
+The fragments are parsed without automatic heading identifiers because those depend on the preceding headings;
+:func:`add_heading_identifiers` assigns them to the joined document the same way as pandoc does. They are also
+parsed without the ``latex_macros`` extension, which would expand the macros of the document (``doctexmacros``
+in the first fragment) in the math of the later fragments. The macro definitions are kept as raw TeX instead, so
+LaTeX expands the macros and the AST of a fragment only depends on the fragment itself. Each fragment is a
+paragraph, which TIM renders separately anyway, so reference links and footnotes are not expected to span
+fragments.
+"""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import os
+import subprocess
+import time
+from functools import cache
+from pathlib import Path
+from typing import Any, Iterator
+
+from timApp.util.timtiming import count_stat
+from timApp.util.utils import cache_folder_path
+
+PANDOC_PATH = "/usr/bin/pandoc"
+FRAGMENT_CACHE_FOLDER = cache_folder_path / "print_fragments"
+FRAGMENT_READER = "markdown-auto_identifiers-latex_macros"
+SEPARATOR_FORMAT = "tim-fragment"
+FRAGMENT_SEPARATOR = f"\n\n```{{={SEPARATOR_FORMAT}}}\n-\n```\n\n"
+# Cached fragments that have not been printed for this long are removed when the document changes.
+MAX_FRAGMENT_AGE_SECS = 3600 * 24 * 30
+
+
+@cache
+def get_pandoc_version() -> str:
+    p = subprocess.run(
+        [PANDOC_PATH, "--version"], capture_output=True, check=True, text=True
+    )
+    return p.stdout.split("\n", 1)[0]
+
+
+def get_fragment_key(fragment: str) -> str:
+    return hashlib.sha256(
+        f"{get_pandoc_version()}\n{FRAGMENT_READER}\n{fragment}".encode()
+    ).hexdigest()
+
+
+def parse_fragments(fragments: list[str]) -> tuple[Any, list[list[dict]]] | None:
+    """Parses the fragments to pandoc ASTs with a single pandoc call.
+
+    :return: The pandoc API version and the blocks of each fragment, or None if the fragments cannot be parsed
+     separately, e.g. because a fragment has an unclosed code block or sets metadata.
+    """
+    p = subprocess.run(
+        [PANDOC_PATH, f"--from={FRAGMENT_READER}", "--to=json"],
+        input=FRAGMENT_SEPARATOR.join(fragments).encode(),
+        capture_output=True,
+    )
+    # Let the conversion of the whole document report the errors and warnings.
+    if p.returncode != 0 or p.stderr:
+        return None
+    doc = json.loads(p.stdout)
+    if doc["meta"]:
+        return None
+    result: list[list[dict]] = [[]]
+    for block in doc["blocks"]:
+        if block["t"] == "RawBlock" and block["c"][0] == SEPARATOR_FORMAT:
+            result.append([])
+        else:
+            result[-1].append(block)
+    if len(result) != len(fragments):
+        return None
+    return doc["pandoc-api-version"], result
+
+
+def read_markdown_fragments(doc_id: int, fragments: list[str]) -> str | None:
+    """Returns the Markdown fragments as one pandoc JSON document. Only the fragments that are not cached are parsed.
+
+    :param doc_id: The id of the printed document. The fragments are cached per document.
+    :param fragments: The Markdown fragments in document order.
+    :return: The JSON document, or None if the fragments cannot be parsed separately; the caller then converts
+     the Markdown as a whole.
+    """
+    folder = FRAGMENT_CACHE_FOLDER / str(doc_id)
+    keys = [get_fragment_key(f) for f in fragments]
+    cached: dict[str, dict] = {}
+    for key in set(keys):
+        try:
+            with open(folder / f"{key}.json", encoding="utf-8") as f:
+                cached[key] = json.load(f)
+        except (OSError, ValueError):
+            pass
+    missing = {k: f for k, f in zip(keys, fragments) if k not in cached}
+    count_stat("print_fragments.cached", len(keys) - len(missing))
+    if missing:
+        parsed = parse_fragments(list(missing.values()))
+        if parsed is None:
+            return None
+        api_version, fragment_blocks = parsed
+        count_stat("print_fragments.parsed", len(missing))
+        folder.mkdir(parents=True, exist_ok=True)
+        for key, blocks in zip(missing, fragment_blocks):
+            cached[key] = {"pandoc-api-version": api_version, "blocks": blocks}
+            tmp_path = folder / f"{key}.json.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(cached[key], f)
+            os.replace(tmp_path, folder / f"{key}.json")
+        remove_unused_fragments(folder, set(keys))
+    # The same fragment may occur many times, so the blocks are copied before the identifiers are assigned.
+    blocks = copy.deepcopy([b for key in keys for b in cached[key]["blocks"]])
+    add_heading_identifiers(blocks)
+    return json.dumps(
+        {
+            "pandoc-api-version": cached[keys[0]]["pandoc-api-version"],
+            "meta": {},
+            "blocks": blocks,
+        }
+    )
+
+
+def remove_unused_fragments(folder: Path, used_keys: set[str]) -> None:
+    limit = time.time() - MAX_FRAGMENT_AGE_SECS
+    for entry in os.scandir(folder):
+        if entry.name.split(".", 1)[0] in used_keys:
+            continue
+        try:
+            if entry.stat().st_mtime < limit:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+def iter_headers(node: Any) -> Iterator[dict]:
+    if isinstance(node, list):
+        for n in node:
+            yield from iter_headers(n)
+    elif isinstance(node, dict):
+        if node.get("t") == "Header":
+            yield node
+        yield from iter_headers(node.get("c"))
+
+
+def stringify(node: Any) -> str:
+    """Returns the plain text of the given inlines like pandoc's stringify."""
+    if isinstance(node, list):
+        return "".join(stringify(n) for n in node)
+    if not isinstance(node, dict):
+        return ""
+    t = node.get("t")
+    if t == "Str":
+        return node["c"]
+    if t in ("Code", "Math"):
+        return node["c"][1]
+    if t in ("Space", "SoftBreak", "LineBreak"):
+        return " "
+    if t in ("Note", "RawInline"):
+        return ""
+    return stringify(node.get("c"))
+
+
+def make_identifier(text: str) -> str:
+    """Returns the identifier of a heading with the given text like the auto_identifiers extension of pandoc."""
+    text = "".join(c for c in text.lower() if c.isalnum() or c.isspace() or c in "_-.")
+    ident = "-".join(text.split())
+    first_letter = next((i for i, c in enumerate(ident) if c.isalpha()), len(ident))
+    return ident[first_letter:]
+
+
+def add_heading_identifiers(blocks: list[dict]) -> None:
+    """Assigns a unique identifier to each heading that does not have an explicit one."""
+    used = set()
+    for header in iter_headers(blocks):
+        _, attr, inlines = header["c"]
+        if not attr[0]:
+            base = make_identifier(stringify(inlines)) or "section"
+            ident = base
+            i = 0
+            while ident in used:
+                i += 1
+                ident = f"{base}-{i}"
+            attr[0] = ident
+        used.add(attr[0])
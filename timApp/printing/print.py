@@ -1,16 +1,18 @@
 """
 Routes for printing a document
 """
+import html
 import json
 import os
 import shutil
 import tempfile
 from dataclasses import field
 from pathlib import Path
+from typing import Callable
 from urllib.parse import urlencode
 
 from flask import current_app, render_template
-from flask import g
+from flask import g, session
 from flask import make_response
 from flask import request
 from flask import send_file, Response
@@ -35,8 +37,17 @@ from timApp.markdown.autocounters import (
 )
 from timApp.printing.documentprinter import DocumentPrinter, PrintingError, LaTeXError
 from timApp.printing.printeddoc import PrintedDoc
+from timApp.printing.printjobs import (
+    PrintJobStatus,
+    create_print_job,
+    finish_print_job,
+    get_print_job,
+    get_print_job_key,
+    update_print_job,
+)
 from timApp.printing.printsettings import PrintFormat
 from timApp.timdb.sqa import db
+from timApp.user.user import User
 from timApp.upload.upload import add_csp_if_not_script_safe
 from timApp.util.flask.requesthelper import (
     RouteException,
@@ -57,6 +68,7 @@ DEFAULT_PRINT_TEMPLATE_NAME = "templates/printing/runko"
 EMPTY_PRINT_TEMPLATE_NAME = "templates/printing/empty"
 TEMP_DIR_PATH = tempfile.gettempdir()
 DOWNLOADED_IMAGES_ROOT = os.path.join(TEMP_DIR_PATH, "tim-img-dls")
+PRINT_JOB_REFRESH_SECS = 3
 
 print_blueprint = TypedBlueprint("print", __name__, url_prefix="/print")
 
@@ -197,6 +209,24 @@ def print_document(
     if template_doc is None:
         raise RouteException("The template doc was not found.")
 
+    if current_app.config["PRINT_JOBS_ASYNC"]:
+        latex_access_url = f"{request.url}?file_type=latex&template_doc_id={template_doc_id}&plugins_user_code={plugins_user_print}"
+        if url_macros:
+            latex_access_url += f"&{urlencode(url_macros)}"
+        job_id = queue_print_job(
+            doc,
+            template_doc,
+            print_type,
+            view_ctx,
+            plugins_user_print,
+            url=print_access_url,
+            latex=latex_access_url,
+        )
+        return json_response(
+            {"success": True, "url": print_access_url, **get_job_response(job_id)},
+            status_code=202,
+        )
+
     try:
         create_printed_doc(
             doc_entry=doc,
@@ -250,6 +280,7 @@ def get_printed_document(
     template_doc_id: int = -1,
     force: bool = False,
     showerror: bool = False,
+    job: str | None = None,
 ) -> Response:
     doc: DocInfo = g.doc_entry
     doc_settings = doc.document.get_settings()
@@ -292,6 +323,7 @@ def get_printed_document(
         url_macros.pop("template_doc_id", None)
         url_macros.pop("force", None)
         url_macros.pop("showerror", None)
+        url_macros.pop("job", None)
         view_ctx = view_ctx_with_urlmacros(ViewRoute.View, urlmacros=url_macros)
     else:
         view_ctx = default_view_ctx
@@ -310,7 +342,33 @@ def get_printed_document(
 
     pdferror = None
 
-    if cached is None:
+    # The print job queued by an earlier request, if it has not expired.
+    job_info = get_print_job(job) if job else None
+    if job_info:
+        if not PrintJobStatus(job_info["status"]).is_finished:
+            return print_job_wait_response(job_info, request.url)
+        if job_info.get("error"):
+            raise RouteException(job_info["error"])
+        pdferror = job_info.get("latex_error")
+    elif (
+        cached is None
+        and print_type == PrintFormat.PDF
+        and current_app.config["PRINT_JOBS_ASYNC"]
+    ):
+        job_id = queue_print_job(
+            doc,
+            template_doc,
+            print_type,
+            view_ctx,
+            plugins_user_code,
+            eol_type=eol_type,
+        )
+        args = {k: v for k, v in request.args.items() if k != "job"}
+        return print_job_wait_response(
+            get_print_job(job_id) or {},
+            f"{request.base_url}?{urlencode({**args, 'job': job_id})}",
+        )
+    elif cached is None:
         try:
             create_printed_doc(
                 doc_entry=doc,
@@ -654,6 +712,7 @@ def create_printed_doc(
     plugins_user_print: bool = False,
     urlroot: str = "",
     eol_type: str = "native",
+    on_progress: Callable[[str], None] | None = None,
 ) -> str:
     """
     Adds a marking for a printed document to the db
@@ -667,6 +726,7 @@ def create_printed_doc(
     :param plugins_user_print: use users answers for plugins or not
     :param urlroot: url root for this route
     :param eol_type: EOL type. Same option as Pandoc (crlf, lf, native)
+    :param on_progress: Called with the name of each printing phase when it starts.
     :return str: path to the created file
     """
 
@@ -689,6 +749,7 @@ def create_printed_doc(
             path=path,
             plugins_user_print=plugins_user_print,
             eol_type=eol_type,
+            on_progress=on_progress,
         )
         pdferror = None
     except LaTeXError as err:
@@ -714,6 +775,158 @@ def create_printed_doc(
     return p_doc.path_to_file
 
 
+@print_blueprint.get("/jobs/<job_id>")
+def get_print_job_status(job_id: str) -> Response:
+    job_info = get_print_job(job_id)
+    doc = DocEntry.find_by_id(job_info["doc_id"]) if job_info else None
+    if not doc:
+        raise NotExist("Print job not found")
+    verify_view_access(doc)
+    return json_response(get_job_response(job_id, job_info))
+
+
+def get_job_response(job_id: str, job_info: dict | None = None) -> dict:
+    """Returns the status of a print job in the format of the print route response."""
+    job_info = job_info or get_print_job(job_id) or {}
+    result = {"jobId": job_id, "status": job_info.get("status")}
+    for field_name in ("progress", "url", "latex", "errormsg", "latexline", "error"):
+        if job_info.get(field_name):
+            result[field_name] = job_info[field_name]
+    return result
+
+
+def print_job_wait_response(job_info: dict, refresh_url: str) -> Response:
+    """Returns a page that reloads itself until the print job has finished."""
+    progress = job_info.get("progress") or job_info.get("status") or "queued"
+    result = (
+        "<!DOCTYPE html>\n"
+        + "<html>"
+        + "<head>\n"
+        + f'<meta http-equiv="refresh" content="{PRINT_JOB_REFRESH_SECS};url={html.escape(refresh_url)}">\n'
+        + "</head>\n"
+        + "<body>\n"
+        + f"<p>Printing the document ({html.escape(progress)}), please wait...</p>\n"
+        + "</body>\n</html>"
+    )
+    response = make_response(result, 202)
+    add_no_cache_headers(response)
+    add_csp_header(response)
+    return response
+
+
+# The session state that affects the printed content. It is passed to the print job, which runs outside the request.
+PRINT_JOB_SESSION_KEYS = ("hide_names", "locked_access_type", "locked_active_groups")
+
+
+def queue_print_job(
+    doc: DocInfo,
+    template_doc: DocInfo | None,
+    file_type: PrintFormat,
+    view_ctx: ViewContext,
+    plugins_user_print: bool,
+    eol_type: str = "native",
+    **fields: str,
+) -> str:
+    """
+    Queues a print job for the document unless an identical job is already queued or running.
+
+    :param fields: Additional information to return with the job status, e.g. the URL of the printed document.
+    :return: The id of the job.
+    """
+    printer = DocumentPrinter(doc_entry=doc, template_to_use=template_doc, urlroot="")
+    key = get_print_job_key(
+        doc.id,
+        printer.get_template_id(),
+        file_type.value,
+        printer.hash_doc_print(
+            plugins_user_print=plugins_user_print, url_macros=view_ctx.url_macros_dict
+        ),
+    )
+    job_id, is_new = create_print_job(key, {"doc_id": doc.id, **fields})
+    if is_new:
+        from timApp.tim_celery import run_print_job
+
+        run_print_job.delay(
+            job_id,
+            {
+                "doc_id": doc.id,
+                "template_doc_id": template_doc.id if template_doc else None,
+                "file_type": file_type.value,
+                "user_id": g.user.id,
+                "plugins_user_print": plugins_user_print,
+                "url_macros": view_ctx.url_macros_dict or None,
+                "eol_type": eol_type,
+                "session": {
+                    k: session[k] for k in PRINT_JOB_SESSION_KEYS if k in session
+                },
+            },
+        )
+    return job_id
+
+
+def do_print_job(job_id: str, params: dict) -> None:
+    """
+    Prints a document in a print job. Called by the Celery worker.
+
+    The worker only has an application context, but rendering the plugins of the document reads the request and
+    the session. The job is therefore run in a test request context that has the session state of the user who
+    queued the job.
+
+    :param job_id: The id of the job.
+    :param params: The print parameters from queue_print_job.
+    """
+    doc = DocEntry.find_by_id(params["doc_id"])
+    template_id = params["template_doc_id"]
+    template_doc = DocEntry.find_by_id(template_id) if template_id else None
+    user = User.get_by_id(params["user_id"])
+    if not doc or not user or (template_id and not template_doc):
+        finish_print_job(
+            job_id, PrintJobStatus.Failed, error="The document no longer exists."
+        )
+        return
+    with current_app.test_request_context():
+        session.update(params.get("session", {}))
+        g.user = user
+        url_macros = params["url_macros"]
+        if url_macros:
+            view_ctx = view_ctx_with_urlmacros(ViewRoute.View, urlmacros=url_macros)
+        else:
+            view_ctx = default_view_ctx
+        update_print_job(job_id, PrintJobStatus.Running)
+        try:
+            create_printed_doc(
+                doc_entry=doc,
+                template_doc=template_doc,
+                file_type=PrintFormat(params["file_type"]),
+                temp=True,
+                user_ctx=UserContext.from_one_user(user),
+                view_ctx=view_ctx,
+                plugins_user_print=params["plugins_user_print"],
+                urlroot="http://localhost:5000/print/",
+                eol_type=params["eol_type"],
+                on_progress=lambda phase: update_print_job(
+                    job_id, PrintJobStatus.Running, progress=phase
+                ),
+            )
+        except LaTeXError as err:
+            # The possibly broken PDF is still available, like in synchronous printing.
+            db.session.commit()
+            e = err.value
+            fields = {"latex_error": e, "errormsg": f"<pre>{e.get('error', '')}</pre>"}
+            job_info = get_print_job(job_id) or {}
+            if latex := job_info.get("latex"):
+                line = e.get("line", "")
+                fields["latexline"] = f"{latex}&line={line}#L{line}"
+            finish_print_job(job_id, PrintJobStatus.Done, **fields)
+            return
+        except Exception as err:
+            db.session.rollback()
+            finish_print_job(job_id, PrintJobStatus.Failed, error=str(err))
+            return
+        db.session.commit()
+        finish_print_job(job_id, PrintJobStatus.Done)
+
+
 def remove_images(doc_id: int) -> None:
     # noinspection PyBroadException
     try:
@@ -0,0 +1,155 @@
+"""Bookkeeping of asynchronous print jobs.
+
+Printing a document (pandoc and, for PDFs, LaTeX) can take minutes, so the print routes queue a Celery task
+(:func:`timApp.tim_celery.run_print_job`) instead of printing within the request. The state of the jobs is kept
+in Redis:
+
+* ``tim-print-job-<job_id>`` is a hash with the status, progress and result fields of a job.
+* ``tim-print-inflight-<key>`` maps the key of a print (see :func:`get_print_job_key`) to the job that is
+  printing it, so identical requests share one job.
+* ``tim-print-slot-<i>`` is taken by a running job. At most ``PRINT_MAX_CONCURRENT_JOBS`` jobs run at a time;
+  the others wait in the queue.
+
+All keys expire after ``PRINT_JOB_TIMEOUT`` seconds so that a crashed worker cannot block printing permanently.
+The printed file itself is stored to the printed document cache (:class:`timApp.printing.printeddoc.PrintedDoc`)
+as before.
+"""
+
+from __future__ import annotations
+
+import json
+import secrets
+from enum import Enum
+from functools import cache
+from typing import Any
+
+from timApp.util.utils import get_current_time
+
+JOB_KEY_PREFIX = "tim-print-job-"
+INFLIGHT_KEY_PREFIX = "tim-print-inflight-"
+SLOT_KEY_PREFIX = "tim-print-slot-"
+# How long the job information is kept after the job has finished.
+FINISHED_JOB_EXPIRE_SECS = 3600 * 24
+
+
+class PrintJobStatus(Enum):
+    Queued = "queued"
+    Running = "running"
+    Done = "done"
+    Failed = "failed"
+
+    @property
+    def is_finished(self) -> bool:
+        return self in (PrintJobStatus.Done, PrintJobStatus.Failed)
+
+
+@cache
+def get_print_job_config() -> tuple[int, int]:
+    from timApp.tim_app import app
+
+    return app.config["PRINT_MAX_CONCURRENT_JOBS"], app.config["PRINT_JOB_TIMEOUT"]
+
+
+def get_print_job_key(
+    doc_id: int, template_id: int | None, file_type: str, print_hash: str
+) -> str:
+    """Returns the key that identifies identical prints.
+
+    The print hash (see :meth:`DocumentPrinter.hash_doc_print`) covers the document and template versions, the
+    URL macros and, when printing user answers, the user.
+    """
+    return f"{doc_id}-{template_id}-{file_type}-{print_hash}"
+
+
+def decode_job(raw: dict[bytes, bytes]) -> dict[str, Any]:
+    return {k.decode(): json.loads(v) for k, v in raw.items()}
+
+
+def create_print_job(key: str, fields: dict[str, Any]) -> tuple[str, bool]:
+    """Creates a job for the given print unless an identical job is already queued or running.
+
+    :param key: The print job key from :func:`get_print_job_key`.
+    :param fields: Additional fields to store in the job, e.g. the URLs of the result.
+    :return: The job id and whether the job is new, i.e. needs to be queued by the caller.
+    """
+    from timApp.document.caching import rclient
+
+    _, timeout = get_print_job_config()
+    inflight_key = INFLIGHT_KEY_PREFIX + key
+    job_id = secrets.token_urlsafe(16)
+    while not rclient.set(inflight_key, job_id, nx=True, ex=timeout):
+        existing = rclient.get(inflight_key)
+        if existing is not None:
+            existing_id = existing.decode()
+            job = get_print_job(existing_id)
+            if job and not PrintJobStatus(job["status"]).is_finished:
+                return existing_id, False
+        # The previous job has finished or expired; replace it.
+        rclient.delete(inflight_key)
+    update_print_job(
+        job_id,
+        PrintJobStatus.Queued,
+        key=key,
+        created=get_current_time().isoformat(),
+        **fields,
+    )
+    return job_id, True
+
+
+def update_print_job(job_id: str, status: PrintJobStatus, **fields: Any) -> None:
+    from timApp.document.caching import rclient
+
+    _, timeout = get_print_job_config()
+    job_key = JOB_KEY_PREFIX + job_id
+    pipe = rclient.pipeline()
+    pipe.hset(
+        job_key,
+        mapping={
+            k: json.dumps(v) for k, v in {"status": status.value, **fields}.items()
+        },
+    )
+    pipe.expire(job_key, FINISHED_JOB_EXPIRE_SECS if status.is_finished else timeout)
+    pipe.execute()
+
+
+def finish_print_job(job_id: str, status: PrintJobStatus, **fields: Any) -> None:
+    """Stores the result of a job and lets new identical requests start a new job."""
+    from timApp.document.caching import rclient
+
+    job = get_print_job(job_id)
+    update_print_job(job_id, status, progress=None, **fields)
+    if job:
+        inflight_key = INFLIGHT_KEY_PREFIX + job["key"]
+        # Only remove the mapping if a newer job has not replaced it.
+        if rclient.get(inflight_key) == job_id.encode():
+            rclient.delete(inflight_key)
+
+
+def get_print_job(job_id: str) -> dict[str, Any] | None:
+    from timApp.document.caching import rclient
+
+    raw = rclient.hgetall(JOB_KEY_PREFIX + job_id)
+    if not raw:
+        return None
+    return decode_job(raw)
+
+
+def acquire_print_slot(job_id: str) -> str | None:
+    """Reserves one of the concurrent print slots for the job.
+
+    :return: The reserved slot key, or None if all slots are taken.
+    """
+    from timApp.document.caching import rclient
+
+    max_jobs, timeout = get_print_job_config()
+    for i in range(max_jobs):
+        slot_key = f"{SLOT_KEY_PREFIX}{i}"
+        if rclient.set(slot_key, job_id, nx=True, ex=timeout):
+            return slot_key
+    return None
+
+
+def release_print_slot(slot_key: str) -> None:
+    from timApp.document.caching import rclient
+
+    rclient.delete(slot_key)
@@ -81,6 +81,9 @@ enum LectureEndingDialogState {
 
 const AUTOJOIN_CODE = "autojoin";
 
+// Poll interval while the lecture event stream is connected. Events trigger a poll immediately.
+const EVENT_STREAM_POLL_INTERVAL = 30000;
+
 let lectureControllerInstance: LectureController | undefined;
 
 const StoredSettings = t.partial({
@@ -110,6 +113,8 @@ export class LectureController {
     private wallInstancePromise?: Promise<LectureWallDialogComponent>;
     private lectureMenu?: LectureMenuComponent;
     private storedSettings = new TimStorage("lecture", StoredSettings);
+    private eventSource?: EventSource;
+    private wakeUpPolling?: () => void;
 
     constructor(vctrl: ViewCtrl | undefined) {
         this.viewctrl = vctrl;
@@ -573,22 +578,69 @@ export class LectureController {
         let lastID = -1;
         while (true) {
             if (this.lecture == null) {
+                this.closeEventStream();
                 await $timeout(5000);
                 continue;
             }
+            this.openEventStream();
 
             // By checking "hidden" we avoid the idle timeout (default 60 seconds).
             if (!ifvisible.now("hidden")) {
                 const [timeout, last] = await this.pollOnce(lastID);
                 lastID = last;
                 $rootScope.$applyAsync();
-                await $timeout(Math.max(timeout, 1000));
+                if (this.eventSource?.readyState === EventSource.OPEN) {
+                    await this.waitForEvent(
+                        Math.max(timeout, EVENT_STREAM_POLL_INTERVAL)
+                    );
+                } else {
+                    await $timeout(Math.max(timeout, 1000));
+                }
             } else {
                 await $timeout(1000);
             }
         }
     }
 
+    /**
+     * Opens the event stream of the current lecture. The polling falls back to the poll interval
+     * if the browser does not support event streams or the stream cannot be opened.
+     */
+    private openEventStream() {
+        if (this.eventSource || typeof EventSource === "undefined") {
+            return;
+        }
+        const source = new EventSource("/lectureEvents");
+        // The changes that happened before the stream was opened are fetched right away.
+        source.onopen = () => this.wakeUpPolling?.();
+        source.onmessage = () => this.wakeUpPolling?.();
+        source.onerror = () => {
+            // The browser reconnects automatically unless the server refused the stream.
+            if (source.readyState === EventSource.CLOSED) {
+                this.closeEventStream();
+            }
+        };
+        this.eventSource = source;
+    }
+
+    private closeEventStream() {
+        this.eventSource?.close();
+        this.eventSource = undefined;
+    }
+
+    /**
+     * Waits until a lecture event arrives or the given time has passed.
+     */
+    private async waitForEvent(ms: number) {
+        const timer = $timeout(ms);
+        const event = new Promise<void>((resolve) => {
+            this.wakeUpPolling = resolve;
+        });
+        await Promise.race([timer, event]);
+        this.wakeUpPolling = undefined;
+        $timeout.cancel(timer);
+    }
+
     async pollOnce(lastID: number): Promise<[number, number]> {
         let buster = "" + new Date().getTime();
         buster = buster.substring(buster.length - 4);
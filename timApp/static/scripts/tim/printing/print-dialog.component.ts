@@ -5,7 +5,12 @@ import {TimUtilityModule} from "tim/ui/tim-utility.module";
 import {HttpClient, HttpClientModule} from "@angular/common/http";
 import * as t from "io-ts";
 import {FormsModule} from "@angular/forms";
-import {getUrlParamsJSON, TimStorage, toPromise} from "tim/util/utils";
+import {
+    getUrlParamsJSON,
+    timeout,
+    TimStorage,
+    toPromise,
+} from "tim/util/utils";
 import type {IItem} from "tim/item/IItem";
 import {CommonModule} from "@angular/common";
 
@@ -21,6 +26,20 @@ export interface IPrintParams {
     params: ITemplateParams;
 }
 
+interface IPrintResponse {
+    url: string;
+    errormsg?: string;
+    latex?: string;
+    latexline?: string;
+    // Set if the document is printed by a print job.
+    jobId?: string;
+    status?: "queued" | "running" | "done" | "failed";
+    progress?: string;
+    error?: string;
+}
+
+const PRINT_JOB_POLL_INTERVAL = 2000;
+
 @Component({
     selector: "tim-print-dialog",
     template: `
@@ -136,6 +155,7 @@ export interface IPrintParams {
                     Create
                 </button>
                 <tim-loading *ngIf="loading"></tim-loading>
+                <span *ngIf="loading && progress">{{ progress }}...</span>
                 <tim-alert *ngIf="docUrl && !errormsg" severity="success">
                     Creation succeeded!
                     <a [href]="docUrl"
@@ -158,6 +178,7 @@ export class PrintDialogComponent extends AngularDialogComponent<
     docUrl?: string;
     latex?: string;
     latexline?: string;
+    progress?: string;
     loading: boolean;
     showPaths: boolean;
     pluginsUserCode: boolean;
@@ -244,22 +265,27 @@ export class PrintDialogComponent extends AngularDialogComponent<
             this.loading = true;
             this.notificationmsg = undefined;
 
-            const r = await toPromise(
-                this.http.post<{
-                    url: string;
-                    errormsg?: string;
-                    latex?: string;
-                    latexline?: string;
-                }>("/print/" + this.data.document.path, {
-                    fileType,
-                    templateDocId: chosenTemplateId,
-                    printPluginsUserCode: pluginsUserCode,
-                    removeOldImages,
-                    force,
-                    urlMacros: getUrlParamsJSON(),
-                })
+            let r = await toPromise(
+                this.http.post<IPrintResponse>(
+                    "/print/" + this.data.document.path,
+                    {
+                        fileType,
+                        templateDocId: chosenTemplateId,
+                        printPluginsUserCode: pluginsUserCode,
+                        removeOldImages,
+                        force,
+                        urlMacros: getUrlParamsJSON(),
+                    }
+                )
             );
-            if (r.ok) {
+            if (r.ok && r.result.jobId) {
+                r = await this.waitForPrintJob(r.result.jobId);
+            }
+            this.progress = undefined;
+            if (r.ok && r.result.status === "failed") {
+                this.errormsg = r.result.error;
+                this.loading = false;
+            } else if (r.ok) {
                 const response = r.result;
                 this.docUrl = response.url;
                 this.errormsg = response.errormsg;
@@ -273,6 +299,22 @@ export class PrintDialogComponent extends AngularDialogComponent<
         }
     }
 
+    private async waitForPrintJob(jobId: string) {
+        while (true) {
+            await timeout(PRINT_JOB_POLL_INTERVAL);
+            const r = await toPromise(
+                this.http.get<IPrintResponse>(`/print/jobs/${jobId}`)
+            );
+            if (!r.ok) {
+                return r;
+            }
+            this.progress = r.result.progress ?? r.result.status;
+            if (r.result.status === "done" || r.result.status === "failed") {
+                return r;
+            }
+        }
+    }
+
     create() {
         this.createdUrl = undefined;
         this.getPrintedDocument(this.selected.name.toLowerCase());
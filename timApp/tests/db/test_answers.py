@@ -0,0 +1,162 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import func
+from sqlalchemy.orm import Query
+
+from timApp.admin.answer_cli import delete_answers_with_ids
+from timApp.answer.answer import Answer
+from timApp.answer.answer_models import UserAnswer, LatestAnswer
+from timApp.answer.answers import (
+    save_answer,
+    get_all_answer_initial_query,
+    get_users_for_tasks,
+    ValidityOptions,
+)
+from timApp.plugin.taskid import TaskId
+from timApp.tests.db.timdbtest import TimDbTest
+from timApp.timdb.sqa import db
+
+
+def explain(q: Query) -> str:
+    """Returns the query plan of the query. Sequential scans are disabled so that the indexes are used even for
+    the small tables of the tests if they can be used at all.
+    """
+    compiled = q.statement.compile(dialect=db.engine.dialect)
+    conn = db.session.connection()
+    conn.execute("SET enable_seqscan = off")
+    try:
+        rows = conn.execute(f"EXPLAIN {compiled}", compiled.params).fetchall()
+    finally:
+        conn.execute("RESET enable_seqscan")
+    return "\n".join(r[0] for r in rows)
+
+
+class AnswerTest(TimDbTest):
+    def test_task_id_columns(self):
+        a = save_answer([self.test_user_1], TaskId.parse("5.t1"), {"c": 1}, None)
+        db.session.commit()
+        self.assertEqual((5, "t1"), (a.doc_id, a.task_name))
+        a.task_id = "6.t2"
+        db.session.commit()
+        a = Answer.query.get(a.id)
+        self.assertEqual((6, "t2"), (a.doc_id, a.task_name))
+        # Same rule as in the migration that added the columns.
+        for task_id, expected in (
+            ("123", (None, None)),
+            ("x.t", (None, None)),
+            ("7.t.u", (7, "t.u")),
+        ):
+            a.task_id = task_id
+            db.session.commit()
+            a = Answer.query.get(a.id)
+            self.assertEqual(expected, (a.doc_id, a.task_name))
+        a.task_id = "6.t2"
+        db.session.commit()
+
+        save_answer([self.test_user_1], TaskId.parse("6.t3"), {"c": 1}, 1)
+        db.session.commit()
+        self.assertEqual(
+            [6],
+            [
+                r["doc_id"]
+                for r in get_users_for_tasks(
+                    [TaskId.parse("6.t2"), TaskId.parse("6.t3")],
+                    [self.test_user_1.id],
+                    group_by_doc=True,
+                )
+            ],
+        )
+
+    def test_answer_query_plans(self):
+        for i in range(3):
+            save_answer([self.test_user_1], TaskId.parse(f"7.t{i}"), {"c": i}, None)
+        db.session.commit()
+        self.assertIn(
+            "answer_doc_id_task_name_idx",
+            explain(Answer.query.filter(Answer.doc_id == 7)),
+        )
+        self.assertIn(
+            "answer_doc_id_task_name_idx",
+            explain(Answer.query.filter_by(doc_id=7, task_name="t1")),
+        )
+        self.assertIn(
+            "answer_task_id_answered_on_idx",
+            explain(
+                get_all_answer_initial_query(
+                    datetime.min.replace(tzinfo=timezone.utc),
+                    datetime.max.replace(tzinfo=timezone.utc),
+                    [TaskId.parse("7.t1")],
+                    ValidityOptions.ALL,
+                )
+            ),
+        )
+        self.assertIn(
+            "useranswer_user_id_answer_id_idx",
+            explain(UserAnswer.query.filter_by(user_id=self.test_user_1.id)),
+        )
+
+    def assert_latest_answers(self):
+        """Checks that the latest_answer table matches the answer history."""
+        expected = (
+            UserAnswer.query.join(Answer, Answer.id == UserAnswer.answer_id)
+            .group_by(UserAnswer.user_id, Answer.task_id)
+            .with_entities(
+                Answer.task_id,
+                UserAnswer.user_id,
+                func.max(Answer.id),
+                func.max(Answer.id).filter(Answer.valid == True),
+                func.count(Answer.id),
+                func.count(Answer.id).filter(Answer.valid == True),
+            )
+            .all()
+        )
+        actual = LatestAnswer.query.with_entities(
+            LatestAnswer.task_id,
+            LatestAnswer.user_id,
+            LatestAnswer.answer_id,
+            LatestAnswer.valid_answer_id,
+            LatestAnswer.count,
+            LatestAnswer.valid_count,
+        ).all()
+        self.assertEqual(sorted(expected), sorted(actual))
+
+    def test_latest_answers(self):
+        u1, u2 = self.test_user_1, self.test_user_2
+        a1 = save_answer([u1], TaskId.parse("8.t"), {"c": 1}, None)
+        a2 = save_answer([u1, u2], TaskId.parse("8.t"), {"c": 2}, None, valid=False)
+        save_answer([u2], TaskId.parse("8.u"), {"c": 3}, None)
+        db.session.commit()
+        self.assert_latest_answers()
+        self.assertEqual(
+            (a2.id, a1.id, 2, 1),
+            LatestAnswer.query.filter_by(task_id="8.t", user_id=u1.id)
+            .with_entities(
+                LatestAnswer.answer_id,
+                LatestAnswer.valid_answer_id,
+                LatestAnswer.count,
+                LatestAnswer.valid_count,
+            )
+            .one(),
+        )
+
+        # Answers added through the relationships.
+        u1.answers.append(Answer(task_id="8.u", content="{}", valid=True))
+        u1.answers.append(Answer(task_id="8.u", content="{}", valid=False))
+        db.session.commit()
+        self.assert_latest_answers()
+
+        a2.valid = True
+        db.session.commit()
+        self.assert_latest_answers()
+
+        a2.users_all.remove(u2)
+        db.session.commit()
+        self.assert_latest_answers()
+
+        a1.task_id = "8.v"
+        db.session.commit()
+        self.assert_latest_answers()
+
+        delete_answers_with_ids([a2.id])
+        db.session.commit()
+        self.assert_latest_answers()
@@ -2,7 +2,9 @@
 """
 
 import random
+from unittest.mock import patch
 
+from timApp.document.authorindex import AuthorIndex, get_author_index_path
 from timApp.document.document import Document
 from timApp.document.documentparser import DocumentParser
 from timApp.document.documents import import_document_from_file
@@ -483,3 +485,118 @@ a: 1
         self.assertEqual({"x": 2, "source_document": 10}, s2.get_dict())
         self.assertIsNone(src1)
         self.assertEqual(10, src2.doc_id)
+
+    def test_changelog_order(self):
+        d = self.create_doc().document
+        pars = [d.add_paragraph(f"par {i}") for i in range(5)]
+        d.modify_paragraph(pars[0].get_id(), "changed")
+        log = d.get_changelog()
+        self.assertEqual([5, 1], log.entries[0].version)
+        self.assertEqual(pars[0].get_id(), log.entries[0].par_id)
+        self.assertEqual(
+            [p.get_id() for p in reversed(pars)],
+            [e.par_id for e in d.get_changelog().entries[1:]],
+        )
+        self.assertEqual(2, len(d.get_changelog(2).entries))
+
+    def test_changelog_legacy_convert(self):
+        d = self.create_doc().document
+        p1 = d.add_paragraph("first")
+        p2 = d.add_paragraph("second")
+
+        # Simulate a document whose first two entries are in the legacy (newest first) format.
+        appendlog = d.get_appendlog_filename()
+        lines = appendlog.read_text().splitlines(keepends=True)
+        d.getlogfilename().write_text("".join(reversed(lines)))
+        appendlog.unlink()
+        p3 = d.add_paragraph("third")
+        expected = [p3.get_id(), p2.get_id(), p1.get_id()]
+        self.assertEqual(expected, [e.par_id for e in d.get_changelog().entries])
+        self.assertEqual(expected[:2], [e.par_id for e in d.get_changelog(2).entries])
+
+        self.assertEqual(2, d.convert_changelog())
+        self.assertFalse(d.getlogfilename().exists())
+        self.assertEqual(expected, [e.par_id for e in d.get_changelog().entries])
+        self.assertEqual(0, d.convert_changelog())
+
+    def test_version_file(self):
+        d = self.create_doc().document
+        pars = [d.add_paragraph(f"par {i}") for i in range(3)]
+        d.modify_paragraph(pars[0].get_id(), "changed")
+        self.assertEqual("3 1", d.get_version_file().read_text())
+        self.assertEqual((3, 1), Document(d.doc_id).get_version())
+
+        # A missing or corrupted version file is rebuilt from the version directories.
+        d.get_version_file().unlink()
+        self.assertEqual((3, 1), Document(d.doc_id).get_version())
+        self.assertEqual("3 1", d.get_version_file().read_text())
+        d.get_version_file().write_text("x")
+        self.assertEqual((3, 1), Document(d.doc_id).get_version())
+
+        d = Document(d.doc_id)
+        published = []
+
+        def check_published(doc_id, ver):
+            # The version file is updated and the version has its contents when the hint is published.
+            published.append(
+                (
+                    Document(doc_id).get_version(),
+                    [p.get_markdown() for p in Document(doc_id).get_paragraphs()],
+                )
+            )
+
+        with patch(
+            "timApp.document.document.set_latest_version", side_effect=check_published
+        ):
+            d.add_paragraph("par 3")
+        self.assertEqual("4 0", d.get_version_file().read_text())
+        self.assertEqual([((4, 0), ["changed", "par 1", "par 2", "par 3"])], published)
+
+    def test_version_contents_written_first(self):
+        d = self.create_doc().document
+        p = d.add_paragraph("par 0")
+        write_changelog = Document._Document__write_changelog
+        seen = []
+
+        def check_latest(doc, *args, **kwargs):
+            # The version is already the latest one when the changelog is written, so it must have its contents.
+            latest = Document(doc.doc_id)
+            seen.append(
+                (
+                    latest.get_version(),
+                    [par.get_markdown() for par in latest.get_paragraphs()],
+                )
+            )
+            write_changelog(doc, *args, **kwargs)
+
+        with patch.object(Document, "_Document__write_changelog", check_latest):
+            d.add_paragraph("par 1")
+            d.modify_paragraph(p.get_id(), "changed")
+        self.assertEqual(
+            [((2, 0), ["par 0", "par 1"]), ((2, 1), ["changed", "par 1"])], seen
+        )
+        self.assertEqual([], list(d.get_version_path().parent.glob(".*")))
+
+    def test_author_index(self):
+        d = self.create_doc().document
+        pars = [d.add_paragraph(f"par {i}") for i in range(2)]
+        d.modifier_group_id = 2
+        d.modify_paragraph(pars[1].get_id(), "edited")
+        d.modifier_group_id = 0
+        d.modify_paragraph(pars[1].get_id(), "edited again")
+        index = AuthorIndex.load(get_author_index_path(d))
+        edits = index.get_edits([pars[0].get_id(), pars[1].get_id()])
+        self.assertEqual(
+            {0: 1}, {g: e.count for g, e in edits[pars[0].get_id()].items()}
+        )
+        # The author with the latest edit is first.
+        self.assertEqual(
+            [(0, 2), (2, 1)], [(g, e.count) for g, e in edits[pars[1].get_id()].items()]
+        )
+
+        # A missing index is rebuilt from the changelog.
+        get_author_index_path(d).unlink()
+        rebuilt = AuthorIndex.load(get_author_index_path(d))
+        self.assertTrue(rebuilt.catch_up(d.get_appendlog_filename()))
+        self.assertEqual(index.pars, rebuilt.pars)
+        self.assertFalse(rebuilt.catch_up(d.get_appendlog_filename()))
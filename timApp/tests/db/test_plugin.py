@@ -2,7 +2,15 @@ from timApp.answer.answer import Answer
 from timApp.answer.answers import save_answer
 from timApp.document.docentry import DocEntry
 from timApp.document.viewcontext import default_view_ctx
-from timApp.plugin.plugin import Plugin
+from timApp.document.document import Document
+from timApp.document.usercontext import UserContext
+from timApp.plugin.plugin import (
+    Plugin,
+    find_plugin_from_document,
+    TaskNotFoundException,
+)
+from timApp.plugin.taskid import TaskId
+from timApp.plugin.taskindex import get_task_candidates
 from timApp.tests.db.timdbtest import TimDbTest
 from timApp.util.flask.responsehelper import to_dict
 from timApp.util.utils import static_tim_doc
@@ -51,3 +59,46 @@ class PluginTest(TimDbTest):
                 },
             )
             self.assertEqual(i, a.get_answer_number())
+
+    def test_task_index(self):
+        d = self.create_doc(
+            initial_par="""
+#- {plugin=textfield #t1}
+#- {defaultplugin=textfield}
+a {#t2 #} b {#t3 #}
+#- {defaultplugin=textfield}
+c {#t%%"4"%% #}
+"""
+        )
+        doc = d.document
+        u = UserContext.from_one_user(self.test_user_1)
+
+        def find(task_name: str) -> Plugin:
+            return find_plugin_from_document(
+                Document(d.id),
+                TaskId.parse(f"{d.id}.{task_name}"),
+                u,
+                default_view_ctx,
+            )
+
+        p2 = find("t2")
+        self.assertEqual("t2", p2.task_id.task_name)
+        pars = doc.get_paragraphs()
+        self.assertEqual(
+            [
+                (pars[1].get_id(), pars[1].get_hash()),
+                (pars[2].get_id(), pars[2].get_hash()),
+            ],
+            get_task_candidates(Document(d.id), "t3"),
+        )
+        self.assertEqual("t4", find("t4").task_id.task_name)
+        self.assertEqual("t1", find("t1").task_id.task_name)
+
+        doc.modify_paragraph(
+            pars[0].get_id(), "", {"plugin": "textfield", "taskId": "t5"}
+        )
+        doc.add_paragraph("x {#t6 #}", attrs={"defaultplugin": "textfield"})
+        self.assertEqual("t5", find("t5").task_id.task_name)
+        self.assertEqual("t6", find("t6").task_id.task_name)
+        with self.assertRaises(TaskNotFoundException):
+            find("t1")
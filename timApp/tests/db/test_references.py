@@ -9,6 +9,7 @@ from timApp.document.documentparser import DocumentParser
 from timApp.document.viewcontext import default_view_ctx
 from timApp.tests.db.timdbtest import TimDbTest
 from timApp.timdb.exceptions import TimDbException
+from timApp.util.timtiming import get_stats
 
 
 def add_ref_paragraph(
@@ -224,6 +225,25 @@ class RefTest(TimDbTest):
 
         # todo: test the contents of the rendered area
 
+    def test_area_ref_cache(self):
+        self.src_doc.add_paragraph("", attrs={"area": "testarea"})
+        area_par = self.src_doc.add_paragraph("Testarea par 1")
+        self.src_doc.add_paragraph("", attrs={"area_end": "testarea"})
+        ref_par = add_area_ref_paragraph(self.ref_doc, self.src_doc, "testarea")
+        nested_par = add_ref_paragraph(self.ref_doc, ref_par)
+
+        def get_ref_md(par: DocParagraph) -> list[str]:
+            par = Document(par.get_doc_id()).get_paragraph(par.get_id())
+            return [p.get_markdown() for p in par.get_referenced_pars_impl()]
+
+        self.assertEqual(["", "Testarea par 1", ""], get_ref_md(nested_par))
+        hits = get_stats().get("ref_cache.hit", 0)
+        self.assertEqual(["", "Testarea par 1", ""], get_ref_md(nested_par))
+        self.assertEqual(hits + 2, get_stats()["ref_cache.hit"])
+
+        self.src_doc.modify_paragraph(area_par.get_id(), "Edited")
+        self.assertEqual(["", "Edited", ""], get_ref_md(ref_par))
+
     def test_editparagraph_translate(self):
         src_md = self.src_par.get_exported_markdown()
         self.assertRegex(src_md, '^#- *\\{([ab]="[21]" ?){2}\\}\ntestpar\n$')
@@ -3,8 +3,17 @@ from datetime import timedelta
 from timApp.auth.accesstype import AccessType
 from timApp.item.block import insert_block, BlockType, Block
 from timApp.tests.db.timdbtest import TimDbTest, TEST_USER_1_ID
+from timApp.tim_app import app
 from timApp.timdb.sqa import db
-from timApp.user.user import User, last_name_to_first, last_name_to_last, UserInfo
+from timApp.user.user import (
+    User,
+    last_name_to_first,
+    last_name_to_last,
+    UserInfo,
+    view_access_set,
+    edit_access_set,
+    get_request_access_memo,
+)
 from timApp.user.usergroup import UserGroup
 from timApp.user.users import remove_access
 from timApp.user.userutils import grant_access
@@ -219,6 +228,50 @@ class UserTest(TimDbTest):
         self.assertFalse(user.has_view_access(b))
         self.remove(pg1, b, v)
 
+    def test_bulk_access(self):
+        pg2 = self.test_user_2.get_personal_group()
+        blocks = [insert_block(BlockType.Document, "testing", [pg2]) for _ in range(4)]
+        user = User.query.get(TEST_USER_1_ID)
+        pg1 = user.get_personal_group()
+        now = get_current_time()
+        self.grant(pg1, blocks[0], AccessType.view)
+        self.grant(
+            pg1, blocks[1], AccessType.edit, accessible_to=now + timedelta(days=1)
+        )
+        self.grant(
+            pg1, blocks[2], AccessType.view, accessible_to=now - timedelta(days=1)
+        )
+        self.grant(pg1, blocks[3], AccessType.view, duration=timedelta(days=1))
+        for vals, duration in (
+            (view_access_set, False),
+            (view_access_set, True),
+            (edit_access_set, False),
+        ):
+            accesses = user.get_some_accesses(blocks, vals, duration=duration)
+            self.assertEqual(
+                [user.has_some_access(b, vals, duration=duration) for b in blocks],
+                [accesses[b.id] for b in blocks],
+            )
+        self.assertEqual(
+            [True, True, False, False],
+            [bool(a) for a in user.get_some_accesses(blocks, view_access_set).values()],
+        )
+
+        with app.test_request_context():
+            self.assertFalse(user.has_view_access(blocks[2]))
+            self.assertIsNotNone(get_request_access_memo())
+            grant_access(pg1, blocks[2], AccessType.view)
+            db.session.flush()
+            db.session.expire(blocks[2])
+            self.assertTrue(user.has_view_access(blocks[2]))
+            self.assertTrue(
+                user.get_some_accesses(blocks, view_access_set)[blocks[2].id]
+            )
+            user.remove_access(blocks[2].id, AccessType.view)
+            db.session.expire(blocks[2])
+            self.assertFalse(user.has_view_access(blocks[2]))
+        db.session.rollback()
+
     def test_last_name_switch(self):
         for (fn1, fn2) in [
             (lambda x: x, last_name_to_first),
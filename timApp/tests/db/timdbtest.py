@@ -1,4 +1,3 @@
-import glob
 import os
 import sys
 import unittest
@@ -14,6 +13,10 @@ import timApp.timdb.init
 from timApp.document.docentry import DocEntry
 from timApp.document.docinfo import DocInfo
 from timApp.document.document import Document
+from timApp.document.macrocache import clear_macro_cache
+from timApp.document.parcache import par_data_cache
+from timApp.document.refcache import ref_cache
+from timApp.document.versioncache import clear_version_cache
 from timApp.messaging.messagelist.listinfo import Channel
 from timApp.tim_app import app
 from timApp.timdb.sqa import db
@@ -40,10 +43,10 @@ class TimDbTest(unittest.TestCase):
             # Safety mechanism
             assert cls.test_files_path.as_posix() != "/tim_files"
             del_content(cls.test_files_path, onerror=change_permission_and_retry)
-            for f in glob.glob("/tmp/heading_cache_*"):
-                os.remove(f)
-            for f in glob.glob("/tmp/tim_auto_macros_*"):
-                os.remove(f)
+            clear_macro_cache(None)
+            par_data_cache.clear()
+            ref_cache.clear()
+            clear_version_cache()
         else:
             cls.test_files_path.mkdir()
         # Safety mechanism to make sure we are not wiping some production database
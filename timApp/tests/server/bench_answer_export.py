@@ -0,0 +1,64 @@
+"""Benchmark for streaming the answers of a task with a large number of answers.
+
+Not run automatically; run with e.g. ``pytest timApp/tests/server/bench_answer_export.py -s``.
+"""
+import resource
+import time
+
+from timApp.timdb.sqa import db
+from timApp.tests.server.timroutetest import TimRouteTest
+
+ANSWER_COUNT = 1_000_000
+
+
+class AnswerExportBenchmark(TimRouteTest):
+    def test_answer_export(self):
+        self.login_test1()
+        d = self.create_doc(initial_par="#- {plugin=textfield #t}")
+        user_ids = [self.test_user_1.id, self.test_user_2.id, self.test_user_3.id]
+        start = time.perf_counter()
+        # noinspection SqlResolve
+        db.session.execute(
+            """
+INSERT INTO answer (task_id, doc_id, task_name, content, valid, answered_on)
+SELECT :task_id, :doc_id, 't', '{"c": "answer ' || i || '"}', TRUE, now() - i * INTERVAL '1 second'
+FROM generate_series(1, :count) i
+""",
+            {"task_id": f"{d.id}.t", "doc_id": d.id, "count": ANSWER_COUNT},
+        )
+        # noinspection SqlResolve
+        db.session.execute(
+            """
+INSERT INTO useranswer (answer_id, user_id)
+SELECT id, (:user_ids)[id % 3 + 1]
+FROM answer
+WHERE doc_id = :doc_id
+""",
+            {"user_ids": user_ids, "doc_id": d.id},
+        )
+        db.session.commit()
+        print(f"inserted {ANSWER_COUNT} answers in {time.perf_counter() - start:.1f}s")
+
+        for name, url, query_string in (
+            ("text", f"/allAnswersPlain/{d.id}.t", {"age": "all"}),
+            ("json", f"/allAnswersPlain/{d.id}.t", {"age": "all", "format": "json"}),
+            ("csv", f"/allAnswersPlain/{d.id}.t", {"age": "all", "format": "csv"}),
+            ("export", f"/exportAnswers/{d.path}", {}),
+        ):
+            rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            start = time.perf_counter()
+            resp = self.client.get(url, query_string=query_string, buffered=False)
+            self.assertEqual(200, resp.status_code)
+            first_byte = None
+            size = 0
+            for chunk in resp.iter_encoded():
+                if first_byte is None:
+                    first_byte = time.perf_counter() - start
+                size += len(chunk)
+            resp.close()
+            total = time.perf_counter() - start
+            rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+            print(
+                f"{name}: {size / 2**20:.1f}MiB in {total:.1f}s, first byte after {first_byte * 1000:.0f}ms, "
+                f"peak RSS growth {rss_growth / 1024:.1f}MiB"
+            )
@@ -0,0 +1,56 @@
+"""Benchmark for the answer route under a simulated exam load of 500 answers per minute.
+
+Not run automatically; run with e.g. ``pytest timApp/tests/server/bench_answers.py -s``.
+"""
+import time
+from statistics import median, quantiles
+
+from timApp.tests.server.timroutetest import TimRouteTest
+
+PAR_COUNT = 1000
+TASK_COUNT = 20
+ANSWER_COUNT = 500
+ANSWERS_PER_MINUTE = 500
+
+
+class AnswerBenchmark(TimRouteTest):
+    def test_answer_latency(self):
+        self.login_test1()
+        md = "".join(
+            f"#-\nText {i}\n\n#- {{plugin=textfield #t{i}}}\n\n"
+            if i % (PAR_COUNT // TASK_COUNT) == 0
+            else f"#-\nText {i}\n\n"
+            for i in range(PAR_COUNT)
+        )
+        d = self.create_doc(initial_par=md)
+        self.create_preamble_for(
+            d,
+            initial_par="\n".join(
+                f"#-\nPreamble text {i}\n\n#- {{plugin=textfield #p{i}}}\n"
+                for i in range(TASK_COUNT)
+            ),
+        )
+        doc_tasks = [
+            p.get_attr("taskId")
+            for p in d.document.get_paragraphs()
+            if p.get_attr("taskId")
+        ]
+        budget = 60 / ANSWERS_PER_MINUTE
+
+        with self.internal_container_ctx():
+            for name, tasks in (("document", doc_tasks), ("preamble", ["p0", "p1"])):
+                latencies = []
+                for i in range(ANSWER_COUNT):
+                    start = time.perf_counter()
+                    self.post_answer(
+                        "textfield",
+                        f"{d.id}.{tasks[i % len(tasks)]}",
+                        user_input={"c": str(i)},
+                    )
+                    latencies.append(time.perf_counter() - start)
+                p95 = quantiles(latencies, n=20)[-1]
+                print(
+                    f"{name} tasks: {ANSWER_COUNT} answers, median {median(latencies) * 1000:.1f}ms, "
+                    f"p95 {p95 * 1000:.1f}ms, budget {budget * 1000:.0f}ms per answer, "
+                    f"{sum(1 for t in latencies if t > budget)} over budget"
+                )
@@ -0,0 +1,58 @@
+"""Benchmark for concurrent first views of a large document with auto numbered headings.
+
+Not run automatically; run with e.g. ``pytest timApp/tests/server/bench_first_view.py -s``.
+"""
+import time
+from threading import Thread
+
+from timApp.document.macrocache import (
+    AUTO_MACROS,
+    get_auto_macro_key,
+    get_macro_cache_backend,
+)
+from timApp.tests.server.timroutetest import TimRouteTest
+
+PAR_COUNT = 500
+THREAD_COUNT = 8
+
+
+class FirstViewBenchmark(TimRouteTest):
+    def test_concurrent_first_view(self):
+        self.login_test1()
+        md = '``` {settings=""}\nauto_number_headings: 1\n```\n' + "".join(
+            f"#-\n# Heading {i}\n\n#-\nText {i}\n\n" for i in range(PAR_COUNT)
+        )
+        d = self.create_doc(initial_par=md)
+        last_heading = f"{PAR_COUNT}. Heading {PAR_COUNT - 1}"
+
+        for round_name in ("cold", "warm"):
+            errors = []
+            texts = []
+
+            def view():
+                try:
+                    texts.append(self.get(d.url, as_tree=True).text_content())
+                except Exception as e:
+                    errors.append(e)
+
+            threads = [Thread(target=view) for _ in range(THREAD_COUNT)]
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - start
+            print(
+                f"{round_name}: {THREAD_COUNT} views of {2 * PAR_COUNT} paragraphs in {elapsed:.2f}s"
+            )
+            self.assertEqual([], errors)
+            self.assertEqual(THREAD_COUNT, len(texts))
+            for text in texts:
+                self.assertIn(last_heading, text)
+
+            # The heading numbers are computed only once; later views read them from the cache.
+            last_par = d.document.get_paragraphs()[-1]
+            key = get_auto_macro_key(last_par)
+            self.assertIn(
+                key, get_macro_cache_backend().get_many(d.id, AUTO_MACROS, [key])
+            )
@@ -0,0 +1,81 @@
+"""Load test of the lecture event fan-out with hundreds of concurrent listeners.
+
+Each listener waits for the events of the lecture like a /lectureEvents stream or a long-polling /getUpdates
+request does. The lecturer sends wall messages and the benchmark measures how long it takes until every listener
+has received the event.
+
+Not run automatically; run with e.g. ``pytest timApp/tests/server/bench_lecture_events.py -s``.
+"""
+import datetime
+import threading
+import time
+
+from timApp.lecture.lectureevents import get_lecture_event_hub
+from timApp.tests.server.timroutetest import TimRouteTest
+from timApp.util.utils import get_current_time
+
+LISTENERS = 500
+MESSAGES = 20
+
+
+class LectureEventsBenchmark(TimRouteTest):
+    def test_fan_out_latency(self):
+        self.login_test1()
+        doc = self.create_doc()
+        current_time = get_current_time()
+        j = self.json_post(
+            "/createLecture",
+            json_data=dict(
+                doc_id=doc.id,
+                end_time=current_time + datetime.timedelta(hours=2),
+                lecture_code="bench lecture",
+                max_students=LISTENERS,
+                start_time=current_time - datetime.timedelta(minutes=1),
+            ),
+        )
+        lecture_id = j["lecture_id"]
+        hub = get_lecture_event_hub()
+
+        ready = threading.Barrier(LISTENERS + 1)
+        received = [[] for _ in range(MESSAGES)]
+        received_lock = threading.Lock()
+
+        def listen():
+            with hub.subscribe(lecture_id) as events:
+                ready.wait()
+                count = 0
+                while count < MESSAGES:
+                    kinds = events.wait(30)
+                    if not kinds:
+                        break
+                    now = time.perf_counter()
+                    with received_lock:
+                        received[count].append(now)
+                    count += 1
+
+        threads = [threading.Thread(target=listen) for _ in range(LISTENERS)]
+        for t in threads:
+            t.start()
+        ready.wait()
+
+        latencies = []
+        for i in range(MESSAGES):
+            start = time.perf_counter()
+            self.json_post("/sendMessage", {"message": f"message {i}"})
+            while len(received[i]) < LISTENERS:
+                if time.perf_counter() - start > 30:
+                    break
+                time.sleep(0.001)
+            latencies.append(max(received[i], default=start) - start)
+        for t in threads:
+            t.join()
+
+        latencies.sort()
+        delivered = sum(len(r) for r in received)
+        print(
+            f"{LISTENERS} listeners, {MESSAGES} messages: "
+            f"{delivered}/{LISTENERS * MESSAGES} events delivered, "
+            f"fan-out latency p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+            f"max {latencies[-1] * 1000:.1f} ms"
+        )
+        self.assertEqual(LISTENERS * MESSAGES, delivered)
@@ -0,0 +1,39 @@
+"""Benchmark comparing the search latency of the search index and the grep search files.
+
+Not run automatically; run with e.g. ``pytest timApp/tests/server/bench_search.py -s``.
+"""
+import time
+
+from timApp.tests.server.timroutetest import TimRouteTest
+from timApp.tim_app import app
+
+DOC_COUNT = 50
+PARS_PER_DOC = 200
+QUERIES = ["lorem", "paragraph 17", "zebra", "ip"]
+
+
+class SearchBenchmark(TimRouteTest):
+    def test_search_latency(self):
+        self.make_admin(self.test_user_1)
+        self.login_test1()
+        for d in range(DOC_COUNT):
+            md = "\n".join(
+                f"#-\nLorem ipsum dolor sit amet, paragraph {p} of document {d}.\n"
+                for p in range(PARS_PER_DOC)
+            )
+            self.create_doc(initial_par=md)
+
+        for backend in ("grep", "index"):
+            app.config["SEARCH_BACKEND"] = backend
+            start = time.perf_counter()
+            self.get("search/createContentFile")
+            print(f"{backend}: build {time.perf_counter() - start:.2f}s")
+            for q in QUERIES:
+                whole = "true" if len(q) < 3 else "false"
+                start = time.perf_counter()
+                self.get(
+                    f"search?folder=&query={q}&searchContent=true&searchTitles=true"
+                    f"&ignoreRelevance=true&searchWholeWords={whole}"
+                )
+                print(f"{backend}: '{q}' {time.perf_counter() - start:.3f}s")
+        app.config["SEARCH_BACKEND"] = "index"
@@ -11,6 +11,7 @@ from timApp.answer.answers import (
 )
 from timApp.answer.backup import get_backup_answer_file
 from timApp.auth.accesstype import AccessType
+from timApp.document.document import Document
 from timApp.plugin.taskid import TaskId
 from timApp.tests.server.timroutetest import TimRouteTest
 from timApp.tim_app import app
@@ -292,3 +293,22 @@ class AnswerTest(TimRouteTest):
             expect_status=403,
             expect_content="Answering is disabled for this document.",
         )
+
+    def test_answer_preamble_task(self):
+        self.login_test1()
+        d = self.create_doc(initial_par="#- {plugin=textfield #t}")
+        self.create_preamble_for(d, initial_par="#- {plugin=textfield #p}")
+        with patch.object(
+            Document,
+            "insert_preamble_pars",
+            autospec=True,
+            side_effect=Document.insert_preamble_pars,
+        ) as m:  # type: Mock
+            with self.internal_container_ctx():
+                self.post_answer("textfield", f"{d.id}.t", user_input={"c": "1"})
+                m.assert_not_called()
+                self.post_answer("textfield", f"{d.id}.p", user_input={"c": "2"})
+                m.assert_called()
+        for task_name in ("t", "p"):
+            answers = self.get_task_answers(f"{d.id}.{task_name}", self.current_user)
+            self.assertEqual(1, len(answers))
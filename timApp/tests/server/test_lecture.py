@@ -2,6 +2,7 @@ import datetime
 import json
 from time import sleep
 from typing import Optional
+from unittest.mock import patch
 
 import dateutil.parser
 
@@ -9,9 +10,11 @@ from timApp.lecture.askedjson import AskedJson, make_error_question
 from timApp.lecture.askedquestion import AskedQuestion, get_asked_question
 from timApp.lecture.lecture import Lecture
 from timApp.lecture.lectureanswer import LectureAnswer
+from timApp.lecture.lectureevents import LectureEventKind
 from timApp.lecture.showpoints import Showpoints
 from timApp.tests.db.timdbtest import TEST_USER_1_ID
 from timApp.tests.server.timroutetest import TimRouteTest
+from timApp.tim_app import app
 from timApp.timdb.sqa import db
 from timApp.util.utils import get_current_time, static_tim_doc
 
@@ -529,3 +532,72 @@ testuser2;count;1
         self.assertEqual([["1", "3"]], resp[0]["answer"])
         self.assertEqual(5, resp[1]["points"])
         self.assertEqual([["2", "3"]], resp[1]["answer"])
+
+    def test_lecture_events(self):
+        self.login_test1()
+        doc = self.create_doc(from_file=static_tim_doc("questions.md"))
+        current_time = get_current_time()
+        with patch("timApp.lecture.routes.publish_lecture_event") as publish:
+            lecture_id = self.json_post(
+                "/createLecture",
+                json_data=dict(
+                    doc_id=doc.id,
+                    end_time=current_time + datetime.timedelta(hours=2),
+                    lecture_code="event lecture",
+                    max_students=50,
+                    start_time=current_time - datetime.timedelta(minutes=15),
+                ),
+            )["lecture_id"]
+        publish.assert_called_once_with(lecture_id, LectureEventKind.Lecture)
+        app.config["LECTURE_EVENT_STREAM_SECS"] = 0.1
+        try:
+            resp = self.get("/lectureEvents", expect_mimetype="text/event-stream")
+        finally:
+            app.config["LECTURE_EVENT_STREAM_SECS"] = 300
+        self.assertEqual(b": connected\n\n: keepalive\n\n", resp)
+
+        par_id = doc.document.get_paragraphs()[0].get_id()
+        with patch("timApp.lecture.routes.publish_lecture_event") as publish:
+            aid = self.json_post(
+                "/askQuestion", query_string=dict(doc_id=doc.id, par_id=par_id)
+            )["asked_id"]
+            self.json_put(
+                "/answerToQuestion",
+                json_data={"input": [["0"]], "asked_id": aid},
+                expect_content=self.ok_resp,
+            )
+            self.post("/stopQuestion", query_string=dict(asked_id=aid))
+            self.post("/showAnswerPoints", query_string=dict(asked_id=aid))
+            self.post("/updatePoints/", query_string=dict(asked_id=aid, points="0:1"))
+            self.json_put("/closePoints", query_string=dict(asked_id=aid))
+        self.assertEqual(
+            [
+                LectureEventKind.Question,
+                LectureEventKind.Answer,
+                LectureEventKind.Question,
+                LectureEventKind.Points,
+                LectureEventKind.Points,
+                LectureEventKind.Points,
+            ],
+            [c.args[1] for c in publish.call_args_list],
+        )
+        self.assertEqual({lecture_id}, {c.args[0] for c in publish.call_args_list})
+
+        self.json_post(
+            "/createLecture",
+            json_data=dict(
+                doc_id=doc.id,
+                end_time=current_time + datetime.timedelta(hours=4),
+                lecture_code="future lecture",
+                start_time=current_time + datetime.timedelta(hours=2),
+            ),
+        )
+        with patch("timApp.lecture.routes.publish_lecture_event") as publish:
+            future_id = self.json_post(
+                "/startFutureLecture",
+                query_string=dict(lecture_code="future lecture", doc_id=doc.id),
+            )["lecture_id"]
+        publish.assert_called_once_with(future_id, LectureEventKind.Lecture)
+
+        self.login_test2()
+        self.get("/lectureEvents", expect_status=400)
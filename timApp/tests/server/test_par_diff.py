@@ -1,6 +1,7 @@
 """Server tests for getParDiff route."""
 from lxml import html
 
+from timApp.document.versioncache import get_latest_version
 from timApp.tests.server.timroutetest import TimRouteTest
 
 
@@ -21,6 +22,30 @@ class ParDiffTest(TimRouteTest):
         e = html.fromstring(r["diff"][0]["content"]["texts"])
         self.assert_content(e, ["1"])
 
+    def test_par_diff_cache(self):
+        self.login_test1()
+        d = self.create_doc()
+        par = d.document.add_paragraph("1")
+        for _ in range(2):
+            r = self.get(f"/getParDiff/{d.id}/0/0")
+            e = html.fromstring(r["diff"][0]["content"]["texts"])
+            self.assert_content(e, ["1"])
+        self.assertEqual((1, 0), get_latest_version(d.id))
+        for _ in range(2):
+            self.get(
+                f"/getParDiff/{d.id}/1/0",
+                expect_content={"diff": [], "live": 0, "version": [1, 0]},
+            )
+        d.document.add_paragraph("2")
+        self.assertEqual((2, 0), get_latest_version(d.id))
+        r = self.get(f"/getParDiff/{d.id}/1/0")
+        self.assert_dict_subset(r, {"live": 0, "version": [2, 0]})
+        self.assert_dict_subset(
+            r["diff"][0], {"after_id": par.get_id(), "type": "insert"}
+        )
+        e = html.fromstring(r["diff"][0]["content"]["texts"])
+        self.assert_content(e, ["2"])
+
     def test_reference_par(self):
         """No exception is thrown when a reference par is in the "equal" section of the diff result."""
         self.login_test1()
@@ -1,3 +1,4 @@
+import csv
 import io
 import json
 import re
@@ -765,6 +766,28 @@ type: upload
         self.assertEqual(expected, [r["answer"]["content"] for r in res])
         self.assertEqual(expected, [r["resolved_content"] for r in res])
 
+        # test CSV format
+        rows = list(
+            csv.reader(
+                io.StringIO(
+                    self.get(
+                        f"/allDocumentAnswersPlain/{doc.id}",
+                        query_string={"format": "csv", "print": "korppi"},
+                    )
+                )
+            )
+        )
+        self.assertEqual(
+            [
+                ["name", "task", "answer"],
+                ["testuser1", "mmcqexample", "[true, false, false]"],
+                ["testuser2", "mmcqexample", "[true, true, true]"],
+                ["testuser1", "mmcqexample2", "[true, false]"],
+                ["testuser2", "mmcqexample2", "[false, false]"],
+            ],
+            rows,
+        )
+
         # test pseudonyms
         pseudonym_results = self.get(
             f"/allDocumentAnswersPlain/{doc.path}",
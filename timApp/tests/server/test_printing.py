@@ -1,9 +1,20 @@
 """Server tests for printing."""
 import json
 import urllib.parse
+from unittest.mock import patch
+
+from flask import has_request_context
 
 from timApp.document.docentry import DocEntry
 from timApp.document.specialnames import TEMPLATE_FOLDER_NAME, PRINT_FOLDER_NAME
+from timApp.printing.fragmentcache import parse_fragments
+from timApp.printing.print import do_print_job
+from timApp.printing.printjobs import (
+    PrintJobStatus,
+    create_print_job,
+    get_print_job,
+    get_print_job_key,
+)
 from timApp.tests.server.timroutetest import TimRouteTest
 from timApp.util.flask.responsehelper import to_json_str
 from timApp.util.utils import exclude_keys
@@ -227,6 +238,69 @@ not header & x \\
         r = self.get_no_warn(f"/print/{d.path}", query_string=params_url)
         self.assertEqual(no_numbers.strip(), r)
 
+    def test_print_doctexmacros_after_edit(self):
+        self.login_test1()
+        d = self.create_doc(
+            initial_par=[r"First $\R$", r"Second $\R^2$"],
+            settings={"doctexmacros": r"\newcommand{\R}{\mathbb{R}}" + "\n"},
+        )
+        t = self.create_empty_print_template()
+        params_url = {
+            "file_type": "latex",
+            "template_doc_id": t.id,
+            "plugins_user_code": False,
+            "force": True,
+        }
+        r = self.get_no_warn(f"/print/{d.path}", query_string=params_url)
+        self.assertIn(r"\newcommand{\R}{\mathbb{R}}", r)
+        self.assertIn(r"First \(\R\)", r)
+        self.assertIn(r"Second \(\R^2\)", r)
+
+        par = d.document.get_paragraphs()[-1]
+        d.document.modify_paragraph(par.get_id(), r"Third $\R^3$")
+        with patch(
+            "timApp.printing.fragmentcache.parse_fragments", wraps=parse_fragments
+        ) as m:
+            r = self.get_no_warn(f"/print/{d.path}", query_string=params_url)
+        # Only the edited paragraph is parsed again, and the result does not depend on the cached macro fragment.
+        m.assert_called_once_with([r"Third $\R^3$"])
+        self.assertIn(r"\newcommand{\R}{\mathbb{R}}", r)
+        self.assertIn(r"First \(\R\)", r)
+        self.assertIn(r"Third \(\R^3\)", r)
+        self.assertNotIn("Second", r)
+
+    def test_print_job_with_plugin_outside_request(self):
+        """Print jobs run in a Celery worker, which has no request context."""
+        self.login_test1()
+        d = self.create_doc(
+            initial_par="""
+``` {#t plugin="textfield"}
+header: Field
+```
+        """
+        )
+        t = self.create_empty_print_template()
+        job_id, _ = create_print_job(
+            get_print_job_key(d.id, t.id, "latex", "test"), {"doc_id": d.id}
+        )
+        self.assertFalse(has_request_context())
+        do_print_job(
+            job_id,
+            {
+                "doc_id": d.id,
+                "template_doc_id": t.id,
+                "file_type": "latex",
+                "user_id": self.test_user_1.id,
+                "plugins_user_print": False,
+                "url_macros": None,
+                "eol_type": "native",
+                "session": {"hide_names": True},
+            },
+        )
+        job = get_print_job(job_id)
+        self.assertIsNone(job.get("error"))
+        self.assertEqual(PrintJobStatus.Done.value, job["status"])
+
     def create_empty_print_template(self):
         p = f"{self.current_user.get_personal_folder().path}/{TEMPLATE_FOLDER_NAME}/{PRINT_FOLDER_NAME}/empty"
         t = DocEntry.find_by_path(p)
@@ -1,7 +1,17 @@
+import sqlite3
+from unittest.mock import patch
+
 from timApp.auth.accesstype import AccessType
+from timApp.document.caching import rclient
 from timApp.item.tag import TagType
 from timApp.tests.server.timroutetest import TimRouteTest
 from timApp.timdb.sqa import db
+from timApp.util.flask.search import (
+    INDEX_BUILD_QUEUED_KEY,
+    create_search_files,
+    update_search_index,
+)
+from timApp.util.flask.searchindex import SearchIndex, get_index_lock
 
 
 class SearchTest(TimRouteTest):
@@ -668,3 +678,65 @@ class SearchTest(TimRouteTest):
                 "word_result_count": 0,
             },
         )
+
+    def test_incremental_index_update(self):
+        self.make_admin(self.test_user_1)
+        self.login_test1()
+        d = self.create_doc(initial_par="Nothing to see here.")
+        self.get(f"search/createContentFile")
+        url = "search?folder=&query=zebra&regex=false&searchContent=true&searchTitles=true"
+        r = self.get(url)
+        self.assertEqual(0, r["word_result_count"])
+        self.assertEqual(0, r["title_result_count"])
+
+        d.document.add_paragraph("Zebras have stripes.")
+        self.json_put(f"/changeTitle/{d.id}", {"new_title": "Zebra document"})
+        while update_search_index():
+            pass
+        r = self.get(url)
+        self.assertEqual(1, r["word_result_count"])
+        self.assertEqual(1, r["title_result_count"])
+
+        d.document.delete_paragraph(d.document.get_paragraphs()[-1].get_id())
+        while update_search_index():
+            pass
+        r = self.get(url)
+        self.assertEqual(0, r["word_result_count"])
+
+    def test_index_update_waits_and_retries(self):
+        self.make_admin(self.test_user_1)
+        self.login_test1()
+        d = self.create_doc(initial_par="Nothing to see here.")
+        self.get(f"search/createContentFile")
+        url = "search?folder=&query=zebra&regex=false&searchContent=true"
+
+        d.document.add_paragraph("Zebras have stripes.")
+        # The update is not applied while the index is being rebuilt.
+        with get_index_lock():
+            self.assertEqual(0, update_search_index())
+        with patch.object(
+            SearchIndex, "connect", side_effect=sqlite3.OperationalError("locked")
+        ):
+            with self.assertRaises(sqlite3.OperationalError):
+                update_search_index()
+        self.assertEqual(0, self.get(url)["word_result_count"])
+
+        # The queued document is kept until it has been reindexed.
+        while update_search_index():
+            pass
+        self.assertEqual(1, self.get(url)["word_result_count"])
+
+    def test_search_before_index_is_built(self):
+        self.login_test1()
+        self.create_doc(initial_par="Giraffes are tall.")
+        create_search_files()
+        rclient.delete(INDEX_BUILD_QUEUED_KEY)
+        url = "search?folder=&query=giraffe&regex=false&searchContent=true"
+        with patch("timApp.util.flask.search.get_live_index", return_value=None), patch(
+            "timApp.tim_celery.update_search_files.delay"
+        ) as delay:
+            # The grep search files are used until the index has been built.
+            self.assertEqual(1, self.get(url)["word_result_count"])
+            self.assertEqual(1, self.get(url)["word_result_count"])
+        delay.assert_called_once_with()
+        rclient.delete(INDEX_BUILD_QUEUED_KEY)
@@ -0,0 +1,126 @@
+"""An in-memory stand-in for the Redis client for unit tests that do not have a Redis server."""
+import threading
+from queue import Queue
+from typing import Any
+from unittest import TestCase
+from unittest.mock import patch
+
+from redis import RedisError
+
+
+def encode(value: Any) -> bytes:
+    return value if isinstance(value, bytes) else str(value).encode()
+
+
+class FakePipeline:
+    def __init__(self, redis: "FakeRedis"):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def execute(self):
+        return [
+            getattr(self.redis, name)(*args, **kwargs)
+            for name, args, kwargs in self.calls
+        ]
+
+
+class FakePubSub:
+    def __init__(self, redis: "FakeRedis"):
+        self.redis = redis
+        self.pattern = None
+
+    def psubscribe(self, pattern: str) -> None:
+        self.pattern = pattern.rstrip("*")
+        self.redis.subscribed.set()
+
+    def listen(self):
+        while True:
+            channel, data = self.redis.messages.get()
+            if channel.startswith(self.pattern):
+                yield {
+                    "type": "pmessage",
+                    "channel": channel.encode(),
+                    "data": data.encode(),
+                }
+
+
+class FakeRedis:
+    """Implements the commands that TIM uses. Like Redis, the values are returned as bytes.
+
+    The names of the commands in ``failing`` raise RedisError; ``down`` makes all commands raise it.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.failing: set[str] = set()
+        self.down = False
+        self.messages = Queue()
+        self.subscribed = threading.Event()
+
+    def check(self, command: str) -> None:
+        if self.down or command in self.failing:
+            raise RedisError("down")
+
+    def get(self, key):
+        self.check("get")
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        self.check("set")
+        if nx and key in self.data:
+            return None
+        self.data[key] = encode(value)
+        return True
+
+    def delete(self, *keys):
+        self.check("delete")
+        for key in keys:
+            self.data.pop(key, None)
+
+    def expire(self, key, secs):
+        self.check("expire")
+
+    def scan_iter(self, match):
+        self.check("scan_iter")
+        return [k for k in list(self.data) if k.startswith(match.rstrip("*"))]
+
+    def hset(self, key, mapping):
+        self.check("hset")
+        self.data.setdefault(key, {}).update(
+            {encode(k): encode(v) for k, v in mapping.items()}
+        )
+
+    def hgetall(self, key):
+        self.check("hgetall")
+        return self.data.get(key, {})
+
+    def sadd(self, key, *values):
+        self.check("sadd")
+        self.data.setdefault(key, set()).update(encode(v) for v in values)
+
+    def spop(self, key, count):
+        self.check("spop")
+        s = self.data.get(key, set())
+        return [s.pop() for _ in range(min(count, len(s)))]
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def pubsub(self, ignore_subscribe_messages: bool):
+        return FakePubSub(self)
+
+    def publish(self, channel: str, data: str) -> None:
+        self.check("publish")
+        self.messages.put((channel, data))
+
+
+def use_fake_redis(test: TestCase) -> FakeRedis:
+    """Replaces the Redis client with a FakeRedis for the duration of the test."""
+    redis = FakeRedis()
+    patcher = patch("timApp.document.caching.rclient", redis)
+    patcher.start()
+    test.addCleanup(patcher.stop)
+    return redis
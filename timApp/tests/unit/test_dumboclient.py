@@ -0,0 +1,154 @@
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from unittest import TestCase
+from unittest.mock import patch
+
+from timApp.markdown.dumboclient import (
+    DumboClient,
+    DumboConfig,
+    DumboOptions,
+    call_dumbo,
+    make_shards,
+)
+from timApp.markdown.dumbocache import dumbo_cache
+from timApp.util.timtiming import get_stats
+
+
+class FakeDumboHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        data = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.batch_sizes.append(len(data["content"]))
+        if "slow" in data["content"]:
+            time.sleep(0.5)
+        result = [self.convert(c) for c in data["content"]]
+        body = json.dumps(result).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    @staticmethod
+    def convert(c):
+        if isinstance(c, str):
+            return f"<p>{c}</p>"
+        if isinstance(c["content"], dict):
+            return {k: f"<p>{v}</p>" for k, v in c["content"].items()}
+        return {"content": f"<p>{c['content']}</p>"}
+
+    def log_message(self, *args):
+        pass
+
+
+class DumboClientTest(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeDumboHandler)
+        self.server.batch_sizes = []
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def call_with_config(
+        self, config: DumboConfig, *args, cache_bytes: int = 0, **kwargs
+    ):
+        with patch(
+            "timApp.markdown.dumboclient.get_dumbo_client",
+            return_value=DumboClient(config),
+        ), patch(
+            "timApp.markdown.dumbocache.get_cache_config",
+            return_value=(cache_bytes, False),
+        ):
+            return call_dumbo(*args, **kwargs)
+
+    def test_make_shards(self):
+        self.assertEqual([(0, 3)], make_shards([1, 2, 3], 0))
+        self.assertEqual([(0, 3)], make_shards([1, 2, 3], 3))
+        self.assertEqual([(0, 2), (2, 3)], make_shards([1, 2, 3], 2))
+
+    def test_sharding_and_retry(self):
+        # The first instance is down, so every other request is retried on the working one.
+        config = DumboConfig(
+            urls=["http://127.0.0.1:1", self.url],
+            shard_size=2,
+            max_workers=4,
+            retries=1,
+            timeout=5,
+        )
+        retries = get_stats().get("dumbo.retry", 0)
+        data = [str(i) for i in range(7)]
+        self.assertEqual(
+            [f"<p>{i}</p>" for i in data], self.call_with_config(config, data)
+        )
+        self.assertEqual([1, 2, 2, 2], sorted(self.server.batch_sizes))
+        self.assertGreater(get_stats()["dumbo.retry"], retries)
+
+        self.assertEqual(
+            [{"content": "<p>a</p>"}, {"content": "<p>b</p>"}, {"content": "<p>c</p>"}],
+            self.call_with_config(config, ["a", "b", "c"], path="/mdkeys"),
+        )
+        self.assertEqual(
+            {"a": "<p>x</p>"},
+            self.call_with_config(config, {"a": "x"}, path="/mdkeys"),
+        )
+
+    def test_cache(self):
+        config = DumboConfig(
+            urls=[self.url], shard_size=0, max_workers=1, retries=0, timeout=5
+        )
+        dumbo_cache.clear()
+        hits = get_stats().get("dumbo_cache.hit", 0)
+        self.assertEqual(
+            ["<p>a</p>", "<p>b</p>"],
+            self.call_with_config(config, ["a", "b"], cache_bytes=10**6),
+        )
+        self.assertEqual(
+            ["<p>b</p>", "<p>c</p>", "<p>a</p>"],
+            self.call_with_config(config, ["b", "c", "a"], cache_bytes=10**6),
+        )
+        # Only the uncached item was sent in the second call.
+        self.assertEqual([2, 1], self.server.batch_sizes)
+        self.assertEqual(hits + 2, get_stats()["dumbo_cache.hit"])
+
+        # Different options produce a different cache entry.
+        self.call_with_config(
+            config,
+            ["a"],
+            options=DumboOptions.default()._replace(smart_punct=True),
+            cache_bytes=10**6,
+        )
+        self.assertEqual([2, 1, 1], self.server.batch_sizes)
+        dumbo_cache.clear()
+
+    def test_connection_failure(self):
+        config = DumboConfig(
+            urls=["http://127.0.0.1:1"],
+            shard_size=0,
+            max_workers=1,
+            retries=0,
+            timeout=5,
+        )
+        with self.assertRaisesRegex(Exception, "Failed to connect to Dumbo"):
+            self.call_with_config(config, ["a"])
+
+    def test_timeout(self):
+        config = DumboConfig(
+            urls=[self.url, self.url],
+            shard_size=0,
+            max_workers=1,
+            retries=1,
+            timeout=0.1,
+        )
+        with self.assertRaisesRegex(Exception, "Dumbo request timed out"):
+            self.call_with_config(config, ["slow"])
+        # A slow conversion is not retried.
+        self.assertEqual([1], self.server.batch_sizes)
+
+        # Without a timeout, a slow conversion succeeds.
+        config = DumboConfig(
+            urls=[self.url], shard_size=0, max_workers=1, retries=1, timeout=None
+        )
+        self.assertEqual(["<p>slow</p>"], self.call_with_config(config, ["slow"]))
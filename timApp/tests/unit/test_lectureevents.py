@@ -0,0 +1,35 @@
+from unittest import TestCase
+
+from timApp.lecture.lectureevents import (
+    LectureEventHub,
+    LectureEventKind,
+    publish_lecture_event,
+)
+from timApp.tests.unit.fakeredis import use_fake_redis
+
+
+class LectureEventHubTest(TestCase):
+    def setUp(self):
+        self.redis = use_fake_redis(self)
+        self.hub = LectureEventHub()
+
+    def test_fan_out(self):
+        with self.hub.subscribe(1) as a, self.hub.subscribe(1) as b, self.hub.subscribe(
+            2
+        ) as c:
+            self.assertTrue(self.redis.subscribed.wait(5))
+            self.assertEqual(3, self.hub.get_subscriber_count())
+            publish_lecture_event(1, LectureEventKind.Message)
+            publish_lecture_event(1, LectureEventKind.Question)
+            publish_lecture_event(1, LectureEventKind.Message)
+            self.assertIn("message", a.wait(5))
+            received = set()
+            while len(received) < 2:
+                received |= b.wait(5)
+            self.assertEqual({"message", "question"}, received)
+            self.assertEqual(set(), c.wait(0.1))
+        self.assertEqual(0, self.hub.get_subscriber_count())
+
+    def test_wait_timeout(self):
+        with self.hub.subscribe(1) as a:
+            self.assertEqual(set(), a.wait(0.05))
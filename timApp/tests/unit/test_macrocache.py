@@ -0,0 +1,94 @@
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import Thread
+from unittest import TestCase
+
+from timApp.document.macrocache import (
+    AUTO_MACROS,
+    HEADINGS,
+    MacroCacheView,
+    SqliteMacroCacheBackend,
+)
+
+
+class SqliteMacroCacheTest(TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.backend = SqliteMacroCacheBackend(
+            str(Path(self.tmp.name) / "c.sqlite"), max_age=3600
+        )
+
+    def tearDown(self):
+        self.backend.get_conn().close()
+        self.tmp.cleanup()
+
+    def test_get_set_clear(self):
+        b = self.backend
+        self.assertEqual({}, b.get_many(1, AUTO_MACROS, ["a"]))
+        b.set_many(1, AUTO_MACROS, {"a": {"h": {1: 2}}, "b": {"h": {1: 3}}})
+        b.set_many(1, HEADINGS, {"a": ["x"]})
+        b.set_many(2, AUTO_MACROS, {"a": {"h": {1: 9}}})
+        self.assertEqual(
+            {"a": {"h": {1: 2}}, "b": {"h": {1: 3}}},
+            b.get_many(1, AUTO_MACROS, ["a", "b", "c"]),
+        )
+        self.assertEqual({"a": ["x"]}, b.get_many(1, HEADINGS, ["a", "b"]))
+        keys = [str(i) for i in range(2000)]
+        b.set_many(3, HEADINGS, {k: [k] for k in keys})
+        self.assertEqual(2000, len(b.get_many(3, HEADINGS, keys)))
+
+        b.clear(1)
+        self.assertEqual({}, b.get_many(1, AUTO_MACROS, ["a", "b"]))
+        self.assertEqual({"a": {"h": {1: 9}}}, b.get_many(2, AUTO_MACROS, ["a"]))
+        b.clear(None)
+        self.assertEqual({}, b.get_many(2, AUTO_MACROS, ["a"]))
+
+    def test_view(self):
+        v = MacroCacheView(self.backend, 1, AUTO_MACROS)
+        v.prefetch(["a", "b"])
+        self.assertIsNone(v.get("a"))
+        v["a"] = {"h": {}}
+        self.assertEqual({}, self.backend.get_many(1, AUTO_MACROS, ["a"]))
+        v.flush()
+        self.assertEqual(
+            {"h": {}}, MacroCacheView(self.backend, 1, AUTO_MACROS).get("a")
+        )
+        self.assertEqual("d", v.get("b", "d"))
+
+    def test_concurrent_writes(self):
+        errors = []
+
+        def write(doc_id: int):
+            try:
+                for i in range(20):
+                    self.backend.set_many(
+                        doc_id, AUTO_MACROS, {str(j): {"h": {1: j}} for j in range(50)}
+                    )
+            except Exception as e:
+                errors.append(e)
+
+        threads = [Thread(target=write, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual([], errors)
+        self.assertEqual(
+            50, len(self.backend.get_many(7, AUTO_MACROS, [str(j) for j in range(50)]))
+        )
+
+    def test_prune(self):
+        b = self.backend
+        b.set_many(1, AUTO_MACROS, {"old": {}})
+        b.prune(time.time() - 10)
+        self.assertEqual({"old": {}}, b.get_many(1, AUTO_MACROS, ["old"]))
+        b.prune(time.time() + 10)
+        self.assertEqual({}, b.get_many(1, AUTO_MACROS, ["old"]))
+
+        # Writing prunes the entries that are older than the maximum age.
+        b.set_many(1, AUTO_MACROS, {"old": {}})
+        b.get_conn().execute("UPDATE macro_cache SET updated = updated - 7200")
+        b.last_prune = 0
+        b.set_many(1, AUTO_MACROS, {"new": {}})
+        self.assertEqual({"new": {}}, b.get_many(1, AUTO_MACROS, ["old", "new"]))
@@ -0,0 +1,54 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from timApp.document.parcache import ParDataCache, estimate_size
+from timApp.util.timtiming import get_stats
+
+
+def par_data(par_id: str, md: str) -> dict:
+    return {"attrs": {"a": "1"}, "id": par_id, "md": md, "t": "x", "h": {"k": "<p/>"}}
+
+
+class ParDataCacheTest(TestCase):
+    def test_get_put(self):
+        with patch(
+            "timApp.document.parcache.get_cache_config", return_value=(10**6, False)
+        ):
+            c = ParDataCache()
+            misses = get_stats().get("par_cache.miss", 0)
+            self.assertIsNone(c.get(1, "a", "x"))
+            self.assertEqual(misses + 1, get_stats()["par_cache.miss"])
+            c.put(1, "a", "x", par_data("a", "text"))
+            d = c.get(1, "a", "x")
+            self.assertEqual("text", d["md"])
+
+            # Mutating the returned data must not affect the cache.
+            d["attrs"]["a"] = "2"
+            d["h"]["k2"] = "<div/>"
+            self.assertEqual(par_data("a", "text"), c.get(1, "a", "x"))
+            self.assertIsNone(c.get(2, "a", "x"))
+
+    def test_size_limit(self):
+        entry_size = estimate_size(par_data("a", "text"))
+        with patch(
+            "timApp.document.parcache.get_cache_config",
+            return_value=(entry_size * 3, False),
+        ):
+            c = ParDataCache()
+            for par_id in "abcd":
+                c.put(1, par_id, "x", par_data(par_id, "text"))
+            self.assertLessEqual(c.size, entry_size * 3)
+            self.assertIsNone(c.get(1, "a", "x"))
+            self.assertIsNotNone(c.get(1, "b", "x"))
+            c.put(1, "e", "x", par_data("e", "text"))
+            # b was used recently, so c was evicted instead.
+            self.assertIsNotNone(c.get(1, "b", "x"))
+            self.assertIsNone(c.get(1, "c", "x"))
+
+    def test_disabled(self):
+        with patch(
+            "timApp.document.parcache.get_cache_config", return_value=(0, False)
+        ):
+            c = ParDataCache()
+            c.put(1, "a", "x", par_data("a", "text"))
+            self.assertIsNone(c.get(1, "a", "x"))
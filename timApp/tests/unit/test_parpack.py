@@ -0,0 +1,144 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+
+import timApp.document.parpack
+from timApp.document.parpack import (
+    ParPack,
+    build_pack,
+    get_pack,
+    init_pack,
+    remove_pack,
+    CURRENT_KEY,
+)
+
+
+def par_dict(par_id: str, t: str, md: str) -> dict:
+    return {"attrs": {}, "id": par_id, "md": md, "t": t}
+
+
+class ParPackTest(TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.patcher = patch(
+            "timApp.timdb.dbaccess.get_files_path", return_value=self.root
+        )
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        remove_pack(1)
+        self.tmp.cleanup()
+
+    def test_append_and_read(self):
+        self.assertIsNone(get_pack(1))
+        init_pack(1)
+        pack = get_pack(1)
+        pack.append(par_dict("a", "h1", "first"), set_current=True)
+        pack.append(par_dict("b", "h2", "second"))
+        pack.refresh()
+        self.assertEqual("first", pack.read("a", "h1")["md"])
+        self.assertEqual("h1", pack.get_current_hash("a"))
+        self.assertIsNone(pack.get_current_hash("b"))
+        self.assertIsNone(pack.read("c", "h3"))
+
+        # A later record overrides the earlier one.
+        pack.append(par_dict("a", "h1", "first (rewritten)"))
+        self.assertEqual("first (rewritten)", get_pack(1).read("a", "h1")["md"])
+
+        self.assertTrue(pack.set_current("b", "h2"))
+        self.assertFalse(pack.set_current("b", "nonexistent"))
+        self.assertEqual("second", get_pack(1).read("b", CURRENT_KEY)["md"])
+
+    def test_other_reader_sees_appends(self):
+        init_pack(1)
+        writer = ParPack(self.root / "pars" / "1" / ".pack")
+        reader = get_pack(1)
+        writer.append(par_dict("a", "h1", "x"))
+        self.assertIsNone(reader.read("a", "h1"))
+        reader.refresh()
+        self.assertEqual("x", reader.read("a", "h1")["md"])
+
+    def test_build_from_files(self):
+        par_dir = self.root / "pars" / "1" / "a"
+        par_dir.mkdir(parents=True)
+        for t, md in (("h1", "old"), ("h2", "new")):
+            (par_dir / t).write_text(json.dumps(par_dict("a", t, md)))
+        os.symlink("h2", par_dir / CURRENT_KEY)
+
+        self.assertEqual(2, build_pack(1))
+        pack = get_pack(1)
+        self.assertEqual("old", pack.read("a", "h1")["md"])
+        self.assertEqual("new", pack.read("a", CURRENT_KEY)["md"])
+
+        # Rebuilding replaces the pack and readers notice it.
+        (par_dir / "h1").write_text(json.dumps(par_dict("a", "h1", "changed")))
+        self.assertEqual(2, build_pack(1))
+        self.assertEqual("changed", get_pack(1).read("a", "h1")["md"])
+
+        remove_pack(1)
+        self.assertIsNone(get_pack(1))
+
+    def test_missing_pack_is_cached(self):
+        self.assertIsNone(get_pack(1))
+        init_pack(2)
+        with patch.object(ParPack, "refresh") as refresh:
+            self.assertIsNone(get_pack(1))
+            refresh.assert_not_called()
+        # Another process builds the pack; writers notice it immediately.
+        ParPack(self.root / "pars" / "1" / ".pack").path.mkdir(parents=True)
+        (self.root / "pars" / "1" / ".pack" / "index").touch()
+        (self.root / "pars" / "1" / ".pack" / "segment").touch()
+        self.assertIsNone(get_pack(1))
+        self.assertIsNotNone(get_pack(1, for_write=True))
+        self.assertIsNotNone(get_pack(1))
+        remove_pack(2)
+
+    def test_open_packs_are_bounded(self):
+        with patch.object(timApp.document.parpack, "MAX_OPEN_PACKS", 2):
+            for doc_id in (1, 2, 3):
+                init_pack(doc_id)
+                self.assertIsNotNone(get_pack(doc_id))
+            self.assertEqual([2, 3], list(timApp.document.parpack._packs))
+            for doc_id in (2, 3):
+                remove_pack(doc_id)
+
+    def test_write_during_build(self):
+        par_dir = self.root / "pars" / "1" / "a"
+        par_dir.mkdir(parents=True)
+        (par_dir / "h1").write_text(json.dumps(par_dict("a", "h1", "old")))
+        os.symlink("h1", par_dir / CURRENT_KEY)
+        build_files = timApp.document.parpack._build_pack_files
+        writer = None
+
+        def write_paragraph():
+            # Like DocParagraph: write the file and the link, then update the pack if there is one.
+            d = par_dict("a", "h2", "new")
+            (par_dir / "h2").write_text(json.dumps(d))
+            os.unlink(par_dir / CURRENT_KEY)
+            os.symlink("h2", par_dir / CURRENT_KEY)
+            pack = get_pack(1, for_write=True)
+            self.assertIsNotNone(pack)
+            pack.append(d, set_current=True)
+
+        def build_and_write(*args):
+            nonlocal writer
+            count = build_files(*args)
+            # The paragraph is written after the files have been read but before the pack is in place.
+            writer = threading.Thread(target=write_paragraph)
+            writer.start()
+            time.sleep(0.2)
+            return count
+
+        with patch.object(
+            timApp.document.parpack, "_build_pack_files", build_and_write
+        ):
+            self.assertEqual(1, build_pack(1))
+        writer.join()
+        self.assertEqual("new", get_pack(1).read("a", CURRENT_KEY)["md"])
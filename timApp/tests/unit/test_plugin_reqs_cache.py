@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import patch
+
+from flask import Flask
+
+from timApp.plugin import containerLink
+from timApp.plugin.containerLink import flush_plugin_reqs_cache, get_plugin_reqs
+from timApp.plugin.pluginexception import PluginException
+from timApp.tests.unit.fakeredis import use_fake_redis
+
+
+class PluginReqsCacheTest(TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["PLUGIN_REQS_CACHE_TTL"] = 3600
+        self.app.config["PLUGIN_REQS_LOCAL_TTL"] = 60
+        self.redis = use_fake_redis(self)
+        self.calls = 0
+        self.response = '{"js": ["a.js"]}'
+        self.patchers = [
+            patch.object(containerLink, "call_plugin_generic", self.fake_call),
+        ]
+        for p in self.patchers:
+            p.start()
+        containerLink._local_reqs.clear()
+
+    def tearDown(self):
+        for p in self.patchers:
+            p.stop()
+        containerLink._local_reqs.clear()
+
+    def fake_call(self, plugin, method, route):
+        self.calls += 1
+        if self.response is None:
+            raise PluginException("down")
+        return SimpleNamespace(text=self.response)
+
+    def test_cache(self):
+        with self.app.app_context():
+            reqs = get_plugin_reqs("p")
+            self.assertEqual({"js": ["a.js"]}, reqs)
+            reqs["multihtml"] = True
+            self.assertEqual({"js": ["a.js"]}, get_plugin_reqs("p"))
+            self.assertEqual(1, self.calls)
+
+            # Another worker gets the reqs from Redis.
+            containerLink._local_reqs.clear()
+            self.assertEqual({"js": ["a.js"]}, get_plugin_reqs("p"))
+            self.assertEqual(1, self.calls)
+
+            self.response = '{"js": ["b.js"]}'
+            flush_plugin_reqs_cache()
+            self.assertEqual({"js": ["b.js"]}, get_plugin_reqs("p"))
+            self.assertEqual(2, self.calls)
+
+    def test_errors(self):
+        with self.app.app_context():
+            self.response = "not json"
+            with self.assertRaisesRegex(PluginException, "Failed to parse JSON"):
+                get_plugin_reqs("p")
+            self.response = None
+            with self.assertRaises(PluginException):
+                get_plugin_reqs("p")
+
+            # Expired reqs are used if the plugin is down.
+            self.response = "{}"
+            get_plugin_reqs("p")
+            self.redis.data.clear()
+            containerLink._local_reqs["p"] = 0, {"stale": True}
+            self.response = None
+            self.assertEqual({"stale": True}, get_plugin_reqs("p"))
+
+    def test_redis_down(self):
+        with self.app.app_context():
+            self.redis.down = True
+            self.assertEqual({"js": ["a.js"]}, get_plugin_reqs("p"))
+            self.assertEqual(1, self.calls)
+            # The reqs are still cached locally.
+            self.assertEqual({"js": ["a.js"]}, get_plugin_reqs("p"))
+            self.assertEqual(1, self.calls)
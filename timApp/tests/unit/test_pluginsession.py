@@ -0,0 +1,61 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from unittest import TestCase
+from unittest.mock import patch
+
+from timApp.plugin.pluginsession import get_pool_stats, plugin_request
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        # Tells whether a cookie was sent and tries to set one.
+        body = (self.headers["Cookie"] or "").encode()
+        self.send_response(200)
+        self.send_header("Set-Cookie", "session=user1; Path=/")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class PluginSessionTest(TestCase):
+    def test_connection_reuse(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+        Thread(target=server.serve_forever, daemon=True).start()
+        host = f"http://127.0.0.1:{server.server_port}"
+        try:
+            with patch("timApp.plugin.pluginsession.get_pool_size", return_value=2):
+                for i in range(3):
+                    r = plugin_request("post", f"{host}/answer/", data=str(i))
+                    self.assertEqual(str(i), r.text)
+            self.assertEqual({"requests": 3, "connections": 1}, get_pool_stats()[host])
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_cookies_not_stored(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+        Thread(target=server.serve_forever, daemon=True).start()
+        host = f"http://127.0.0.1:{server.server_port}"
+        try:
+            r = plugin_request("get", f"{host}/reqs")
+            self.assertEqual("user1", r.cookies.get("session"))
+            self.assertEqual("", plugin_request("get", f"{host}/reqs").text)
+            self.assertEqual(
+                "x=1", plugin_request("get", f"{host}/reqs", cookies={"x": "1"}).text
+            )
+            self.assertEqual("", plugin_request("get", f"{host}/reqs").text)
+        finally:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,98 @@
+import json
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+from timApp.printing.fragmentcache import (
+    add_heading_identifiers,
+    make_identifier,
+    read_markdown_fragments,
+)
+
+
+def header(text: str, ident: str = "") -> dict:
+    return {
+        "t": "Header",
+        "c": [1, [ident, [], []], [{"t": "Str", "c": w} for w in text.split()]],
+    }
+
+
+def para(text: str) -> dict:
+    return {"t": "Para", "c": [{"t": "Str", "c": text}]}
+
+
+def fake_parse(fragments: list[str]):
+    return [1, 22], [[para(f)] for f in fragments]
+
+
+class HeadingIdentifierTest(TestCase):
+    def test_make_identifier(self):
+        self.assertEqual("hello-world", make_identifier("Hello, World!"))
+        self.assertEqual("introduction", make_identifier("1. Introduction"))
+        self.assertEqual("äö-v1.2", make_identifier("Äö v1.2"))
+        self.assertEqual("", make_identifier("123"))
+
+    def test_unique_identifiers(self):
+        blocks = [
+            header("Intro"),
+            {"t": "Div", "c": [["", [], []], [header("Intro")]]},
+            header("Other", "intro-2"),
+            header("Intro"),
+            header("123"),
+        ]
+        add_heading_identifiers(blocks)
+        self.assertEqual(
+            ["intro", "intro-1", "intro-2", "intro-3", "section"],
+            [
+                blocks[0]["c"][1][0],
+                blocks[1]["c"][1][0]["c"][1][0],
+                blocks[2]["c"][1][0],
+                blocks[3]["c"][1][0],
+                blocks[4]["c"][1][0],
+            ],
+        )
+
+
+class FragmentCacheTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.patchers = [
+            patch(
+                "timApp.printing.fragmentcache.FRAGMENT_CACHE_FOLDER",
+                Path(self.tmp.name),
+            ),
+            patch(
+                "timApp.printing.fragmentcache.get_pandoc_version",
+                return_value="pandoc 2.x",
+            ),
+        ]
+        for p in self.patchers:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patchers:
+            p.stop()
+        self.tmp.cleanup()
+
+    def test_only_changed_fragments_are_parsed(self):
+        with patch(
+            "timApp.printing.fragmentcache.parse_fragments", side_effect=fake_parse
+        ) as m:
+            doc = json.loads(read_markdown_fragments(1, ["a", "b", "a"]))
+            m.assert_called_once_with(["a", "b"])
+            self.assertEqual([para("a"), para("b"), para("a")], doc["blocks"])
+            self.assertEqual([1, 22], doc["pandoc-api-version"])
+
+            m.reset_mock()
+            doc = json.loads(read_markdown_fragments(1, ["a", "c", "b"]))
+            m.assert_called_once_with(["c"])
+            self.assertEqual([para("a"), para("c"), para("b")], doc["blocks"])
+
+            m.reset_mock()
+            read_markdown_fragments(1, ["b", "a"])
+            m.assert_not_called()
+
+    def test_parse_failure(self):
+        with patch("timApp.printing.fragmentcache.parse_fragments", return_value=None):
+            self.assertIsNone(read_markdown_fragments(1, ["```", "a"]))
@@ -0,0 +1,68 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from timApp.printing.printjobs import (
+    PrintJobStatus,
+    acquire_print_slot,
+    create_print_job,
+    finish_print_job,
+    get_print_job,
+    get_print_job_key,
+    release_print_slot,
+    update_print_job,
+)
+from timApp.tests.unit.fakeredis import use_fake_redis
+
+
+class PrintJobsTest(TestCase):
+    def setUp(self):
+        use_fake_redis(self)
+        self.patcher = patch(
+            "timApp.printing.printjobs.get_print_job_config", return_value=(2, 900)
+        )
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_identical_prints_share_job(self):
+        key = get_print_job_key(1, 2, "pdf", "abc")
+        job_id, is_new = create_print_job(key, {"doc_id": 1})
+        self.assertTrue(is_new)
+        self.assertEqual((job_id, False), create_print_job(key, {"doc_id": 1}))
+        other_id, is_new = create_print_job(
+            get_print_job_key(1, 2, "pdf", "def"), {"doc_id": 1}
+        )
+        self.assertTrue(is_new)
+        self.assertNotEqual(job_id, other_id)
+
+        update_print_job(job_id, PrintJobStatus.Running, progress="rendering")
+        self.assertEqual((job_id, False), create_print_job(key, {"doc_id": 1}))
+        job = get_print_job(job_id)
+        self.assertEqual("running", job["status"])
+        self.assertEqual("rendering", job["progress"])
+        self.assertEqual(1, job["doc_id"])
+
+    def test_finished_job_is_not_reused(self):
+        key = get_print_job_key(1, None, "pdf", "abc")
+        job_id, _ = create_print_job(key, {})
+        finish_print_job(job_id, PrintJobStatus.Done, url="/print/x")
+        job = get_print_job(job_id)
+        self.assertEqual("done", job["status"])
+        self.assertEqual("/print/x", job["url"])
+        self.assertIsNone(job["progress"])
+        new_id, is_new = create_print_job(key, {})
+        self.assertTrue(is_new)
+        self.assertNotEqual(job_id, new_id)
+
+    def test_missing_job(self):
+        self.assertIsNone(get_print_job("nonexistent"))
+
+    def test_slots(self):
+        slot1 = acquire_print_slot("a")
+        slot2 = acquire_print_slot("b")
+        self.assertIsNotNone(slot1)
+        self.assertIsNotNone(slot2)
+        self.assertIsNone(acquire_print_slot("c"))
+        release_print_slot(slot1)
+        self.assertEqual(slot1, acquire_print_slot("c"))
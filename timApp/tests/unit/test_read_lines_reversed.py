@@ -0,0 +1,24 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from timApp.util.utils import read_lines_reversed
+
+
+class TestReadLinesReversed(TestCase):
+    def test_read_lines_reversed(self):
+        with TemporaryDirectory() as d:
+            p = Path(d) / "f"
+            lines = [f"line {i} " + "x" * (i % 7) for i in range(100)]
+            p.write_text("\n".join(lines) + "\n")
+            for block_size in (1, 3, 16, 8192):
+                self.assertEqual(
+                    list(reversed(lines)),
+                    list(read_lines_reversed(p, block_size=block_size)),
+                )
+            p.write_text("no newline at end\nlast")
+            self.assertEqual(
+                ["last", "no newline at end"], list(read_lines_reversed(p))
+            )
+            p.write_text("")
+            self.assertEqual([], list(read_lines_reversed(p)))
@@ -0,0 +1,45 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from timApp.document.refcache import RefCache
+from timApp.util.timtiming import get_stats
+
+
+class FakePar:
+    def __init__(self, par_id: str, t: str):
+        self.par_id = par_id
+        self.t = t
+
+    def get_id(self):
+        return self.par_id
+
+    def get_hash(self):
+        return self.t
+
+
+def key(n: int):
+    return "ref", "h", 1, (n, 0), ""
+
+
+class RefCacheTest(TestCase):
+    def test_get_put(self):
+        with patch("timApp.document.refcache.get_max_entries", return_value=2):
+            c = RefCache()
+            misses = get_stats().get("ref_cache.miss", 0)
+            self.assertIsNone(c.get(key(1)))
+            self.assertEqual(misses + 1, get_stats()["ref_cache.miss"])
+            c.put(key(1), [FakePar("a", "x"), FakePar("b", "y")])
+            self.assertEqual((("a", "x"), ("b", "y")), c.get(key(1)))
+
+            c.put(key(2), [])
+            c.get(key(1))
+            c.put(key(3), [FakePar("c", "z")])
+            self.assertIsNone(c.get(key(2)))
+            self.assertEqual((("a", "x"), ("b", "y")), c.get(key(1)))
+            self.assertEqual((("c", "z"),), c.get(key(3)))
+
+    def test_disabled(self):
+        with patch("timApp.document.refcache.get_max_entries", return_value=0):
+            c = RefCache()
+            c.put(key(1), [FakePar("a", "x")])
+            self.assertIsNone(c.get(key(1)))
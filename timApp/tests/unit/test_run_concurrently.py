@@ -0,0 +1,36 @@
+import time
+from unittest import TestCase
+
+from flask import Flask, current_app
+
+from timApp.plugin.containerLink import run_concurrently
+from timApp.plugin.pluginexception import PluginException
+
+
+class RunConcurrentlyTest(TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["PLUGIN_MAX_CONCURRENT_CALLS"] = 4
+
+    def test_order_and_errors(self):
+        def slow(i: int):
+            time.sleep(0.2 - i * 0.05)
+            if i == 2:
+                raise PluginException("fail")
+            return i, current_app.name
+
+        with self.app.app_context():
+            start = time.perf_counter()
+            results = run_concurrently([lambda i=i: slow(i) for i in range(4)])
+            elapsed = time.perf_counter() - start
+        self.assertEqual((0, self.app.name), results[0])
+        self.assertEqual((1, self.app.name), results[1])
+        self.assertIsInstance(results[2], PluginException)
+        self.assertEqual((3, self.app.name), results[3])
+        self.assertLess(elapsed, 0.4)
+
+    def test_sequential(self):
+        self.app.config["PLUGIN_MAX_CONCURRENT_CALLS"] = 1
+        with self.app.app_context():
+            self.assertEqual([1, 2], run_concurrently([lambda: 1, lambda: 2]))
+            self.assertEqual([], run_concurrently([]))
@@ -0,0 +1,178 @@
+import re
+from contextlib import closing
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+
+from timApp.tests.unit.fakeredis import use_fake_redis
+from timApp.util.flask.searchindex import (
+    IndexedPar,
+    SearchIndex,
+    enqueue_index_updates,
+    get_live_index,
+    new_index_path,
+    pop_index_updates,
+    switch_live_index,
+)
+
+
+class SearchIndexTest(TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.index = SearchIndex(Path(self.tmp.name) / "index.sqlite")
+        with closing(self.index.connect(readonly=False)) as conn:
+            self.index.replace_doc(
+                conn,
+                1,
+                10,
+                "Cats",
+                "users/a/cats",
+                None,
+                [
+                    IndexedPar("p1", {}, "House cats like to hunt too."),
+                    IndexedPar("p2", {"plugin": "csPlugin"}, "Nothing here."),
+                    IndexedPar("p3", {}, "Ä cat in Äänekoski."),
+                ],
+            )
+            self.index.replace_doc(
+                conn,
+                2,
+                20,
+                "Dogs",
+                "users/a/dogs",
+                "pets animals",
+                [IndexedPar("p4", {}, "Dogs chase CATS.")],
+            )
+            conn.commit()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def find(self, query: str, regex=False, flags=re.IGNORECASE):
+        term = query if regex else re.escape(query)
+        return self.index.find_content(query, regex, re.compile(term, flags))
+
+    def test_find_content(self):
+        items = self.find("cat")
+        # The document with higher relevance comes first.
+        self.assertEqual([2, 1], list(items.keys()))
+        self.assertEqual(["p1", "p3"], [p["id"] for p in items[1]["pars"]])
+        self.assertEqual(10, items[1]["d_r"])
+        self.assertEqual("Dogs chase CATS.", items[2]["pars"][0]["md"])
+
+        self.assertEqual(["p3"], [p["id"] for p in self.find("ÄÄNEKOSKI")[1]["pars"]])
+        self.assertEqual(
+            {"plugin": "csPlugin"}, self.find("csplugin")[1]["pars"][0]["attrs"]
+        )
+        self.assertEqual({}, self.find("mouse"))
+
+        # Short and regex queries are matched without the postings.
+        self.assertEqual([1], list(self.find("Ä", flags=0).keys()))
+        self.assertEqual([2], list(self.find(r"D\w+s", regex=True, flags=0).keys()))
+
+    def test_find_metadata(self):
+        title = self.index.find_metadata("title", "dog", False, re.compile("dog", re.I))
+        self.assertEqual({2: {"doc_id": 2, "d_r": 20, "doc_title": "Dogs"}}, title)
+        paths = self.index.find_metadata(
+            "path", "users/a", False, re.compile("users/a")
+        )
+        self.assertEqual([2, 1], list(paths.keys()))
+        tags = self.index.find_metadata("tags", "pe", False, re.compile("pe"))
+        self.assertEqual(
+            {2: {"doc_id": 2, "d_r": 20, "doc_tags": "pets animals"}}, tags
+        )
+
+    def test_replace_and_delete(self):
+        with closing(self.index.connect(readonly=False)) as conn:
+            self.index.replace_doc(
+                conn,
+                1,
+                10,
+                "Cats",
+                "users/a/cats",
+                None,
+                [IndexedPar("p1", {}, "Mice")],
+            )
+            self.index.delete_doc(conn, 2)
+            conn.commit()
+        self.assertEqual({}, self.find("cat"))
+        self.assertEqual([1], list(self.find("mice").keys()))
+        self.assertEqual(
+            {}, self.index.find_metadata("title", "dog", False, re.compile("dog"))
+        )
+
+
+class LiveIndexTest(TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.folder = Path(self.tmp.name)
+        self.pointer = self.folder / "search_index.current"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, title: str) -> SearchIndex:
+        index = SearchIndex(new_index_path(self.folder))
+        with closing(index.connect(readonly=False)) as conn:
+            index.replace_doc(conn, 1, 0, title, "users/a/doc", None, [])
+            conn.commit()
+        return index
+
+    def titles(self, index: SearchIndex) -> list[str]:
+        items = index.find_metadata("title", "doc", False, re.compile("doc", re.I))
+        return [item["doc_title"] for item in items.values()]
+
+    def test_switch(self):
+        self.assertIsNone(get_live_index(self.pointer))
+        first = self.build("First doc")
+        switch_live_index(first.path, self.pointer)
+        self.assertEqual(first.path, get_live_index(self.pointer).path)
+
+        with closing(first.connect()) as reader:
+            second = self.build("Second doc")
+            switch_live_index(second.path, self.pointer)
+            # A search that is running keeps reading the old index.
+            self.assertEqual(
+                [("First doc",)], reader.execute("SELECT title FROM docs").fetchall()
+            )
+        live = get_live_index(self.pointer)
+        self.assertEqual(second.path, live.path)
+        self.assertEqual(["Second doc"], self.titles(live))
+
+        third = self.build("Third doc")
+        switch_live_index(third.path, self.pointer)
+        # The previous index is kept until the next switch.
+        self.assertFalse(first.exists())
+        self.assertTrue(second.exists())
+        self.assertEqual(["Third doc"], self.titles(get_live_index(self.pointer)))
+
+
+class UpdateQueueTest(TestCase):
+    def setUp(self):
+        use_fake_redis(self)
+        self.patcher = patch(
+            "timApp.util.flask.searchindex.is_index_enabled", return_value=True
+        )
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_queue(self):
+        enqueue_index_updates([3, 1])
+        enqueue_index_updates([1, 2])
+        enqueue_index_updates([])
+        self.assertEqual([1, 2, 3], sorted(pop_index_updates(10)))
+        self.assertEqual([], pop_index_updates(10))
+
+        enqueue_index_updates(range(5))
+        self.assertEqual(3, len(pop_index_updates(3)))
+        self.assertEqual(2, len(pop_index_updates(3)))
+
+    def test_disabled(self):
+        with patch(
+            "timApp.util.flask.searchindex.is_index_enabled", return_value=False
+        ):
+            enqueue_index_updates([1])
+        self.assertEqual([], pop_index_updates(10))
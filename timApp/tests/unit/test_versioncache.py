@@ -0,0 +1,35 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from timApp.document.versioncache import get_latest_version, set_latest_version
+from timApp.tests.unit.fakeredis import use_fake_redis
+
+
+class VersionCacheTest(TestCase):
+    def setUp(self):
+        self.redis = use_fake_redis(self)
+
+    def test_set_latest_version(self):
+        set_latest_version(1, (1, 0))
+        set_latest_version(1, (0, 5), only_if_missing=True)
+        self.assertEqual((1, 0), get_latest_version(1))
+        set_latest_version(1, (2, 0))
+        self.assertEqual((2, 0), get_latest_version(1))
+
+    def test_failed_write_removes_version(self):
+        set_latest_version(1, (1, 0))
+        self.redis.failing.add("set")
+        with patch("timApp.document.versioncache.log_warning"):
+            set_latest_version(1, (1, 1))
+        self.assertIsNone(get_latest_version(1))
+
+        self.redis.failing.clear()
+        set_latest_version(1, (1, 0))
+        self.redis.failing.add("set")
+        with patch("timApp.document.versioncache.log_warning"):
+            # A reader keeps the value of the writer.
+            set_latest_version(1, (1, 1), only_if_missing=True)
+            self.assertEqual((1, 0), get_latest_version(1))
+            # Failures are not raised to the writer.
+            self.redis.failing.add("delete")
+            set_latest_version(1, (1, 1))
@@ -0,0 +1,74 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+
+from timApp.document.versionfile import (
+    VersionDelta,
+    read_version_file,
+    write_version_file,
+    DELTA_HEADER,
+)
+
+
+class VersionFileTest(TestCase):
+    def write_versions(self, root: Path, interval: int) -> list[list]:
+        entries = []
+        expected = []
+        depth = 0
+        with patch(
+            "timApp.document.versionfile.get_snapshot_interval", return_value=interval
+        ):
+            for i in range(1, 8):
+                delta = VersionDelta()
+                new_entry = (f"par{i:09d}", f"hash{i}")
+                if i % 3 == 0:
+                    delta.replace(0, new_entry)
+                    entries[0] = new_entry
+                elif i == 5:
+                    delta.delete(1)
+                    del entries[1]
+                else:
+                    delta.insert(0, new_entry)
+                    entries.insert(0, new_entry)
+                path = root / str(i) / "0"
+                path.parent.mkdir()
+                write_version_file(
+                    path,
+                    entries,
+                    base_ver=(i - 1, 0) if i > 1 else None,
+                    base_depth=depth,
+                    delta=delta,
+                )
+                _, depth = read_version_file(path)
+                expected.append(list(entries))
+        return expected
+
+    def test_full_snapshots(self):
+        with TemporaryDirectory() as d:
+            root = Path(d)
+            expected = self.write_versions(root, 0)
+            for i, entries in enumerate(expected, start=1):
+                path = root / str(i) / "0"
+                self.assertFalse(path.read_text().startswith(DELTA_HEADER))
+                self.assertEqual((entries, 0), read_version_file(path))
+
+    def test_deltas(self):
+        with TemporaryDirectory() as d:
+            root = Path(d)
+            expected = self.write_versions(root, 3)
+            depths = []
+            for i, entries in enumerate(expected, start=1):
+                read_entries, depth = read_version_file(root / str(i) / "0")
+                self.assertEqual(entries, read_entries)
+                depths.append(depth)
+            self.assertEqual([0, 1, 2, 0, 1, 2, 0], depths)
+
+    def test_legacy_lines(self):
+        with TemporaryDirectory() as d:
+            path = Path(d) / "0"
+            path.write_text("abcdefghijkl\nabcdefghijkm/hash\n\n")
+            self.assertEqual(
+                ([("abcdefghijkl", None), ("abcdefghijkm", "hash")], 0),
+                read_version_file(path),
+            )
@@ -81,6 +81,7 @@ from timApp.user.contacts import contacts
 from timApp.user.groups import groups
 from timApp.user.settings.settings import settings_page
 from timApp.user.settings.styles import styles
+from timApp.user.user import clear_request_access_memo
 from timApp.user.verification.routes import verify
 from timApp.util.error_handlers import register_errorhandlers
 from timApp.util.flask.cache import cache
@@ -309,6 +310,8 @@ LOG_BEFORE_REQUESTS = app.config["LOG_BEFORE_REQUESTS"]
 def preprocess_request():
     session.permanent = True
     g.request_start_time = time.monotonic()
+    # The test client may reuse the application context (and so g) between requests.
+    clear_request_access_memo()
     if LOG_BEFORE_REQUESTS:
         log_info(get_request_message(include_time=False, is_before=True))
     if request.method == "GET":
@@ -17,7 +17,12 @@ from sqlalchemy.sql.ddl import CreateTable
 from werkzeug.middleware.proxy_fix import ProxyFix
 
 from timApp.answer.answer import Answer, AnswerSaver
-from timApp.answer.answer_models import AnswerTag, AnswerUpload, UserAnswer
+from timApp.answer.answer_models import (
+    AnswerTag,
+    AnswerUpload,
+    LatestAnswer,
+    UserAnswer,
+)
 from timApp.auth.auth_models import AccessTypeModel, BlockAccess
 from timApp.auth.oauth2.models import OAuth2Token, OAuth2AuthorizationCode
 from timApp.auth.session.model import UserSession
@@ -174,6 +179,7 @@ all_models = (
     InternalMessageDisplay,
     LabelInVelp,
     Language,
+    LatestAnswer,
     Lecture,
     LectureAnswer,
     LectureUsers,
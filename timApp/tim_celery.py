@@ -24,16 +24,26 @@ from timApp.plugin.containerLink import call_plugin_generic
 from timApp.plugin.exportdata import WithOutData, WithOutDataSchema
 from timApp.plugin.plugin import Plugin
 from timApp.plugin.pluginexception import PluginException
+from timApp.printing.print import do_print_job
+from timApp.printing.printjobs import acquire_print_slot, release_print_slot
 from timApp.tim_app import app
 from timApp.timdb.sqa import db
 from timApp.user.user import User
 from timApp.user.verification.verification import Verification
-from timApp.util.flask.search import create_search_files
+from timApp.util.flask.search import (
+    create_search_files,
+    create_search_index,
+    update_search_index as do_update_search_index,
+)
+from timApp.util.flask.searchindex import get_live_index
 from timApp.util.utils import get_current_time, collect_errors_from_hosts
 from tim_common.vendor.requests_futures import FuturesSession
 
 logger: Logger = get_task_logger(__name__)
 
+# How long a print job waits before trying again when the maximum number of print jobs is running.
+PRINT_SLOT_RETRY_SECS = 5
+
 
 def make_celery(appl):
     """
@@ -74,9 +84,37 @@ celery = make_celery(app)
 @celery.task(ignore_result=True)
 def update_search_files():
     """
-    Calls function to create title and content search files. Meant to be scheduled.
+    Calls function to create the title and content search files. Meant to be scheduled.
+    The search index is updated incrementally by update_search_index, so it is only built here if it is missing.
+    """
+    if app.config["SEARCH_BACKEND"] == "index":
+        if get_live_index() is None:
+            create_search_index()
+    else:
+        create_search_files()
+
+
+@celery.task(ignore_result=True)
+def update_search_index():
+    """
+    Reindexes the documents that have changed since the last run. Meant to be scheduled.
+    """
+    if app.config["SEARCH_BACKEND"] == "index":
+        do_update_search_index()
+
+
+@celery.task(bind=True, ignore_result=True, max_retries=None)
+def run_print_job(self, job_id: str, params: dict[str, Any]):
+    """
+    Prints a document. If the maximum number of print jobs is already running, the job is retried later.
     """
-    create_search_files()
+    slot = acquire_print_slot(job_id)
+    if slot is None:
+        raise self.retry(countdown=PRINT_SLOT_RETRY_SECS)
+    try:
+        do_print_job(job_id, params)
+    finally:
+        release_print_slot(slot)
 
 
 @celery.task(ignore_result=True)
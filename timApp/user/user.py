@@ -1,13 +1,14 @@
 import json
 import re
+from collections import defaultdict
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
 from enum import Enum
-from typing import Optional, Union, MutableMapping
+from typing import Optional, Union, MutableMapping, Iterable
 
 import filelock
-from flask import current_app, has_request_context
-from sqlalchemy import func
+from flask import current_app, has_request_context, g
+from sqlalchemy import func, event
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import Query, joinedload, defaultload
 from sqlalchemy.orm.collections import (
@@ -160,6 +161,78 @@ access_sets = {
 SCIM_USER_NAME = ":scimuser"
 
 
+def get_request_access_memo() -> dict | None:
+    """Returns the memo of the access checks of the current request, or None outside of a request.
+
+    The memo maps (user id, block id, access types, group ids, grace period, duration) to the best access found
+    by :meth:`User.has_some_access` before the access is downgraded according to the access lock.
+    """
+    if not has_request_context():
+        return None
+    memo = g.get("access_memo")
+    if memo is None:
+        memo = g.access_memo = {}
+    return memo
+
+
+def clear_request_access_memo(*_args, **_kwargs) -> None:
+    """Clears the access memo of the current request. Called whenever an access is added, changed or removed."""
+    if has_request_context():
+        g.pop("access_memo", None)
+
+
+event.listen(Block.accesses, "append", clear_request_access_memo)
+event.listen(Block.accesses, "remove", clear_request_access_memo)
+for _attr in (
+    BlockAccess.type,
+    BlockAccess.usergroup_id,
+    BlockAccess.accessible_from,
+    BlockAccess.accessible_to,
+    BlockAccess.duration,
+    BlockAccess.duration_from,
+    BlockAccess.duration_to,
+):
+    event.listen(_attr, "set", clear_request_access_memo)
+
+
+def select_access(
+    accesses: Iterable[BlockAccess],
+    group_ids: set[int],
+    vals: set[int],
+    grace_period: timedelta,
+    duration: bool,
+) -> BlockAccess | None:
+    """Returns the best currently active access of the given groups among the accesses of a block.
+
+    See :meth:`User.has_some_access` for the parameters.
+    """
+    now = get_current_time()
+    best_access = None
+    for a in accesses:
+        if a.usergroup_id not in group_ids:
+            continue
+        if a.type not in vals:
+            continue
+        to_time = a.accessible_to
+        if to_time is not None:
+            to_time += grace_period
+        if (a.accessible_from or maxdate) <= now < (to_time or maxdate):
+            # If the end time of the access is unrestricted, there is no better access.
+            if to_time is None:
+                return a
+            # If the end time of the access is restricted, there might be a better access,
+            # so we'll continue looping.
+            if best_access is None or best_access.accessible_to < a.accessible_to:
+                best_access = a
+        if (
+            duration
+            and a.unlockable
+            and ((a.duration_from or maxdate) <= now < (a.duration_to or maxdate))
+        ):
+            return a
+    return best_access
+
+
 class Consent(Enum):
     CookieOnly = 1
     CookieAndData = 2
@@ -1146,6 +1219,9 @@ class User(db.Model, TimeStampMixin, SCIMEntity):
         """
         Check if the user has any possible access to the given item or block.
 
+        Within a request, the result is memoised until an access is changed (see :func:`get_request_access_memo`).
+        To check many items at once, use :meth:`get_some_accesses`.
+
         :param i: The item or block to check
         :param vals: Access types to check. See AccessType for available values.
         :param allow_admin: If True, allow admins to bypass the access check
@@ -1154,7 +1230,95 @@ class User(db.Model, TimeStampMixin, SCIMEntity):
         :param duration: If True checks for duration access instead of active accesses.
         :return: The best access object that user currently has for the given item or block and access types.
         """
+        return self._has_some_access(
+            i,
+            vals,
+            allow_admin,
+            grace_period,
+            duration,
+            self.effective_group_ids,
+            get_request_access_memo(),
+        )
+
+    def get_some_accesses(
+        self,
+        items: Iterable[ItemOrBlock],
+        vals: set[int],
+        allow_admin: bool = True,
+        grace_period: timedelta = timedelta(seconds=0),
+        duration: bool = False,
+    ) -> dict[int, BlockAccess | None]:
+        """
+        Check the access of the user to many items or blocks at once.
+
+        The result is the same as calling :meth:`has_some_access` for each item, but the accesses of all the items
+        are loaded with one query instead of loading the accesses of each block separately.
+
+        :return: The best access for each item id, or None if the user has no access to the item.
+        """
+        items = list(items)
         curr_group_ids = self.effective_group_ids
+        memo = get_request_access_memo()
+        if memo is None:
+            memo = {}
+        if not (allow_admin and get_admin_group_id() in curr_group_ids):
+            keys = {
+                i.id: self._access_memo_key(
+                    i.id, vals, curr_group_ids, grace_period, duration
+                )
+                for i in items
+            }
+            missing = [block_id for block_id, key in keys.items() if key not in memo]
+            if missing:
+                accesses = defaultdict(list)
+                for a in BlockAccess.query.filter(
+                    BlockAccess.block_id.in_(missing)
+                    & BlockAccess.usergroup_id.in_(curr_group_ids)
+                    & BlockAccess.type.in_(vals)
+                ):
+                    accesses[a.block_id].append(a)
+                for block_id in missing:
+                    memo[keys[block_id]] = select_access(
+                        accesses[block_id],
+                        curr_group_ids,
+                        vals,
+                        grace_period,
+                        duration,
+                    )
+        return {
+            i.id: self._has_some_access(
+                i, vals, allow_admin, grace_period, duration, curr_group_ids, memo
+            )
+            for i in items
+        }
+
+    def _access_memo_key(
+        self,
+        block_id: int,
+        vals: set[int],
+        curr_group_ids: set[int],
+        grace_period: timedelta,
+        duration: bool,
+    ) -> tuple:
+        return (
+            self.id,
+            block_id,
+            frozenset(vals),
+            frozenset(curr_group_ids),
+            grace_period,
+            duration,
+        )
+
+    def _has_some_access(
+        self,
+        i: ItemOrBlock,
+        vals: set[int],
+        allow_admin: bool,
+        grace_period: timedelta,
+        duration: bool,
+        curr_group_ids: set[int],
+        memo: dict | None,
+    ) -> BlockAccess | None:
         admin_group_id = get_admin_group_id()
         if allow_admin and admin_group_id in curr_group_ids:
             result = BlockAccess(
@@ -1170,36 +1334,22 @@ class User(db.Model, TimeStampMixin, SCIMEntity):
         if not session_has_access(i, self):
             return None
 
+        # The id of an item is the id of its block.
+        key = self._access_memo_key(i.id, vals, curr_group_ids, grace_period, duration)
+        if memo is not None and key in memo:
+            return self._downgrade_access(vals, memo[key])
+
         if isinstance(i, ItemBase):
             b = i.block
         else:
             b = i
         if not b:
             return None
-        now = get_current_time()
-        best_access = None
-        for a in b.accesses.values():  # type: BlockAccess
-            if a.usergroup_id not in curr_group_ids:
-                continue
-            if a.type not in vals:
-                continue
-            to_time = a.accessible_to
-            if to_time is not None:
-                to_time += grace_period
-            if (a.accessible_from or maxdate) <= now < (to_time or maxdate):
-                # If the end time of the access is unrestricted, there is no better access.
-                if to_time is None:
-                    return self._downgrade_access(vals, a)
-                # If the end time of the access is restricted, there might be a better access,
-                # so we'll continue looping.
-                if best_access is None or best_access.accessible_to < a.accessible_to:
-                    best_access = a
-            if (
-                duration
-                and a.unlockable
-                and ((a.duration_from or maxdate) <= now < (a.duration_to or maxdate))
-            ):
-                return self._downgrade_access(vals, a)
+        best_access = select_access(
+            b.accesses.values(), curr_group_ids, vals, grace_period, duration
+        )
+        if memo is not None:
+            memo[key] = best_access
         return self._downgrade_access(vals, best_access)
 
     def has_access(
@@ -1301,6 +1451,7 @@ class User(db.Model, TimeStampMixin, SCIMEntity):
             usergroup_id=self.get_personal_group().id,
             type=get_access_type_id(access_type),
         ).delete()
+        clear_request_access_memo()
 
     def get_notify_settings(self, item: DocInfo | Folder) -> dict:
         # TODO: Instead of conversion, expose all notification types in UI
@@ -3,7 +3,8 @@ import http.client
 import json
 from _csv import QUOTE_MINIMAL
 from io import StringIO
-from typing import Any
+from itertools import chain
+from typing import Any, Iterable, Generator
 from urllib.parse import urlparse, urljoin
 
 from flask import (
@@ -168,6 +169,60 @@ def csv_response(
     )
 
 
+STREAM_BUFFER_SIZE = 64 * 1024
+"""The minimum size of the chunks that are written to the client when streaming a response."""
+
+
+def iter_buffered(
+    chunks: Iterable[str], size: int = STREAM_BUFFER_SIZE
+) -> Generator[str, None, None]:
+    """Joins small chunks together so that a streamed response is not written to the client in tiny pieces."""
+    buf: list[str] = []
+    length = 0
+    for chunk in chunks:
+        buf.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield "".join(buf)
+            buf = []
+            length = 0
+    if buf:
+        yield "".join(buf)
+
+
+def iter_joined(items: Iterable[str], separator: str) -> Generator[str, None, None]:
+    """Like str.join, but yields the result in pieces."""
+    for i, item in enumerate(items):
+        if i:
+            yield separator
+        yield item
+
+
+def stream_response(
+    chunks: Iterable[str],
+    mimetype: str = "text/plain",
+    headers: dict[str, str] | None = None,
+) -> Response:
+    """Returns a response that is written to the client while the chunks are being generated.
+
+    The request context (and so the database session) stays available while the chunks are generated.
+    """
+    return Response(
+        stream_with_context(iter_buffered(chunks)), mimetype=mimetype, headers=headers
+    )
+
+
+def json_stream_response(items: Iterable[Any]) -> Response:
+    """Returns a JSON list of the items like :func:`json_response` but without holding the whole list or
+    the JSON string in memory.
+    """
+    return stream_response(
+        chain(["["], iter_joined((to_json_str(item) for item in items), ","), ["]"]),
+        mimetype="application/json",
+        headers={"No-Date-Conversion": "true"},
+    )
+
+
 def error_generic(
     error: str | None, code: int, template="error.jinja2", status: str | None = None
 ):
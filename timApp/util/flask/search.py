@@ -1,29 +1,44 @@
 """Routes for searching."""
 import os
 import re
+import sqlite3
 import sre_constants
 import subprocess
 import time
+from contextlib import closing
 from dataclasses import dataclass, field
 from io import StringIO
 from pathlib import Path
 from re import Pattern
 from typing import Match, Type
 
+from filelock import Timeout
 from flask import Blueprint, json, Request
-from flask import request
-from sqlalchemy.orm import joinedload, defaultload
-
-from timApp.auth.accesshelper import has_view_access, verify_admin, has_edit_access
+from flask import request, current_app
+from redis import RedisError
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload, defaultload, Session
+
+from timApp.auth.accesshelper import (
+    verify_admin,
+    has_edit_access,
+    get_accesses,
+)
+from timApp.auth.accesstype import AccessType
 from timApp.auth.sessioninfo import get_current_user_object
 from timApp.document.docentry import DocEntry
 from timApp.document.docinfo import DocInfo
+from timApp.document.docparagraph import DocParagraph
+from timApp.document.document import new_version_hooks
 from timApp.folder.folder import Folder
-from timApp.item.block import Block
+from timApp.item.block import Block, BlockType
+from timApp.item.blockrelevance import BlockRelevance
 from timApp.item.routes import get_document_relevance
+from timApp.item.tag import Tag
 from timApp.timdb.dbaccess import get_files_path
 from timApp.timdb.exceptions import InvalidReferenceException
-from timApp.user.user import User
+from timApp.timdb.sqa import db
+from timApp.user.user import User, owner_access_set
 from timApp.util.flask.requesthelper import (
     get_option,
     use_model,
@@ -31,7 +46,17 @@ from timApp.util.flask.requesthelper import (
     NotExist,
 )
 from timApp.util.flask.responsehelper import json_response
-from timApp.util.logger import log_error, log_info
+from timApp.util.flask.searchindex import (
+    IndexedPar,
+    SearchIndex,
+    enqueue_index_updates,
+    get_index_lock,
+    get_live_index,
+    new_index_path,
+    switch_live_index,
+    pop_index_updates,
+)
+from timApp.util.logger import log_error, log_info, log_warning
 from timApp.util.utils import get_error_message, cache_folder_path, normalize_newlines
 
 search_routes = Blueprint("search", __name__, url_prefix="/search")
@@ -42,6 +67,9 @@ MIN_WHOLE_WORDS_QUERY_LENGTH = 1  # For whole word search.
 PREVIEW_LENGTH = 40  # Before and after the search word separately.
 PREVIEW_MAX_LENGTH = 160
 SEARCH_CACHE_FOLDER = cache_folder_path / "searchcache"
+# Set when a search has queued the build of the missing search index, so that other searches do not queue more.
+INDEX_BUILD_QUEUED_KEY = "tim-search-index-build-queued"
+INDEX_BUILD_QUEUED_EXPIRE_SECS = 3600
 PROCESSED_CONTENT_FILE_PATH = SEARCH_CACHE_FOLDER / "content_all_processed.log"
 PROCESSED_TITLE_FILE_PATH = SEARCH_CACHE_FOLDER / "titles_all_processed.log"
 PROCESSED_PATHS_FILE_PATH = SEARCH_CACHE_FOLDER / "paths_all_processed.log"
@@ -65,10 +93,11 @@ def get_subfolders(m: GetFoldersModel):
     root_path = m.folder
     if root_path == "":
         return json_response([])
-    folders = Folder.query.filter(Folder.location.like(root_path + "%")).limit(50)
+    folders = Folder.query.filter(Folder.location.like(root_path + "%")).limit(50).all()
+    accesses = get_accesses(get_current_user_object(), folders, AccessType.view)
     folders_viewable = [root_path]
     for folder in folders:
-        if has_view_access(folder):
+        if accesses[folder.id]:
             folders_viewable.append(folder.path)
     return json_response(folders_viewable)
 
@@ -363,6 +392,27 @@ docentry_eager_relevance_opt = (
 )
 
 
+def get_searchable_md(doc_par: DocParagraph) -> str:
+    """
+    Resolves the markdown of a paragraph in full (including references) for better search.
+
+    :param doc_par: The paragraph.
+    :return: The markdown.
+    """
+    par_md_buf = StringIO()
+    if doc_par.is_par_reference() or doc_par.is_area_reference():
+        try:
+            ref_pars = doc_par.get_referenced_pars()
+        except InvalidReferenceException:
+            par_md_buf.write(doc_par.md)
+        else:
+            for p in ref_pars:
+                par_md_buf.write(f"{p.md}\n")
+    else:
+        par_md_buf.write(doc_par.md)
+    return normalize_newlines(par_md_buf.getvalue())
+
+
 def add_doc_info_content_line(
     doc_id: int, par_data, remove_deleted_pars: bool = True, add_title: bool = False
 ) -> str | None:
@@ -393,21 +443,7 @@ def add_doc_info_content_line(
             # If par can't be found (deleted), don't add it.
             if not doc_info.document.has_paragraph(par_id):
                 continue
-        # Resolve the markdown in full (including references) for better search
-        doc_par = doc_info.document.get_paragraph(par_id)
-        par_md_buf = StringIO()
-        if doc_par.is_par_reference() or doc_par.is_area_reference():
-            try:
-                ref_pars = doc_par.get_referenced_pars()
-            except InvalidReferenceException:
-                par_md_buf.write(doc_par.md)
-            else:
-                for p in ref_pars:
-                    par_md_buf.write(f"{p.md}\n")
-        else:
-            par_md_buf.write(doc_par.md)
-
-        par_md = normalize_newlines(par_md_buf.getvalue())
+        par_md = get_searchable_md(doc_info.document.get_paragraph(par_id))
         # Cherry pick attributes, because others are unnecessary for the search.
         par_attrs = par_dict["attrs"]
         par_json_list.append({"id": par_id, "attrs": par_attrs, "md": par_md})
@@ -637,6 +673,164 @@ def create_search_files(remove_deleted_pars=True) -> tuple[int, str]:
         )
 
 
+def index_document(
+    index: SearchIndex, conn: sqlite3.Connection, doc_info: DocInfo
+) -> None:
+    """
+    Replaces the indexed data of a document with its current title, path, tags and paragraphs.
+
+    :param index: Search index.
+    :param conn: Writable connection to the index.
+    :param doc_info: Document.
+    """
+    tags = " ".join(tag.name for tag in doc_info.block.tags) or None
+    index.replace_doc(
+        conn,
+        doc_info.id,
+        get_document_relevance(doc_info),
+        doc_info.title,
+        doc_info.path,
+        tags,
+        (
+            IndexedPar(par.get_id(), par.get_attrs(), get_searchable_md(par))
+            for par in doc_info.document.get_paragraphs()
+        ),
+    )
+
+
+def create_search_index() -> tuple[int, str]:
+    """
+    Builds the search index of all documents from scratch.
+    The index is built to a new file which then becomes the live index.
+
+    :return: Status code and a message confirming success of index creation.
+    """
+    start_time = time.time()
+    doc_count = 0
+    # Incremental updates wait for the rebuild, so the documents that change during it stay in the queue and
+    # are reindexed in the new index afterwards.
+    with get_index_lock():
+        index = SearchIndex(new_index_path())
+        try:
+            with closing(index.connect(readonly=False)) as conn:
+                conn.execute("PRAGMA journal_mode=DELETE")
+                for doc_info in DocEntry.query.options(
+                    *docentry_eager_relevance_opt
+                ).yield_per(500):
+                    try:
+                        index_document(index, conn, doc_info)
+                        doc_count += 1
+                    except Exception as e:
+                        log_error(
+                            f"SEARCH_INDEX: '{get_error_message(e)}' while indexing document {doc_info.id}"
+                        )
+                    if doc_count % 500 == 0:
+                        conn.commit()
+                conn.commit()
+            switch_live_index(index.path)
+        except Exception as e:
+            # The file of a failed build is removed by the next successful one.
+            return (
+                400,
+                f"Creating search index {index.path} failed: {get_error_message(e)}!",
+            )
+    log_info(f"Search indexing took: {time.time() - start_time} seconds")
+    return 200, f"Search index of {doc_count} documents created to {index.path}"
+
+
+def update_search_index(max_docs: int = 1000) -> int:
+    """
+    Reindexes the documents in the search index update queue.
+    Nothing is done while another update or a rebuild of the index is running.
+
+    :param max_docs: Maximum number of documents to reindex.
+    :return: The number of reindexed documents.
+    """
+    try:
+        with get_index_lock().acquire(timeout=0):
+            return reindex_queued_documents(max_docs)
+    except Timeout:
+        return 0
+
+
+def reindex_queued_documents(max_docs: int) -> int:
+    index = get_live_index()
+    if index is None:
+        # The queued documents will be included when the index is built.
+        return 0
+    doc_ids = pop_index_updates(max_docs)
+    if not doc_ids:
+        return 0
+    try:
+        doc_infos = {
+            d.id: d
+            for d in DocEntry.query.options(*docentry_eager_relevance_opt).filter(
+                DocEntry.id.in_(doc_ids)
+            )
+        }
+        with closing(index.connect(readonly=False)) as conn:
+            for doc_id in doc_ids:
+                doc_info = doc_infos.get(doc_id)
+                try:
+                    if doc_info is None:
+                        index.delete_doc(conn, doc_id)
+                    else:
+                        index_document(index, conn, doc_info)
+                except Exception as e:
+                    log_error(
+                        f"SEARCH_INDEX: '{get_error_message(e)}' while indexing document {doc_id}"
+                    )
+            conn.commit()
+    except Exception:
+        # Nothing was written, so the documents are reindexed on the next run.
+        enqueue_index_updates(doc_ids)
+        raise
+    return len(doc_ids)
+
+
+def enqueue_document_update(doc_id: int) -> None:
+    enqueue_index_updates([doc_id])
+
+
+new_version_hooks.append(enqueue_document_update)
+
+
+SEARCH_INDEX_CHANGES = "search_index_changes"
+
+
+@event.listens_for(db.session, "after_flush")
+def collect_search_index_changes(session: Session, _flush_context) -> None:
+    """Collects the documents whose indexed metadata (path, title, tags or relevance) changes in the transaction."""
+    doc_ids = session.info.setdefault(SEARCH_INDEX_CHANGES, set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, DocEntry):
+            doc_id = obj.id
+        elif isinstance(obj, Block) and obj.type_id == BlockType.Document.value:
+            doc_id = obj.id
+        elif isinstance(obj, (Tag, BlockRelevance)):
+            doc_id = obj.block_id
+        else:
+            continue
+        if doc_id is not None:
+            doc_ids.add(doc_id)
+
+
+@event.listens_for(db.session, "after_commit")
+def enqueue_search_index_changes(session: Session) -> None:
+    doc_ids = session.info.pop(SEARCH_INDEX_CHANGES, None)
+    if doc_ids:
+        enqueue_index_updates(doc_ids)
+
+
+@event.listens_for(db.session, "after_rollback")
+def discard_search_index_changes(session: Session) -> None:
+    session.info.pop(SEARCH_INDEX_CHANGES, None)
+
+
+def use_search_index() -> bool:
+    return current_app.config["SEARCH_BACKEND"] == "index"
+
+
 @search_routes.get("createContentFile")
 def create_search_files_route():
     """
@@ -648,10 +842,13 @@ def create_search_files_route():
     """
     verify_admin()
 
-    # 'removeDeletedPars' checks paragraph existence before adding at the cost of taking more time.
-    status, msg = create_search_files(
-        get_option(request, "removeDeletedPars", default=True, cast=bool)
-    )
+    if use_search_index():
+        status, msg = create_search_index()
+    else:
+        # 'removeDeletedPars' checks paragraph existence before adding at the cost of taking more time.
+        status, msg = create_search_files(
+            get_option(request, "removeDeletedPars", default=True, cast=bool)
+        )
     return json_response(status_code=status, jsondata=msg)
 
 
@@ -725,13 +922,14 @@ def fetch_search_items(search_items: dict, search_folder: str) -> list[DocInfo]:
 
     :param search_items: dictionary of the search items
     :param search_folder: folder path that the search is limited to
-    :return: list of DocInfo objects
+    :return: list of DocInfo objects in the order of the search items
     """
     doc_infos: list[DocInfo] = DocEntry.query.filter(
         (DocEntry.id.in_(search_items.keys()))
         & (DocEntry.name.like(search_folder + "%"))
     ).options(joinedload(DocEntry._block).joinedload(Block.relevance))
-    return doc_infos
+    order = {doc_id: i for i, doc_id in enumerate(search_items.keys())}
+    return sorted(doc_infos, key=lambda d: order[d.id])
 
 
 def is_relevant(doc: DocInfo, search_items: dict, relevance_threshold: int) -> bool:
@@ -775,36 +973,19 @@ def filter_search_documents(
     :return: list of filtered DocInfo objects
     """
 
-    docs = []
+    view_accesses = get_accesses(user, doc_infos, AccessType.view)
+    doc_infos = [doc_info for doc_info in doc_infos if view_accesses[doc_info.id]]
     if search_owned_docs:
-        if not ignore_relevance:
-            docs = [
-                doc_info
-                for doc_info in doc_infos
-                # TODO checking for view access is redundant here, since we're checking for ownership?
-                if has_view_access(doc_info)
-                and user.has_ownership(doc_info, allow_admin=False)
-                and is_relevant(doc_info, search_items, relevance_threshold)
-            ]
-        else:
-            docs = [
-                doc_info
-                for doc_info in doc_infos
-                # TODO checking for view access is redundant here, since we're checking for ownership?
-                if has_view_access(doc_info)
-                and user.has_ownership(doc_info, allow_admin=False)
-            ]
-    else:
-        if not ignore_relevance:
-            docs = [
-                doc_info
-                for doc_info in doc_infos
-                if has_view_access(doc_info)
-                and is_relevant(doc_info, search_items, relevance_threshold)
-            ]
-        else:
-            docs = list(filter(has_view_access, doc_infos))
-    return docs
+        # TODO checking for view access is redundant here, since we're checking for ownership?
+        owned = user.get_some_accesses(doc_infos, owner_access_set, allow_admin=False)
+        doc_infos = [doc_info for doc_info in doc_infos if owned[doc_info.id]]
+    if ignore_relevance:
+        return doc_infos
+    return [
+        doc_info
+        for doc_info in doc_infos
+        if is_relevant(doc_info, search_items, relevance_threshold)
+    ]
 
 
 def grep_search_file(
@@ -830,10 +1011,59 @@ def grep_search_file(
         raise RouteException(get_error_message(e))
 
 
+def parse_grep_output(grep_output: list[str], query: str, target: str) -> dict:
+    """
+    Parses grep search output into search items, logging errors.
+
+    :param grep_output: Matching lines of a search file.
+    :param query: Search word.
+    :param target: Type of search ("content", "title", "path" or "tags").
+    :return: Dictionary of the search items.
+    """
+    try:
+        return parse_search_items(grep_output)
+    except Exception as e:
+        log_search_error(
+            get_error_message(e),
+            query,
+            "",
+            title=(target == "title"),
+            path=(target == "path"),
+        )
+        return {}
+
+
+def get_search_index() -> SearchIndex | None:
+    """
+    Returns the search index, or None if it has not been built yet. In that case the build is queued so that the
+    searches can use the grep search files in the meantime.
+    """
+    index = get_live_index()
+    if index is None:
+        queue_search_index_build()
+    return index
+
+
+def queue_search_index_build() -> None:
+    """Queues building the missing search index, at most once per INDEX_BUILD_QUEUED_EXPIRE_SECS."""
+    from timApp.document.caching import rclient
+    from timApp.tim_celery import update_search_files
+
+    try:
+        if not rclient.set(
+            INDEX_BUILD_QUEUED_KEY, 1, nx=True, ex=INDEX_BUILD_QUEUED_EXPIRE_SECS
+        ):
+            return
+        update_search_files.delay()
+    except RedisError as e:
+        log_warning(f"Failed to queue building the search index: {e}")
+
+
 @search_routes.get("")
 def search():
     """
-    Perform document word search on a combined and grouped par file using grep.
+    Perform document word search using the search index or, if it is disabled or not built yet, on combined and
+    grouped par files using grep.
 
     :return: Document paragraph search results with total result count.
     """
@@ -864,10 +1094,10 @@ def search():
     validate_query(query, search_whole_words)
 
     incomplete_search_reason = ""
-    content_output = []
-    title_output = []
-    tags_output = []
-    paths_output = []
+    content_items = {}
+    title_items = {}
+    tags_items = {}
+    paths_items = {}
     content_results = []
     title_results = []
     tags_results = []
@@ -880,37 +1110,58 @@ def search():
 
     term_regex = compile_regex(query, regex, case_sensitive, search_whole_words)
 
-    cmd = ["rg"]
-    # disable printing line numbers into output
-    cmd.append("-N")
-    if case_sensitive:
-        cmd.append("-s")
+    index = get_search_index() if use_search_index() else None
+    if index is not None:
+        if should_search_content:
+            content_items = index.find_content(query, regex, term_regex)
+        if should_search_titles:
+            title_items = index.find_metadata("title", query, regex, term_regex)
+        if should_search_tags:
+            tags_items = index.find_metadata("tags", query, regex, term_regex)
+        if should_search_paths:
+            paths_items = index.find_metadata("path", query, regex, term_regex)
     else:
-        cmd.append("-i")
-    if not regex:
-        cmd.append("-F")
-    if search_whole_words:
-        cmd.append("-w")
-    cmd.append("--auto-hybrid-regex")
-    # TODO auto-hybrid-regex option has been deprecated in up-to-date versions of ripgrep,
-    #  use the options below when ripgrep is updated
-    # cmd.append("--engine")
-    # cmd.append("auto")
-    cmd.append(query)
-
-    if should_search_content:
-        content_output = grep_search_file(cmd, content_search_file_path, "content")
+        cmd = ["rg"]
+        # disable printing line numbers into output
+        cmd.append("-N")
+        if case_sensitive:
+            cmd.append("-s")
+        else:
+            cmd.append("-i")
+        if not regex:
+            cmd.append("-F")
+        if search_whole_words:
+            cmd.append("-w")
+        cmd.append("--auto-hybrid-regex")
+        # TODO auto-hybrid-regex option has been deprecated in up-to-date versions of ripgrep,
+        #  use the options below when ripgrep is updated
+        # cmd.append("--engine")
+        # cmd.append("auto")
+        cmd.append(query)
+
+        if should_search_content:
+            content_items = parse_grep_output(
+                grep_search_file(cmd, content_search_file_path, "content"),
+                query,
+                "content",
+            )
 
-    if should_search_titles:
-        title_output = grep_search_file(cmd, title_search_file_path, "title")
+        if should_search_titles:
+            title_items = parse_grep_output(
+                grep_search_file(cmd, title_search_file_path, "title"), query, "title"
+            )
 
-    if should_search_tags:
-        tags_output = grep_search_file(cmd, tags_search_file_path, "tags")
+        if should_search_tags:
+            tags_items = parse_grep_output(
+                grep_search_file(cmd, tags_search_file_path, "tags"), query, "tags"
+            )
 
-    if should_search_paths:
-        paths_output = grep_search_file(cmd, paths_search_file_path, "paths")
+        if should_search_paths:
+            paths_items = parse_grep_output(
+                grep_search_file(cmd, paths_search_file_path, "paths"), query, "path"
+            )
 
-    if not content_output and not title_output and not tags_output and not paths_output:
+    if not content_items and not title_items and not tags_items and not paths_items:
         return json_response(
             {
                 "title_result_count": title_result_count,
@@ -929,7 +1180,7 @@ def search():
     if should_search_titles:
         title_results, title_result_count, incomplete_search_reason = search_metadata(
             request,
-            title_output,
+            title_items,
             "title",
             start_time,
             timeout,
@@ -942,12 +1193,12 @@ def search():
             word_result_count,
             incomplete_search_reason,
         ) = search_content(
-            request, content_output, start_time, timeout, user, term_regex
+            request, content_items, start_time, timeout, user, term_regex
         )
     if should_search_tags:
         tags_results, tags_result_count, incomplete_search_reason = search_metadata(
             request,
-            tags_output,
+            tags_items,
             "tags",
             start_time,
             timeout,
@@ -957,7 +1208,7 @@ def search():
     if should_search_paths:
         paths_results, paths_result_count, incomplete_search_reason = search_metadata(
             request,
-            paths_output,
+            paths_items,
             "path",
             start_time,
             timeout,
@@ -1003,7 +1254,7 @@ def get_result_instance(result_type: str, alt_num_results: int) -> SearchResult:
 
 def search_metadata(
     req: Request,
-    grep_output: list,
+    search_items: dict,
     target: str,
     start_time: float,
     timeout: float,
@@ -1014,7 +1265,7 @@ def search_metadata(
     Performs a search and collates search results for a type of search in a search index
 
     :param req: search request containing search options
-    :param grep_output: temporary in-memory search index
+    :param search_items: search items that may match, see parse_search_items
     :param target: type of search ("content", "title", "path" or "tags")
     :param start_time: start time of the search process in seconds
     :param timeout: timeout limit for the search process
@@ -1039,18 +1290,6 @@ def search_metadata(
     search_result_count = 0
     search_results = []
 
-    search_items = {}
-    try:
-        search_items = parse_search_items(grep_output)
-    except Exception as e:
-        log_search_error(
-            get_error_message(e),
-            query,
-            current_doc,
-            title=(target == "title"),
-            path=(target == "path"),
-        )
-
     doc_infos: list[DocInfo] = fetch_search_items(search_items, folder)
     doc_infos = filter_search_documents(
         doc_infos,
@@ -1107,7 +1346,7 @@ def search_metadata(
 
 def search_content(
     req: Request,
-    content_output: list,
+    content_items: dict,
     start_time: float,
     timeout: float,
     user: User,
@@ -1117,7 +1356,7 @@ def search_content(
     Performs a document content search and collates the search results
 
     :param req: search request containing search options
-    :param content_output: temporary in-memory content search index
+    :param content_items: content search items that may match, see parse_search_items
     :param start_time: start time of the search process in seconds
     :param timeout: timeout limit for the search process
     :param user: current user object
@@ -1145,12 +1384,6 @@ def search_content(
     word_result_count = 0
     content_results = []
 
-    content_items = {}
-    try:
-        content_items = parse_search_items(content_output)
-    except Exception as e:
-        log_search_error(get_error_message(e), query, current_doc)
-
     doc_infos: list[DocInfo] = fetch_search_items(content_items, folder)
     doc_infos = filter_search_documents(
         doc_infos,
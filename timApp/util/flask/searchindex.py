@@ -0,0 +1,340 @@
+"""A persistent full-text index for the search routes.
+
+The index is an SQLite database in the search cache folder with two tables:
+
+* ``docs`` has the relevance, title, path and tags of each document and
+* ``pars`` has the id, attributes and resolved markdown of each current paragraph of each document.
+
+Both tables have an FTS5 index with the trigram tokenizer, so a query of at least three characters is answered
+from the postings like a case-insensitive substring search. Shorter queries and regex queries are matched by
+scanning the tables. In both cases the index only produces candidates; the search routes verify the matches
+with the exact search options (case, whole words, regex) as before.
+
+The index returns the search items in the same format as the grep search files (see
+:func:`timApp.util.flask.search.parse_search_items`), ordered by rank.
+
+The index is kept up to date incrementally: changes to the paragraphs, title, path, tags or relevance of a
+document add the document id to a queue in Redis (:func:`enqueue_index_updates`), and a periodic Celery task
+(:func:`timApp.util.flask.search.update_search_index`) reindexes the queued documents. Rebuilding the whole index
+(:func:`timApp.util.flask.search.create_search_index`) is only needed for recovery. Updates and rebuilds hold the
+same lock (:func:`get_index_lock`), so no update is written to an index that is being replaced.
+
+A rebuilt index is written to a new file, and the file name of the live index is kept in a separate pointer file
+(:func:`switch_live_index`). The database file that searches and updates may still have open is never renamed
+over and its WAL files are never removed while it is live.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+from contextlib import closing
+from functools import cache
+from pathlib import Path
+from re import Pattern
+from tempfile import mkstemp
+from typing import Iterable
+
+from filelock import FileLock
+from redis import RedisError
+
+from timApp.util.logger import log_warning
+from timApp.util.utils import cache_folder_path
+
+SEARCH_INDEX_FOLDER = cache_folder_path / "searchcache"
+# Contains the file name of the live index in the same folder.
+SEARCH_INDEX_POINTER_PATH = SEARCH_INDEX_FOLDER / "search_index.current"
+INDEX_FILE_PREFIX = "search_index-"
+INDEX_FILE_SUFFIX = ".sqlite"
+
+# Trigram tokens are three characters long, so shorter queries cannot be answered from the postings.
+MIN_FTS_QUERY_LENGTH = 3
+
+METADATA_COLUMNS = {"title": "title", "path": "path", "tags": "tags"}
+
+# A Redis set of the ids of the documents that need to be reindexed.
+UPDATE_QUEUE_KEY = "tim-search-index-queue"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    doc_id INTEGER PRIMARY KEY,
+    relevance INTEGER,
+    title TEXT,
+    path TEXT,
+    tags TEXT
+);
+CREATE TABLE IF NOT EXISTS pars (
+    id INTEGER PRIMARY KEY,
+    doc_id INTEGER NOT NULL,
+    par_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    attrs TEXT NOT NULL,
+    md TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pars_doc_id ON pars (doc_id, idx);
+CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(
+    title, path, tags, content='docs', content_rowid='doc_id', tokenize='trigram'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS pars_fts USING fts5(
+    md, attrs, content='pars', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS docs_ai AFTER INSERT ON docs BEGIN
+    INSERT INTO docs_fts (rowid, title, path, tags) VALUES (new.doc_id, new.title, new.path, new.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS docs_ad AFTER DELETE ON docs BEGIN
+    INSERT INTO docs_fts (docs_fts, rowid, title, path, tags)
+    VALUES ('delete', old.doc_id, old.title, old.path, old.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS pars_ai AFTER INSERT ON pars BEGIN
+    INSERT INTO pars_fts (rowid, md, attrs) VALUES (new.id, new.md, new.attrs);
+END;
+CREATE TRIGGER IF NOT EXISTS pars_ad AFTER DELETE ON pars BEGIN
+    INSERT INTO pars_fts (pars_fts, rowid, md, attrs) VALUES ('delete', old.id, old.md, old.attrs);
+END;
+"""
+
+
+class IndexedPar:
+    __slots__ = ("par_id", "attrs", "md")
+
+    def __init__(self, par_id: str, attrs: dict, md: str):
+        self.par_id = par_id
+        self.attrs = attrs
+        self.md = md
+
+
+def fts_phrase(query: str) -> str:
+    """Quotes the query as an FTS5 phrase."""
+    return '"' + query.replace('"', '""') + '"'
+
+
+def can_use_postings(query: str, regex: bool) -> bool:
+    return not regex and len(query) >= MIN_FTS_QUERY_LENGTH
+
+
+class SearchIndex:
+    """Reads and writes the search index at the given path."""
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def exists(self) -> bool:
+        return self.path.is_file()
+
+    def connect(self, readonly: bool = True) -> sqlite3.Connection:
+        if readonly:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=30)
+        else:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+        return conn
+
+    def replace_doc(
+        self,
+        conn: sqlite3.Connection,
+        doc_id: int,
+        relevance: int | None,
+        title: str | None,
+        path: str | None,
+        tags: str | None,
+        pars: Iterable[IndexedPar],
+    ) -> None:
+        """Replaces the indexed data of a document. The caller commits."""
+        self.delete_doc(conn, doc_id)
+        conn.execute(
+            "INSERT INTO docs (doc_id, relevance, title, path, tags) VALUES (?, ?, ?, ?, ?)",
+            [doc_id, relevance, title, path, tags],
+        )
+        conn.executemany(
+            "INSERT INTO pars (doc_id, par_id, idx, attrs, md) VALUES (?, ?, ?, ?, ?)",
+            [
+                (doc_id, p.par_id, i, json.dumps(p.attrs, ensure_ascii=False), p.md)
+                for i, p in enumerate(pars)
+            ],
+        )
+
+    @staticmethod
+    def delete_doc(conn: sqlite3.Connection, doc_id: int) -> None:
+        conn.execute("DELETE FROM docs WHERE doc_id = ?", [doc_id])
+        conn.execute("DELETE FROM pars WHERE doc_id = ?", [doc_id])
+
+    def find_content(
+        self, query: str, regex: bool, term_regex: Pattern[str]
+    ) -> dict[int, dict]:
+        """Finds the paragraphs that may match the query.
+
+        :param query: The search query.
+        :param regex: Whether the query is a regex.
+        :param term_regex: The compiled query, used for matching when the postings cannot be used.
+        :return: The matching paragraphs grouped by document, best ranked documents first.
+        """
+        with closing(self.connect()) as conn:
+            if can_use_postings(query, regex):
+                rows = conn.execute(
+                    "SELECT p.doc_id, d.relevance, p.par_id, p.attrs, p.md, bm25(pars_fts) AS rank "
+                    "FROM pars_fts JOIN pars p ON p.id = pars_fts.rowid "
+                    "LEFT JOIN docs d ON d.doc_id = p.doc_id "
+                    "WHERE pars_fts MATCH ? ORDER BY p.doc_id, p.idx",
+                    [fts_phrase(query)],
+                )
+            else:
+                conn.create_function(
+                    "tim_match", 1, lambda s: term_regex.search(s) is not None
+                )
+                rows = conn.execute(
+                    "SELECT p.doc_id, d.relevance, p.par_id, p.attrs, p.md, 0 AS rank "
+                    "FROM pars p LEFT JOIN docs d ON d.doc_id = p.doc_id "
+                    "WHERE tim_match(p.md) OR tim_match(p.attrs) ORDER BY p.doc_id, p.idx"
+                )
+            items: dict[int, dict] = {}
+            ranks: dict[int, float] = {}
+            for doc_id, relevance, par_id, attrs, md, rank in rows:
+                item = items.get(doc_id)
+                if item is None:
+                    item = items[doc_id] = {
+                        "doc_id": doc_id,
+                        "d_r": relevance,
+                        "pars": [],
+                    }
+                    ranks[doc_id] = 0
+                item["pars"].append(
+                    {"id": par_id, "attrs": json.loads(attrs), "md": md}
+                )
+                # bm25 is negative; smaller is better.
+                ranks[doc_id] += rank
+        return rank_items(items, ranks)
+
+    def find_metadata(
+        self, target: str, query: str, regex: bool, term_regex: Pattern[str]
+    ) -> dict[int, dict]:
+        """Finds the documents whose title, path or tags may match the query.
+
+        :param target: "title", "path" or "tags".
+        :return: The items of the matching documents, best ranked documents first.
+        """
+        column = METADATA_COLUMNS[target]
+        with closing(self.connect()) as conn:
+            if can_use_postings(query, regex):
+                rows = conn.execute(
+                    f"SELECT d.doc_id, d.relevance, d.{column}, bm25(docs_fts) "
+                    f"FROM docs_fts JOIN docs d ON d.doc_id = docs_fts.rowid "
+                    f"WHERE docs_fts MATCH ?",
+                    [f"{column} : {fts_phrase(query)}"],
+                )
+            else:
+                conn.create_function(
+                    "tim_match",
+                    1,
+                    lambda s: s is not None and term_regex.search(s) is not None,
+                )
+                rows = conn.execute(
+                    f"SELECT doc_id, relevance, {column}, 0 FROM docs WHERE tim_match({column})"
+                )
+            items = {}
+            ranks = {}
+            for doc_id, relevance, value, rank in rows:
+                if value is None:
+                    continue
+                items[doc_id] = {
+                    "doc_id": doc_id,
+                    "d_r": relevance,
+                    f"doc_{target}": value,
+                }
+                ranks[doc_id] = rank
+        return rank_items(items, ranks)
+
+
+def rank_items(items: dict[int, dict], ranks: dict[int, float]) -> dict[int, dict]:
+    """Orders the items by document relevance and then by text rank."""
+    order = sorted(
+        items, key=lambda doc_id: (-(items[doc_id]["d_r"] or 0), ranks[doc_id], doc_id)
+    )
+    return {doc_id: items[doc_id] for doc_id in order}
+
+
+def get_live_index(
+    pointer_path: Path = SEARCH_INDEX_POINTER_PATH,
+) -> SearchIndex | None:
+    """Returns the live search index, or None if it has not been built."""
+    try:
+        name = pointer_path.read_text().strip()
+    except FileNotFoundError:
+        return None
+    index = SearchIndex(pointer_path.parent / name)
+    return index if index.exists() else None
+
+
+def new_index_path(folder: Path = SEARCH_INDEX_FOLDER) -> Path:
+    """Creates an empty file for building a new index and returns its path."""
+    folder.mkdir(parents=True, exist_ok=True)
+    fd, name = mkstemp(dir=folder, prefix=INDEX_FILE_PREFIX, suffix=INDEX_FILE_SUFFIX)
+    os.close(fd)
+    return Path(name)
+
+
+def switch_live_index(
+    path: Path, pointer_path: Path = SEARCH_INDEX_POINTER_PATH
+) -> None:
+    """Makes a newly built index the live index.
+
+    New connections open the new file, while searches and updates that are running keep using the old one.
+    The old file is kept until the next switch; older index files are removed then.
+    """
+    previous = get_live_index(pointer_path)
+    fd, tmpname = mkstemp(dir=pointer_path.parent, prefix=f".{pointer_path.name}.")
+    with os.fdopen(fd, "w") as f:
+        f.write(path.name)
+    os.replace(tmpname, pointer_path)
+    keep = {path.name}
+    if previous is not None:
+        keep.add(previous.path.name)
+    for old in pointer_path.parent.glob(f"{INDEX_FILE_PREFIX}*{INDEX_FILE_SUFFIX}*"):
+        # Also matches the -wal, -shm and -journal files of the index files.
+        db_name = old.name[
+            : old.name.rindex(INDEX_FILE_SUFFIX) + len(INDEX_FILE_SUFFIX)
+        ]
+        if db_name not in keep:
+            old.unlink(missing_ok=True)
+
+
+def get_index_lock(folder: Path = SEARCH_INDEX_FOLDER) -> FileLock:
+    """Returns the lock that is held while the index is updated or rebuilt."""
+    folder.mkdir(parents=True, exist_ok=True)
+    return FileLock(str(folder / "search_index.lock"))
+
+
+@cache
+def is_index_enabled() -> bool:
+    from timApp.tim_app import app
+
+    return app.config["SEARCH_BACKEND"] == "index"
+
+
+def enqueue_index_updates(doc_ids: Iterable[int]) -> None:
+    """Queues the given documents to be reindexed.
+
+    The index is derived data, so a failure to queue is only logged; the next rebuild fixes the index.
+    """
+    if not is_index_enabled():
+        return
+    doc_ids = list(doc_ids)
+    if not doc_ids:
+        return
+    from timApp.document.caching import rclient
+
+    try:
+        rclient.sadd(UPDATE_QUEUE_KEY, *doc_ids)
+    except RedisError as e:
+        log_warning(f"Failed to queue search index updates of documents {doc_ids}: {e}")
+
+
+def pop_index_updates(max_count: int) -> list[int]:
+    """Takes at most max_count document ids from the update queue.
+
+    The caller holds the index lock and puts the ids back with :func:`enqueue_index_updates` if reindexing fails.
+    """
+    from timApp.document.caching import rclient
+
+    return sorted(int(d) for d in rclient.spop(UPDATE_QUEUE_KEY, max_count))
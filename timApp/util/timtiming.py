@@ -1,6 +1,7 @@
 """Functions for dealing taking time."""
 import inspect
 import time
+from collections import Counter
 from functools import wraps
 from typing import Callable, Any
 
@@ -77,3 +78,21 @@ def with_timing(*print_args: str) -> Callable:
         return wrapper
 
     return with_timing_dec
+
+
+stat_counters: Counter[str] = Counter()
+"""Per-process counters for cache hits, misses etc. See :func:`count_stat`."""
+
+
+def count_stat(name: str, n: int = 1) -> None:
+    """Increments the named statistics counter of the current process.
+
+    :param name: Name of the counter, e.g. "par_cache.hit".
+    :param n: How much to increment.
+    """
+    stat_counters[name] += n
+
+
+def get_stats() -> dict[str, int]:
+    """Returns the statistics counters of the current process."""
+    return dict(stat_counters)
@@ -484,6 +484,31 @@ def read_json_lines(file_to_read: Path) -> list[dict]:
     return loaded_json
 
 
+def read_lines_reversed(file_to_read: Path, block_size: int = 8192) -> Iterable[str]:
+    """
+    Reads the lines of a text file starting from the last one without reading the whole file.
+
+    :param file_to_read: File to read.
+    :param block_size: How many bytes to read from the file at a time.
+    :return: The lines of the file in reverse order, without line endings.
+    """
+    with file_to_read.open("rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        remainder = b""
+        while pos > 0:
+            read_size = min(block_size, pos)
+            pos -= read_size
+            f.seek(pos)
+            lines = (f.read(read_size) + remainder).split(b"\n")
+            # The first line may be incomplete, so it is combined with the previous block.
+            remainder = lines[0]
+            for line in reversed(lines[1:]):
+                if line:
+                    yield line.decode()
+        if remainder:
+            yield remainder.decode()
+
+
 def wait_response_and_collect_error(f: Future, h: str, errors: list[str]) -> None:
     try:
         resp: requests.Response = f.result()